@@ -1,20 +1,43 @@
 from __future__ import annotations
 
+import argparse
 import copy
 import dataclasses
 import json
+import math
+import os
 import sys
+import tempfile
+import threading
+import time
 import typing
 from pathlib import Path
 
+# startup is timed from here, importing the standard library takes next to no time
+_import_start = time.perf_counter()
+
 from PyQt5 import QtWidgets as QtW
 from PyQt5 import QtGui as QtG
 from PyQt5 import QtCore as QtC
 
 from main_window import Ui_MainWindow
-from turmites.infinite_grid import Position
+from turmites.bounded_grid import BoundedGrid, EDGE_BEHAVIOURS
+from turmites.infinite_grid import InfiniteGrid, Position, Rect
+from turmites.tiled_grid import SpillingGrid, TiledGrid
 from turmites.turmite import MultipleTurmiteModel, TurmiteState, CellColor, direction_to_xy_diff
 import turmites.turmite
+import turmites.analysis
+import turmites.cache
+import turmites.diff
+import turmites.examples
+import turmites.parallel
+import turmites.paths
+import turmites.jit
+import turmites.journal
+import turmites.rendering
+import turmites.spatial
+import turmites.tiled_grid
+import turmites.visits
 
 
 class StateColors:
@@ -43,6 +66,9 @@ class StateColors:
     def set_color(self, state: StateType, color: QtG.QColor):
         self.states[state] = color
 
+    def to_rgb(self) -> dict[StateType, tuple[int, int, int]]:
+        return {state: (color.red(), color.green(), color.blue()) for state, color in self.states.items()}
+
 
 def get_pixmap(color: QtG.QColor):
     pixmap = QtG.QPixmap(16, 16)
@@ -59,36 +85,15 @@ def get_icon(color: QtG.QColor):
     return icon
 
 
-class StateComboBox(QtW.QWidget):
-    def __init__(self, state: StateColors.StateType | None, state_colors: StateColors, update_callback):
-        super().__init__()
-
-        self.main_layout = QtW.QVBoxLayout()
-        self.combo_box = QtW.QComboBox()
-        self.main_layout.addWidget(self.combo_box)
-        self.setLayout(self.main_layout)
-
-        self.state_colors = state_colors
-        self.display(state)
-
-        self.combo_box.currentIndexChanged.connect(update_callback)
-
-    def display(self, target_state: StateColors.StateType = None):
-        # target_state = target_state if target_state is not None else self.get_current_state()
-
-        self.combo_box.clear()
-        for state, color in self.state_colors.states.items():
-            icon = get_icon(color)
-            self.combo_box.addItem(icon, str(state), state)
-
-        if target_state is not None:
-            self.combo_box.setCurrentIndex(self.combo_box.findData(target_state))
-
-    def get_current_state(self) -> StateColors.StateType:
-        return self.combo_box.currentData()
+class TransitionTableModel(QtC.QAbstractTableModel):
+    """The entries of a turmite's transition table, one per row.
 
+    Every edit is applied to the transition table right away with :meth:`TransitionTable.set_entry`. An entry keeps
+    its row when its cell state or turmite state is changed, until the model is created again.
+    """
 
-class TurnDirectionComboBox(QtW.QWidget):
+    CELL_COLOR, TURMITE_STATE, TURN_DIRECTION, NEW_CELL_COLOR, NEW_TURMITE_STATE = range(5)
+    HEADERS = ("Current Cell State", "Current Turmite State", "New Direction", "New Cell State", "New Turmite State")
     TURN_DIRECTIONS = {
         0: "Don't turn",
         1: "Turn clockwise",
@@ -96,24 +101,158 @@ class TurnDirectionComboBox(QtW.QWidget):
         3: "Turn anticlockwise",
     }
 
-    def __init__(self, turn_direction: int | None, update_callback):
+    entry_rejected = QtC.pyqtSignal(str)
+
+    def __init__(self, turmite_model: MultipleTurmiteModel, turmite: turmites.turmite.Turmite,
+                 cell_state_colors: StateColors, turmite_state_colors: StateColors):
         super().__init__()
 
-        self.main_layout = QtW.QHBoxLayout()
-        self.combo_box = QtW.QComboBox()
-        self.main_layout.addWidget(self.combo_box)
-        self.setLayout(self.main_layout)
+        self.turmite_model = turmite_model
+        self.turmite = turmite
+        self.cell_state_colors = cell_state_colors
+        self.turmite_state_colors = turmite_state_colors
+
+        self._keys: list[tuple[CellColor, TurmiteState]] = [key for key, _ in turmite.transition_table]
+        # icons are drawn once per color instead of once per painted cell
+        self._icons: dict[int, QtG.QIcon] = {}
+
+    def state_colors(self, column: int) -> StateColors:
+        if column in (self.CELL_COLOR, self.NEW_CELL_COLOR):
+            return self.cell_state_colors
+        return self.turmite_state_colors
+
+    def icon(self, color: QtG.QColor) -> QtG.QIcon:
+        icon = self._icons.get(color.rgba())
+        if icon is None:
+            icon = self._icons[color.rgba()] = get_icon(color)
+        return icon
+
+    def entry(self, row: int) -> tuple[CellColor, TurmiteState, int, CellColor, TurmiteState]:
+        cell_color, turmite_state = self._keys[row]
+        return (cell_color, turmite_state, *self.turmite.transition_table.get_entry(cell_color, turmite_state))
+
+    def rowCount(self, parent: QtC.QModelIndex = QtC.QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._keys)
+
+    def columnCount(self, parent: QtC.QModelIndex = QtC.QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index: QtC.QModelIndex, role: int = QtC.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        column = index.column()
+        value = self.entry(index.row())[column]
+
+        if role == QtC.Qt.EditRole:
+            return value % 4 if column == self.TURN_DIRECTION else value
+        if role == QtC.Qt.DisplayRole:
+            return self.TURN_DIRECTIONS[value % 4] if column == self.TURN_DIRECTION else str(value)
+        if role == QtC.Qt.DecorationRole and column != self.TURN_DIRECTION:
+            return self.icon(self.state_colors(column).get_color(value))
+        return None
+
+    def headerData(self, section: int, orientation: QtC.Qt.Orientation, role: int = QtC.Qt.DisplayRole):
+        if orientation != QtC.Qt.Horizontal:
+            return None
+
+        if role == QtC.Qt.DisplayRole:
+            return self.HEADERS[section]
+        if role == QtC.Qt.FontRole:
+            # the current states select the entry, the others are what it does
+            font = QtG.QFont()
+            if section in (self.CELL_COLOR, self.TURMITE_STATE):
+                font.setBold(True)
+            else:
+                font.setUnderline(True)
+            return font
+        return None
+
+    def flags(self, index: QtC.QModelIndex) -> QtC.Qt.ItemFlags:
+        return super().flags(index) | QtC.Qt.ItemIsEditable
+
+    def setData(self, index: QtC.QModelIndex, value, role: int = QtC.Qt.EditRole) -> bool:
+        if role != QtC.Qt.EditRole or not index.isValid() or value is None:
+            return False
+
+        row = index.row()
+        entry = list(self.entry(row))
+        entry[index.column()] = value
+        key = entry[0], entry[1]
+
+        transition_table = self.turmite_model.unshare_transition_table(self.turmite)
+        if key != self._keys[row]:
+            if key in transition_table:
+                self.entry_rejected.emit(
+                    f"There already is an entry for cell state {key[0]} and turmite state {key[1]}."
+                )
+                return False
+            transition_table.remove_entry(*self._keys[row])
+            self._keys[row] = key
+
+        transition_table.set_entry(*entry)
+        self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.HEADERS) - 1))
+        return True
+
+    def add_entry(self) -> bool:
+        """Adds an entry for the first pair of cell state and turmite state that has none, which keeps both states
+        and doesn't turn. Returns ``False`` if every pair already has an entry."""
+        transition_table = self.turmite.transition_table
+
+        for cell_color in self.cell_state_colors.states:
+            for turmite_state in self.turmite_state_colors.states:
+                if (cell_color, turmite_state) in transition_table:
+                    continue
+
+                row = len(self._keys)
+                self.beginInsertRows(QtC.QModelIndex(), row, row)
+                self.turmite_model.unshare_transition_table(self.turmite).set_entry(
+                    cell_color, turmite_state, 0, cell_color, turmite_state
+                )
+                self._keys.append((cell_color, turmite_state))
+                self.endInsertRows()
+                return True
+
+        return False
+
+    def remove_rows(self, rows: typing.Iterable[int]):
+        transition_table = self.turmite_model.unshare_transition_table(self.turmite)
+
+        for row in sorted(set(rows), reverse=True):
+            self.beginRemoveRows(QtC.QModelIndex(), row, row)
+            transition_table.remove_entry(*self._keys.pop(row))
+            self.endRemoveRows()
+
 
-        for direction, msg in self.TURN_DIRECTIONS.items():
-            self.combo_box.addItem(msg, direction)
+class TransitionTableDelegate(QtW.QStyledItemDelegate):
+    """Edits the cells of a :class:`TransitionTableModel` with a combo box, which only exists while a cell is being
+    edited."""
 
-        if turn_direction is not None:
-            self.combo_box.setCurrentIndex(self.combo_box.findData(turn_direction % 4))
+    def createEditor(self, parent: QtW.QWidget, option: QtW.QStyleOptionViewItem,
+                     index: QtC.QModelIndex) -> QtW.QWidget:
+        combo_box = QtW.QComboBox(parent)
+        model: TransitionTableModel = index.model()
 
-        self.combo_box.currentIndexChanged.connect(update_callback)
+        if index.column() == TransitionTableModel.TURN_DIRECTION:
+            for direction, text in TransitionTableModel.TURN_DIRECTIONS.items():
+                combo_box.addItem(text, direction)
+        else:
+            for state, color in model.state_colors(index.column()).states.items():
+                combo_box.addItem(model.icon(color), str(state), state)
+
+        # the choice is applied right away instead of when the editor loses focus
+        combo_box.activated.connect(lambda *_: self.commit_and_close(combo_box))
+        return combo_box
+
+    def commit_and_close(self, editor: QtW.QWidget):
+        self.commitData.emit(editor)
+        self.closeEditor.emit(editor)
+
+    def setEditorData(self, editor: QtW.QComboBox, index: QtC.QModelIndex):
+        editor.setCurrentIndex(editor.findData(index.data(QtC.Qt.EditRole)))
 
-    def get_current_turn_direction(self) -> int:
-        return self.combo_box.currentData()
+    def setModelData(self, editor: QtW.QComboBox, model: TransitionTableModel, index: QtC.QModelIndex):
+        model.setData(index, editor.currentData(), QtC.Qt.EditRole)
 
 
 class AddStateButton(QtW.QWidget):
@@ -137,6 +276,12 @@ class AddStateButton(QtW.QWidget):
 
 class TurmitesGraphicsView:
     _scale = 25
+    # cells are populated lazily in chunks of _population_chunk_size x _population_chunk_size cells
+    _population_chunk_size = 16
+    _population_batch_size = 5000
+    _max_visible_population_cells = 250_000
+    # longer trails are sampled
+    _max_trail_points = 20_000
 
     def __init__(self, graphics_view: QtW.QGraphicsView, turmite_model: MultipleTurmiteModel,
                  cell_state_colors: StateColors, turmite_state_colors: list[StateColors],
@@ -164,14 +309,58 @@ class TurmitesGraphicsView:
         self.cell_graphics_items: dict[Position, QtW.QGraphicsItem] = {}
         self.turmite_graphics_items: list[QtW.QGraphicsItem] = []
 
+        # the tiles of the grid whose cells haven't been populated yet
+        self.pending_rects: list[Rect] = []
+        # cells whose items are outdated since a large bulk change, they are updated with the current state
+        self.pending_positions: set[Position] = set()
+        self.populated_chunks: set[Position] = set()
+        self.population_timer = QtC.QTimer()
+        self.population_timer.setInterval(0)
+        self.population_timer.timeout.connect(self.populate_step)
+        self.population_progress_bar = QtW.QProgressBar()
+        self.population_progress_bar.setMaximumWidth(200)
+        self.population_progress_bar.setFormat("Loading cells %p%")
+        self.population_progress_bar.hide()
+        self.project_view.ui.statusbar.addPermanentWidget(self.population_progress_bar)
+
+        self.view.horizontalScrollBar().valueChanged.connect(self.on_scroll)
+        self.view.verticalScrollBar().valueChanged.connect(self.on_scroll)
+
+        # only the turmites in and around the visible region are drawn
+        self.turmite_index = turmites.spatial.TurmiteIndex()
+        self.turmites_rect: Rect | None = None
+
+        self.rectangle_start: Position | None = None
+
+        self.show_heatmap = False
+        self.heatmap_items: dict[Position, QtW.QGraphicsPixmapItem] = {}
+        self.heatmap_color_table = [QtG.qRgba(0, 0, 0, 0)] + [
+            QtG.qRgba(r, g, b, 200) for r, g, b in turmites.visits.heat_palette()[1:]
+        ]
+
+        # the first and last iteration of the trails that are shown
+        self.trail_range: tuple[int, int] | None = None
+        self.trail_items: list[QtW.QGraphicsPathItem] = []
+
+        # the differences to another state of the simulation that are highlighted
+        self.diff: turmites.diff.ModelDiff | None = None
+        self.diff_items: list[QtW.QGraphicsItem] = []
+        self.diff_color_table = [QtG.qRgba(0, 0, 0, 0)] + [
+            QtG.qRgba(r, g, b, 200) for r, g, b in turmites.diff.DIFF_PALETTE[1:4]
+        ]
+
         self.init_grid()
-        self.draw_turmites()
         self.turmite_model.grid.listeners.append(self.update_cell)
+        self.turmite_model.grid.bulk_listeners.append(self.update_cells)
 
         self.scene.mousePressEvent = self.scene_mouse_press_event
+        self.scene.mouseReleaseEvent = self.scene_mouse_release_event
 
-        self.project_view.ui.actionResetSimulationViewZoom.disconnect()
-        self.project_view.ui.actionResetSimulationViewZoom.triggered.connect(lambda *_: self.view.resetTransform())
+        try:
+            self.project_view.ui.actionResetSimulationViewZoom.disconnect()
+        except TypeError:
+            pass
+        self.project_view.ui.actionResetSimulationViewZoom.triggered.connect(self.reset_zoom)
 
 
         # self.view.eventFilter = self.graphics_view_event_filter
@@ -179,14 +368,18 @@ class TurmitesGraphicsView:
     def update_cell(self, position: Position, cell_state: int):
         x, y = position
 
-        if position in self.cell_graphics_items:
-            self.scene.removeItem(self.cell_graphics_items[position])
-            del self.cell_graphics_items[position]
-
+        item = self.cell_graphics_items.get(position)
         if cell_state == self.turmite_model.grid.default:
+            if item is not None:
+                self.scene.removeItem(item)
+                del self.cell_graphics_items[position]
             return
 
         cell_color = self.cell_state_colors.get_color(cell_state)
+        if item is not None:
+            # recoloring is much cheaper than replacing the item
+            item.setBrush(QtG.QBrush(cell_color))
+            return
 
         self.cell_graphics_items[position] = self.scene.addRect(
             QtC.QRectF(x * self._scale, y * self._scale, self._scale, self._scale),
@@ -194,13 +387,39 @@ class TurmitesGraphicsView:
             QtG.QBrush(cell_color)
         )
 
+    def update_cells(self, changes: dict[Position, int]):
+        if len(changes) <= self._population_batch_size:
+            for position, cell_state in changes.items():
+                self.update_cell(position, cell_state)
+            return
+
+        # up to a batch of visible cells is updated right away, all others in populate_step, so engines that write
+        # back many cells per tick don't block the event loop
+        x, y, width, height = self.visible_cells_rect()
+        budget = self._population_batch_size
+        for position, cell_state in changes.items():
+            cell_x, cell_y = position
+            if budget and x <= cell_x < x + width and y <= cell_y < y + height:
+                self.update_cell(position, cell_state)
+                budget -= 1
+            else:
+                self.pending_positions.add(position)
+
+        self.population_timer.start()
+
     def draw_turmites(self):
         for turmite_graphics_item in self.turmite_graphics_items:
             self.scene.removeItem(turmite_graphics_item)
 
         self.turmite_graphics_items.clear()
 
-        for i, (turmite, state_colors) in enumerate(zip(self.turmite_model.turmites, self.turmite_state_colors)):
+        # the visible region and half of it on every side, so scrolling a bit doesn't need a redraw
+        x, y, width, height = self.visible_cells_rect()
+        self.turmites_rect = x - width // 2, y - height // 2, 2 * width, 2 * height
+        self.turmite_index.sync(self.turmite_model.turmites)
+
+        for i in self.turmite_index.in_rect(self.turmites_rect):
+            turmite, state_colors = self.turmite_model.turmites[i], self.turmite_state_colors[i]
             x, y = turmite.position
 
             turmite_color = state_colors.get_color(turmite.state)
@@ -213,6 +432,8 @@ class TurmitesGraphicsView:
                     QtG.QBrush(turmite_color)
                 )
             )
+            # above the heatmap
+            self.turmite_graphics_items[-1].setZValue(2)
             dx, dy = direction_to_xy_diff(turmite.direction)
             self.turmite_graphics_items.append(
                 self.scene.addLine(
@@ -231,16 +452,264 @@ class TurmitesGraphicsView:
             # self.scene.addItem(text)
             self.turmite_graphics_items.append(text)
 
+        self.update_heatmap()
+
     def init_grid(self):
         self.scene.setBackgroundBrush(self.cell_state_colors.get_color(self.turmite_model.grid.default))
 
-        for item in self.cell_graphics_items.values():
+        # removing the items one by one is far slower than clearing the whole scene
+        self.scene.clear()
+        self.cell_graphics_items: dict[Position, QtW.QGraphicsItem] = {}
+        self.turmite_graphics_items = []
+        self.heatmap_items = {}
+        self.trail_items = []
+        self.diff_items = []
+        if self.turmite_model.visits is not None:
+            # all tiles have to be drawn again
+            self.turmite_model.visits.take_changed_tiles()
+
+        # the visible region is drawn right away, everything else in populate_step while the event loop is idle
+        self.pending_rects = self.population_rects()
+        self.pending_positions = set()
+        self.populated_chunks = set()
+        self.populate_visible()
+        self.draw_turmites()
+        self.draw_trails()
+        self.draw_diff()
+
+        if self.turmite_model.grid.bounded:
+            border_pen = QtG.QPen(QtG.QColor(0, 0, 0), 3)
+            border_pen.setCosmetic(True)
+            self.scene.addRect(
+                QtC.QRectF(0, 0, self.turmite_model.grid.width * self._scale,
+                           self.turmite_model.grid.height * self._scale),
+                border_pen
+            )
+
+        if self.pending_rects:
+            self.population_progress_bar.setRange(0, len(self.pending_rects))
+            self.population_progress_bar.setValue(0)
+            self.population_progress_bar.show()
+            self.population_timer.start()
+        else:
+            self.stop_population()
+
+    def set_show_heatmap(self, show_heatmap: bool):
+        self.show_heatmap = show_heatmap
+        self.update_heatmap(redraw=True)
+
+    def update_heatmap(self, redraw: bool = False):
+        """Draws the visit counts of the tiles that changed, or of all tiles if ``redraw`` is set."""
+        visits = self.turmite_model.visits
+
+        if not self.show_heatmap or visits is None:
+            for item in self.heatmap_items.values():
+                self.scene.removeItem(item)
+            self.heatmap_items = {}
+            return
+
+        changed_tiles = visits.take_changed_tiles()
+        if redraw or not self.heatmap_items:
+            changed_tiles = [key for key, _, _ in visits.tiles()]
+
+        tile_size = turmites.tiled_grid.TILE_SIZE
+        for key in changed_tiles:
+            image = QtG.QImage(visits.heat_levels(key), tile_size, tile_size, tile_size, QtG.QImage.Format_Indexed8)
+            image.setColorTable(self.heatmap_color_table)
+            pixmap = QtG.QPixmap.fromImage(image)
+
+            if key in self.heatmap_items:
+                self.heatmap_items[key].setPixmap(pixmap)
+                continue
+
+            item = self.scene.addPixmap(pixmap)
+            item.setScale(self._scale)
+            item.setPos(key[0] * tile_size * self._scale, key[1] * tile_size * self._scale)
+            item.setZValue(1)
+            self.heatmap_items[key] = item
+
+    def show_diff(self, diff: turmites.diff.ModelDiff | None):
+        self.diff = diff
+        self.draw_diff()
+
+    def draw_diff(self):
+        """Colors the changed cells of every changed tile like :data:`turmites.diff.DIFF_PALETTE` and frames the
+        changed turmites."""
+        for item in self.diff_items:
             self.scene.removeItem(item)
+        self.diff_items = []
 
-        self.cell_graphics_items: dict[Position, QtW.QGraphicsItem] = {}
+        if self.diff is None:
+            return
+
+        tile_size = turmites.tiled_grid.TILE_SIZE
+        for key in self.diff.grid.tiles:
+            image = QtG.QImage(
+                bytes(self.diff.grid.kinds(key)), tile_size, tile_size, tile_size, QtG.QImage.Format_Indexed8
+            )
+            image.setColorTable(self.diff_color_table)
+
+            item = self.scene.addPixmap(QtG.QPixmap.fromImage(image))
+            item.setScale(self._scale)
+            item.setPos(key[0] * tile_size * self._scale, key[1] * tile_size * self._scale)
+            # above the heatmap and the trails, below the turmites
+            item.setZValue(1.8)
+            self.diff_items.append(item)
+
+        pen = QtG.QPen(QtG.QColor(*turmites.diff.DIFF_PALETTE[turmites.diff.CHANGED]), 3)
+        pen.setCosmetic(True)
+        for change in self.diff.turmites:
+            if change.new is None:
+                continue
+            x, y = change.new[0]
+            item = self.scene.addRect(
+                QtC.QRectF((x - 0.25) * self._scale, (y - 0.25) * self._scale, 1.5 * self._scale, 1.5 * self._scale),
+                pen
+            )
+            item.setZValue(1.8)
+            self.diff_items.append(item)
+
+    def set_trail_range(self, trail_range: tuple[int, int] | None):
+        self.trail_range = trail_range
+        self.draw_trails()
+
+    def draw_trails(self):
+        """Draws the recorded path of every turmite during the iterations of trail_range."""
+        for item in self.trail_items:
+            self.scene.removeItem(item)
+        self.trail_items = []
+
+        paths = self.turmite_model.paths
+        if self.trail_range is None or paths is None:
+            return
+
+        start, stop = self.trail_range[0], self.trail_range[1] + 1
+        step = max(1, math.ceil((stop - start) / self._max_trail_points))
+        grid = self.turmite_model.grid
 
-        for position, cell_state in self.turmite_model.grid.items():
-            self.update_cell(position, cell_state)
+        for i in range(len(self.turmite_model.turmites)):
+            if i not in paths.paths:
+                continue
+
+            painter_path = QtG.QPainterPath()
+            previous = None
+            for _, (x, y) in paths[i].positions(start, stop, grid, step):
+                point = QtC.QPointF((x + 0.5) * self._scale, (y + 0.5) * self._scale)
+                # turmites only move by one cell per step, anything else is a wrap, a jump or a gap in the recording
+                if previous is None or abs(x - previous[0]) + abs(y - previous[1]) > step:
+                    painter_path.moveTo(point)
+                else:
+                    painter_path.lineTo(point)
+                previous = x, y
+
+            pen = QtG.QPen(QtG.QColor.fromHsv(i * 67 % 360, 255, 220), 2)
+            pen.setCosmetic(True)
+            item = self.scene.addPath(painter_path, pen)
+            # above the heatmap, below the turmites
+            item.setZValue(1.5)
+            self.trail_items.append(item)
+
+    def visible_cells_rect(self) -> tuple[int, int, int, int]:
+        rect = self.view.mapToScene(self.view.viewport().rect()).boundingRect()
+
+        x = math.floor(rect.left() / self._scale)
+        y = math.floor(rect.top() / self._scale)
+        return x, y, math.ceil(rect.right() / self._scale) - x + 1, math.ceil(rect.bottom() / self._scale) - y + 1
+
+    def population_rects(self) -> list[Rect]:
+        """One rectangle for every tile of the grid with non-default cells. Listing the tiles is much faster than
+        listing the cells, which would delay opening large projects."""
+        grid = self.turmite_model.grid
+        tile_shift, tile_size = turmites.tiled_grid.TILE_SHIFT, turmites.tiled_grid.TILE_SIZE
+
+        if isinstance(grid, TiledGrid):
+            keys = grid.tile_keys()
+        elif grid.bounded:
+            keys = [
+                (tile_x, tile_y)
+                for tile_y in range((grid.height + tile_size - 1) >> tile_shift)
+                for tile_x in range((grid.width + tile_size - 1) >> tile_shift)
+            ]
+        else:
+            keys = list({(x >> tile_shift, y >> tile_shift) for (x, y), _ in grid.items()})
+
+        return [(tile_x << tile_shift, tile_y << tile_shift, tile_size, tile_size) for tile_x, tile_y in keys]
+
+    def populate_visible(self):
+        if not self.pending_rects:
+            return
+
+        x, y, width, height = self.visible_cells_rect()
+        if width * height > self._max_visible_population_cells:
+            # zoomed out too far, leave it to populate_step
+            return
+
+        grid = self.turmite_model.grid
+        chunk_size = self._population_chunk_size
+
+        for chunk_x in range(x // chunk_size, (x + width) // chunk_size + 1):
+            for chunk_y in range(y // chunk_size, (y + height) // chunk_size + 1):
+                if (chunk_x, chunk_y) in self.populated_chunks:
+                    continue
+                self.populated_chunks.add((chunk_x, chunk_y))
+
+                for position, cell_state in grid.items_in_rect(
+                        (chunk_x * chunk_size, chunk_y * chunk_size, chunk_size, chunk_size)
+                ):
+                    if position not in self.cell_graphics_items:
+                        self.update_cell(position, cell_state)
+
+    def populate_step(self):
+        grid = self.turmite_model.grid
+
+        done = 0
+        while self.pending_positions and done < self._population_batch_size:
+            position = self.pending_positions.pop()
+            self.update_cell(position, grid[position])
+            done += 1
+
+        # whole tiles until the batch is full, the grid is read as it is now
+        while self.pending_rects and done < self._population_batch_size:
+            for position, cell_state in grid.items_in_rect(self.pending_rects.pop()):
+                # cells that changed in the meantime are already up-to-date
+                if position not in self.cell_graphics_items:
+                    self.update_cell(position, cell_state)
+                done += 1
+
+        self.population_progress_bar.setValue(self.population_progress_bar.maximum() - len(self.pending_rects))
+
+        if not self.pending_rects and not self.pending_positions:
+            self.stop_population()
+
+    def stop_population(self):
+        self.population_timer.stop()
+        self.pending_rects = []
+        self.pending_positions = set()
+        self.population_progress_bar.hide()
+
+    def disconnect_ui(self):
+        """Stops following the simulation view, which is taken over by the view of the next project."""
+        self.view.horizontalScrollBar().valueChanged.disconnect(self.on_scroll)
+        self.view.verticalScrollBar().valueChanged.disconnect(self.on_scroll)
+        self.project_view.ui.actionResetSimulationViewZoom.triggered.disconnect(self.reset_zoom)
+
+    def on_scroll(self, _value: int):
+        self.on_view_changed()
+
+    def reset_zoom(self):
+        self.view.resetTransform()
+
+    def on_view_changed(self):
+        self.populate_visible()
+
+        if self.turmites_rect is None:
+            return
+        x, y, width, height = self.visible_cells_rect()
+        drawn_x, drawn_y, drawn_width, drawn_height = self.turmites_rect
+        if not (
+            drawn_x <= x and drawn_y <= y and x + width <= drawn_x + drawn_width and y + height <= drawn_y + drawn_height
+        ):
+            self.draw_turmites()
 
     def on_wheel_event(self, event: QtG.QWheelEvent):
         if event.angleDelta().y() > 0:
@@ -248,34 +717,54 @@ class TurmitesGraphicsView:
         else:
             self.view.scale(0.9, 0.9)
 
+        self.on_view_changed()
+
+    def turmite_at(self, position: Position) -> int | None:
+        """The index of a turmite on the cell. If there are several, repeated calls go through all of them."""
+        self.turmite_index.sync(self.turmite_model.turmites)
+        indices = self.turmite_index.at(position)
+        if not indices:
+            return None
+
+        current = self.project_view.ui.selectedTurmiteComboBox.currentIndex()
+        return next((i for i in indices if i > current), indices[0])
+
     def scene_mouse_press_event(self, event):
+        if event.button() == QtC.Qt.LeftButton:
+            # clicking a turmite selects it
+            position = int(event.scenePos().x() // self._scale), int(event.scenePos().y() // self._scale)
+            index = self.turmite_at(position)
+            if index is not None:
+                self.project_view.ui.selectedTurmiteComboBox.setCurrentIndex(index)
+            return
+
         if event.button() != QtC.Qt.RightButton:
             return
 
         x = event.scenePos().x()
         y = event.scenePos().y()
         if self.project_view.ui.paintToolButton.isChecked():
-            selected_states = self.project_view.ui.cellStatesTableWidget.selectedIndexes()
-            if not selected_states:
-                msg_box = QtW.QMessageBox()
-                msg_box.setText("No cell state selected. Select a cell state in the lower right table to paint.")
-                msg_box.setIcon(QtW.QMessageBox.Critical)
-                msg_box.exec()
+            selected_state = self.project_view.selected_cell_state()
+            if selected_state is None:
                 return
 
-            selected_state = self.project_view.ui.cellStatesTableWidget.cellWidget(0, selected_states[0].column()).state
-            self.turmite_model.grid[x // self._scale, y // self._scale] = selected_state
+            self.turmite_model.grid[int(x // self._scale), int(y // self._scale)] = selected_state
             self.draw_turmites()
 
+        elif self.project_view.ui.rectangleToolButton.isChecked():
+            self.rectangle_start = int(x // self._scale), int(y // self._scale)
+
         elif self.project_view.ui.placeToolButton.isChecked():
             curr_t_i = self.project_view.ui.selectedTurmiteComboBox.currentIndex()
-            new_turmite = copy.deepcopy(self.turmite_model.turmites[curr_t_i])
+            # the copy shares the transition table, which is only copied once it gets edited
+            new_turmite = copy.copy(self.turmite_model.turmites[curr_t_i])
             new_state_colors = copy.deepcopy(self.turmite_state_colors[curr_t_i])
 
-            new_turmite.position = x // self._scale, y // self._scale
+            new_turmite.position = int(x // self._scale), int(y // self._scale)
 
             self.turmite_model.turmites.append(new_turmite)
             self.turmite_state_colors.append(new_state_colors)
+            self.turmite_model.invalidate_hash()
 
             self.project_view.draw_turmites_combo_box()
             self.project_view.ui.selectedTurmiteComboBox.setCurrentIndex(len(self.turmite_model.turmites) - 1)
@@ -283,37 +772,26 @@ class TurmitesGraphicsView:
 
             self.draw_turmites()
 
+    def scene_mouse_release_event(self, event):
+        if event.button() != QtC.Qt.RightButton or self.rectangle_start is None:
+            return
 
+        start_x, start_y = self.rectangle_start
+        self.rectangle_start = None
+        end_x, end_y = int(event.scenePos().x() // self._scale), int(event.scenePos().y() // self._scale)
 
-class AddListEntryButton(QtW.QWidget):
-    def __init__(self, parent, callback):
-        super().__init__(parent)
-
-        self.main_layout = QtW.QVBoxLayout()
-        self.button = QtW.QPushButton("Add transition table entry")
-        self.main_layout.addWidget(self.button)
-        self.setLayout(self.main_layout)
-
-        self.callback = callback
-        self.button.clicked.connect(callback)
-
-
-class RemoveListEntryButton(QtW.QWidget):
-    def __init__(self, parent, callback):
-        super().__init__(parent)
+        if not self.project_view.ui.rectangleToolButton.isChecked():
+            return
 
-        self.main_layout = QtW.QHBoxLayout()
-        self.button = QtW.QPushButton("Remove")
-        self.main_layout.addWidget(self.button)
-        self.setLayout(self.main_layout)
+        selected_state = self.project_view.selected_cell_state()
+        if selected_state is None:
+            return
 
-        self.set_callback(callback)
-    def set_callback(self, callback):
-        try:
-            self.button.disconnect()
-        except TypeError:
-            pass
-        self.button.clicked.connect(callback)
+        self.turmite_model.grid.fill_rect(
+            (min(start_x, end_x), min(start_y, end_y), abs(end_x - start_x) + 1, abs(end_y - start_y) + 1),
+            selected_state
+        )
+        self.draw_turmites()
 
 
 @dataclasses.dataclass
@@ -323,21 +801,263 @@ class Project:
     turmite_state_colors: list[StateColors] = dataclasses.field(default_factory=list)
 
     def to_json(self) -> dict:
+        return {"model": self.model.to_json(), **self.colors_to_json()}
+
+    def fork(self) -> "Project":
+        """A copy of the project that can be changed independently, see :meth:`MultipleTurmiteModel.fork`."""
+        return Project(
+            self.model.fork(), copy.deepcopy(self.cell_state_colors), copy.deepcopy(self.turmite_state_colors)
+        )
+
+    def colors_to_json(self) -> dict:
         return {
-            "model": self.model.to_json(),
             "cell_state_colors": self.cell_state_colors.to_json(),
             "turmite_state_colors": [colors.to_json() for colors in self.turmite_state_colors]
         }
 
     @classmethod
-    def from_json(cls, data: dict) -> "Project":
+    def from_json(cls, data: dict, model: MultipleTurmiteModel = None) -> "Project":
+        """Without ``model``, it is read from ``data`` as well."""
         return cls(
-            MultipleTurmiteModel.from_json(data["model"]),
+            MultipleTurmiteModel.from_json(data["model"]) if model is None else model,
             StateColors.from_json(data["cell_state_colors"]),
             [StateColors.from_json(colors) for colors in data["turmite_state_colors"]]
         )
 
 
+class ProjectSaver(QtC.QObject):
+    """Writes a project to a JSON file in a background thread.
+
+    A snapshot of the project is taken with :meth:`Project.fork` when the saver is created, which only takes long
+    for grids that aren't tiled, so the simulation can go on while the snapshot is serialized. The file is written
+    under a temporary name first and then replaces the old one, so an interrupted save leaves the old file intact.
+    """
+
+    progress = QtC.pyqtSignal(int)
+    """The number of characters written so far."""
+    finished = QtC.pyqtSignal(str)
+    failed = QtC.pyqtSignal(str)
+
+    _progress_interval = 1 << 20
+
+    def __init__(self, project: Project, file_path: Path):
+        super().__init__()
+
+        self.snapshot = project.fork()
+        self.file_path = file_path
+        self.thread = threading.Thread(target=self._write, name="project-saver")
+
+    def start(self):
+        self.thread.start()
+
+    def is_running(self) -> bool:
+        return self.thread.is_alive()
+
+    def wait(self):
+        if self.thread.is_alive():
+            self.thread.join()
+
+    def _write(self):
+        temporary_path = self.file_path.with_name(self.file_path.name + ".tmp")
+
+        try:
+            written = reported = 0
+            with open(temporary_path, "w", encoding="utf-8") as f:
+                for chunk in json.JSONEncoder(indent=2).iterencode(self.snapshot.to_json()):
+                    f.write(chunk)
+                    written += len(chunk)
+                    if written - reported >= self._progress_interval:
+                        reported = written
+                        self.progress.emit(written)
+
+            os.replace(temporary_path, self.file_path)
+        except (OSError, ValueError) as e:
+            temporary_path.unlink(missing_ok=True)
+            self.failed.emit(str(e))
+            return
+        finally:
+            if isinstance(self.snapshot.model.grid, SpillingGrid):
+                self.snapshot.model.grid.close()
+
+        self.finished.emit(str(self.file_path))
+
+
+class ProjectLoader(QtC.QObject):
+    """Reads a project from a JSON file in a background thread, so the window stays responsive while a large project
+    is parsed and its grid is built."""
+
+    finished = QtC.pyqtSignal(object)
+    """The :class:`Project`."""
+    failed = QtC.pyqtSignal(str)
+
+    def __init__(self, file_path: Path):
+        super().__init__()
+
+        self.file_path = file_path
+        self.thread = threading.Thread(target=self._read, name="project-loader", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def is_running(self) -> bool:
+        return self.thread.is_alive()
+
+    def _read(self):
+        try:
+            with open(self.file_path, "r", encoding="utf-8") as f:
+                project = Project.from_json(json.load(f))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            self.failed.emit(str(e))
+            return
+
+        self.finished.emit(project)
+
+
+def default_project() -> Project:
+    """Langton's ant on an empty grid, the project of a new window."""
+    return Project(
+        MultipleTurmiteModel([turmites.turmite.Turmite(turmites.examples.langtons_ant_transition_table.copy())]),
+        StateColors({0: QtG.QColor(0xFF_FFFFFF), 1: QtG.QColor(0xFF_000000)}),
+        [StateColors({0: QtG.QColor(0xFF_00FF00)})]
+    )
+
+
+def settings() -> QtC.QSettings:
+    return QtC.QSettings("Turmites", "Turmites")
+
+
+def recent_project() -> Path | None:
+    """The most recently opened or saved project, if it still exists."""
+    file_path = settings().value("recentProject", "", str)
+    if not file_path or not Path(file_path).is_file():
+        return None
+    return Path(file_path)
+
+
+def set_recent_project(file_path: Path):
+    settings().setValue("recentProject", str(Path(file_path).resolve()))
+
+
+class StartupProfile:
+    """Measures how long the phases of starting the application take and prints them to stderr if enabled."""
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self.last = _import_start
+
+    def mark(self, phase: str):
+        if not self.enabled:
+            return
+
+        now = time.perf_counter()
+        print(
+            f"{phase:<16} {(now - self.last) * 1000:8.1f} ms {(now - _import_start) * 1000:8.1f} ms total",
+            file=sys.stderr
+        )
+        self.last = now
+
+
+def autosave_directory() -> Path:
+    return Path(QtC.QStandardPaths.writableLocation(QtC.QStandardPaths.AppDataLocation)) / "autosave"
+
+
+class Autosaver(QtC.QObject):
+    """Regularly writes the project to a :class:`~turmites.journal.Journal` in the :func:`autosave_directory`, from
+    which it can be recovered after a crash.
+
+    Like in :class:`ProjectSaver`, only a fork of the grid is taken in the GUI thread and the journal is written in a
+    background thread. Most saves only append the tiles that changed since the last one. The journal is compacted
+    into a new snapshot when the deltas got larger than the snapshot, and after the grid was replaced.
+    """
+
+    failed = QtC.pyqtSignal(str)
+
+    interval = 5000
+    """Milliseconds between saves."""
+    max_records = 60
+
+    def __init__(self, project: Project):
+        super().__init__()
+
+        self.project = project
+        self.journal: turmites.journal.Journal | None = None
+        self.thread: threading.Thread | None = None
+        # the grid of the project when the journal was last compacted
+        self._grid: InfiniteGrid | None = None
+        # the grid the journal was last written from, if it needs to be closed
+        self._written_grid: InfiniteGrid | None = None
+
+        self.timer = QtC.QTimer()
+        self.timer.setInterval(self.interval)
+        self.timer.timeout.connect(self.save)
+
+    def start(self):
+        if self.journal is None:
+            directory = autosave_directory()
+            directory.mkdir(parents=True, exist_ok=True)
+            file, path = tempfile.mkstemp(".journal", dir=directory)
+            os.close(file)
+            self.journal = turmites.journal.Journal(Path(path))
+
+        self.timer.start()
+
+    def stop(self):
+        """Stops saving and deletes the journal, the project isn't needed anymore."""
+        self.timer.stop()
+        if self.thread is not None:
+            self.thread.join()
+        if self.journal is not None:
+            self.journal.delete()
+            self.journal = None
+        if isinstance(self._written_grid, SpillingGrid):
+            self._written_grid.close()
+        self._written_grid = None
+
+    def save(self):
+        # a save that takes longer than the interval delays the next one
+        if self.thread is not None and self.thread.is_alive():
+            return
+
+        model = self.project.model
+        journal = self.journal
+        extra = self.project.colors_to_json()
+
+        if not journal.started or model.grid is not self._grid or (
+                journal.size > 2 * journal.snapshot_size or journal.records >= self.max_records
+        ):
+            self._grid = model.grid
+            snapshot = model.fork()
+            grid = snapshot.grid
+
+            def write():
+                journal.compact(snapshot.to_json(include_grid=False), extra, snapshot.grid)
+        else:
+            model_data = model.to_json(include_grid=False, include_history=False)
+            grid = model.grid.fork()
+
+            def write():
+                try:
+                    journal.append(model_data, extra, grid)
+                except ValueError:
+                    journal.compact(model_data, extra, grid)
+
+        self.thread = threading.Thread(target=self._write, args=(write, grid), name="autosaver")
+        self.thread.start()
+
+    def _write(self, write: typing.Callable[[], None], grid: InfiniteGrid):
+        try:
+            write()
+        except OSError as e:
+            self.failed.emit(str(e))
+            unused_grid = grid
+        else:
+            # the journal compares the next grid with this one
+            unused_grid, self._written_grid = self._written_grid, grid
+
+        if isinstance(unused_grid, SpillingGrid):
+            unused_grid.close()
+
+
 class StateWidget(QtW.QWidget):
     def __init__(self, state: int, state_colors: StateColors, delete_callback, change_callback):
         super().__init__()
@@ -381,6 +1101,62 @@ class StateWidget(QtW.QWidget):
         self.setLayout(main_layout)
 
 
+class GridSettingsDialog(QtW.QDialog):
+    def __init__(self, parent, grid: InfiniteGrid):
+        super().__init__(parent)
+        self.setWindowTitle("Grid settings")
+
+        self.edge_combo_box = QtW.QComboBox()
+        self.edge_combo_box.addItem("Infinite", None)
+        self.edge_combo_box.addItem("Infinite, compact: stored in tiles, up to 255 cell states", "tiled")
+        for edge, description in EDGE_BEHAVIOURS.items():
+            self.edge_combo_box.addItem(f"Fixed size, {edge}: {description}", edge)
+
+        self.width_spin_box = QtW.QSpinBox()
+        self.height_spin_box = QtW.QSpinBox()
+        for spin_box in self.width_spin_box, self.height_spin_box:
+            spin_box.setRange(1, 1 << 14)
+            spin_box.setValue(100)
+
+        if grid.bounded:
+            self.edge_combo_box.setCurrentIndex(self.edge_combo_box.findData(grid.edge))
+            self.width_spin_box.setValue(grid.width)
+            self.height_spin_box.setValue(grid.height)
+        elif isinstance(grid, TiledGrid):
+            self.edge_combo_box.setCurrentIndex(self.edge_combo_box.findData("tiled"))
+
+        self.edge_combo_box.currentIndexChanged.connect(self.update_enabled)
+        self.update_enabled()
+
+        buttons = QtW.QDialogButtonBox(QtW.QDialogButtonBox.Ok | QtW.QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+
+        layout = QtW.QFormLayout(self)
+        layout.addRow("Edges:", self.edge_combo_box)
+        layout.addRow("Width:", self.width_spin_box)
+        layout.addRow("Height:", self.height_spin_box)
+        layout.addRow(QtW.QLabel("Cells outside of a fixed-size grid are removed."))
+        layout.addRow(buttons)
+
+    def update_enabled(self):
+        bounded = self.edge_combo_box.currentData() in EDGE_BEHAVIOURS
+        self.width_spin_box.setEnabled(bounded)
+        self.height_spin_box.setEnabled(bounded)
+
+    def create_grid(self, grid: InfiniteGrid) -> InfiniteGrid:
+        edge = self.edge_combo_box.currentData()
+
+        if edge is None:
+            new_grid = InfiniteGrid(grid.default)
+            new_grid.set_many(grid.items())
+            return new_grid
+        if edge == "tiled":
+            return TiledGrid.from_grid(grid)
+
+        return BoundedGrid.from_grid(grid, self.width_spin_box.value(), self.height_spin_box.value(), edge)
+
+
 class ProjectView:
     def __init__(self, project: Project, ui: Ui_MainWindow):
         self.project = project
@@ -390,73 +1166,51 @@ class ProjectView:
         self.tick_timer.timeout.connect(self.tick)
         self.tick_timer.setInterval(int(1 / 60 * 1000))
 
-    def draw_transition_table(self):
-        table = self.ui.transitionTableTableWidget
-
-        turmite = self.current_turmite()
-        state_colors = self.current_turmite_colors()
-
-        table.setRowCount(len(turmite.transition_table))
+        if turmites.jit.available():
+            self.engine = turmites.jit.JitEngine(self.project.model)
+        else:
+            self.engine = turmites.parallel.PartitionedEngine(self.project.model)
 
-        for row, (key, value) in enumerate(turmite.transition_table):
-            cell_color, turmite_state = key
-            turn_direction, new_cell_color, new_turmite_state = value
+        self.transition_table_model: TransitionTableModel | None = None
+        self.project_saver: ProjectSaver | None = None
 
-            update_callback = lambda *_: self.update_transition_table()
+        # the project the simulation is compared with by compare_with_checkpoint
+        self.checkpoint: Project | None = None
+        self.comparison_loader: ProjectLoader | None = None
 
-            table.setCellWidget(row, 0, StateComboBox(cell_color, self.project.cell_state_colors, update_callback))
-            table.setCellWidget(row, 1, StateComboBox(turmite_state, state_colors, update_callback))
-            table.setCellWidget(row, 2, TurnDirectionComboBox(turn_direction, update_callback))
-            table.setCellWidget(row, 3, StateComboBox(new_cell_color, self.project.cell_state_colors, update_callback))
-            table.setCellWidget(row, 4, StateComboBox(new_turmite_state, state_colors, update_callback))
-            remove_callback = lambda *_, __row=row: self.remove_transition_table_entry(__row)
-            table.setCellWidget(row, 5, RemoveListEntryButton(table, remove_callback))
+        self.result_cache = turmites.cache.ResultCache()
 
-        self.draw_add_transition_table_entry()
+        self.autosaver = Autosaver(project)
+        self.autosaver.failed.connect(lambda message: self.ui.statusbar.showMessage(f"Autosave failed: {message}"))
 
-        table.resizeRowsToContents()
-        table.resizeColumnsToContents()
+    def draw_transition_table(self):
+        model = TransitionTableModel(
+            self.project.model, self.current_turmite(), self.project.cell_state_colors, self.current_turmite_colors()
+        )
+        model.dataChanged.connect(lambda *_: self.update_missing_entries())
+        model.rowsInserted.connect(lambda *_: self.update_missing_entries())
+        model.rowsRemoved.connect(lambda *_: self.update_missing_entries())
+        model.entry_rejected.connect(lambda message: self.ui.statusbar.showMessage(message, 5000))
 
-    def draw_add_transition_table_entry(self):
-        row = self.ui.transitionTableTableWidget.rowCount()
-        self.ui.transitionTableTableWidget.insertRow(row)
+        # the view has to let go of the previous model before it is deleted
+        self.ui.transitionTableTableView.setModel(model)
+        self.transition_table_model = model
 
-        self.ui.transitionTableTableWidget.setCellWidget(row, 0, AddListEntryButton(self.ui.transitionTableTableWidget,
-                                                                                    self.add_transition_table_entry))
+        self.update_missing_entries()
 
     def add_transition_table_entry(self):
-        table = self.ui.transitionTableTableWidget
-
-        state_colors = self.current_turmite_colors()
-
-        row = table.rowCount() - 1
-        update_callback = lambda *_: self.update_transition_table()
-
-        table.setCellWidget(row, 0, StateComboBox(None, self.project.cell_state_colors, update_callback))
-        table.setCellWidget(row, 1, StateComboBox(None, state_colors, update_callback))
-        table.setCellWidget(row, 2, TurnDirectionComboBox(None, update_callback))
-        table.setCellWidget(row, 3, StateComboBox(None, self.project.cell_state_colors, update_callback))
-        table.setCellWidget(row, 4, StateComboBox(None, state_colors, update_callback))
-        remove_callback = lambda *_, __row=row: self.remove_transition_table_entry(__row)
-        table.setCellWidget(row, 5, RemoveListEntryButton(table, remove_callback))
-
-        self.draw_add_transition_table_entry()
-
-        table.resizeRowsToContents()
-
-        self.update_transition_table()
-
-    def remove_transition_table_entry(self, row: int):
-        self.ui.transitionTableTableWidget.removeRow(row)
-        self.update_transition_table()
-
-        table = self.ui.transitionTableTableWidget
+        if not self.transition_table_model.add_entry():
+            QtW.QMessageBox.information(
+                self.ui.centralwidget, "Add transition table entry",
+                "Every combination of cell state and turmite state already has an entry."
+            )
+            return
 
-        for row in range(self.ui.transitionTableTableWidget.rowCount() - 1):
-            remove_callback = lambda *_, __row=row: self.remove_transition_table_entry(__row)
-            table.cellWidget(row, 5).set_callback(remove_callback)
+        self.ui.transitionTableTableView.scrollToBottom()
 
-        # self.draw_transition_table()
+    def remove_transition_table_entries(self):
+        selected_indexes = self.ui.transitionTableTableView.selectionModel().selectedIndexes()
+        self.transition_table_model.remove_rows(index.row() for index in selected_indexes)
 
     def current_turmite(self):
         return self.project.model.turmites[self.ui.selectedTurmiteComboBox.currentIndex()]
@@ -464,51 +1218,20 @@ class ProjectView:
     def current_turmite_colors(self):
         return self.project.turmite_state_colors[self.ui.selectedTurmiteComboBox.currentIndex()]
 
-    def update_transition_table(self):
-        # iterate over all rows in the self.ui.transitionTableTableWidget
-        # get the current state of the QComboBoxes
-        # update the transition table
-
-        table = self.ui.transitionTableTableWidget
-
-        self.current_turmite().transition_table.clear()
-        for row in reversed(range(self.ui.transitionTableTableWidget.rowCount())):
-            if table.cellWidget(row, 4) is None:
-                continue
-            cell_color = table.cellWidget(row, 0).get_current_state()
-            turmite_state = table.cellWidget(row, 1).get_current_state()
-            turn_direction = table.cellWidget(row, 2).get_current_turn_direction()
-            new_cell_color = table.cellWidget(row, 3).get_current_state()
-            new_turmite_state = table.cellWidget(row, 4).get_current_state()
-
-            if (cell_color, turmite_state) in self.current_turmite().transition_table:
-                # disable row
-                for col in range(2, table.columnCount() - 1):
-                    table.cellWidget(row, col).setEnabled(False)
-            else:
-                # enable row
-                for col in range(2, table.columnCount() - 1):
-                    table.cellWidget(row, col).setEnabled(True)
+    @staticmethod
+    def format_entries(entries: typing.Iterable[tuple[CellColor, TurmiteState]]) -> str:
+        return ", ".join(f"({cell_color}, {turmite_state})" for cell_color, turmite_state in sorted(entries))
 
-            self.current_turmite().transition_table.set_entry(
-                cell_color, turmite_state,
-                turn_direction, new_cell_color, new_turmite_state
-            )
+    def update_missing_entries(self):
+        """Lists the (cell state, turmite state) pairs the current turmite can run into but has no entry for."""
+        report = turmites.analysis.check_completeness(self.project.model)
+        missing = report.missing[self.ui.selectedTurmiteComboBox.currentIndex()]
 
-        self.current_turmite().transition_table.clear()
-        for row in range(self.ui.transitionTableTableWidget.rowCount()):
-            if table.cellWidget(row, 4) is None:
-                continue
-            cell_color = table.cellWidget(row, 0).get_current_state()
-            turmite_state = table.cellWidget(row, 1).get_current_state()
-            turn_direction = table.cellWidget(row, 2).get_current_turn_direction()
-            new_cell_color = table.cellWidget(row, 3).get_current_state()
-            new_turmite_state = table.cellWidget(row, 4).get_current_state()
-
-            self.current_turmite().transition_table.set_entry(
-                cell_color, turmite_state,
-                turn_direction, new_cell_color, new_turmite_state
-            )
+        if missing:
+            self.ui.missingEntriesLabel.setText(f"Missing entries (cell state, turmite state): "
+                                                f"{self.format_entries(missing)}")
+        else:
+            self.ui.missingEntriesLabel.setText("")
 
     def draw_turmites_combo_box(self):
         self.ui.selectedTurmiteComboBox.clear()
@@ -516,7 +1239,10 @@ class ProjectView:
         for i, turmite in enumerate(self.project.model.turmites):
             self.ui.selectedTurmiteComboBox.addItem(f"#{i + 1}")
 
-        self.ui.selectedTurmiteComboBox.disconnect()
+        try:
+            self.ui.selectedTurmiteComboBox.disconnect()
+        except TypeError:
+            pass
         self.ui.selectedTurmiteComboBox.currentIndexChanged.connect(self.draw_turmite_specific)
 
     def draw_state_table(self, table: QtW.QTableWidget, state_colors: StateColors, msg: str):
@@ -555,7 +1281,6 @@ class ProjectView:
         self.draw_transition_table()
 
         self.turmites_view.init_grid()
-        self.turmites_view.draw_turmites()
 
     def remove_state_color(self, table: QtW.QTableWidget, state_colors: StateColors, index: int, msg: str) -> None:
         key = list(state_colors.states.keys())[index]
@@ -565,7 +1290,6 @@ class ProjectView:
         self.draw_transition_table()
 
         self.turmites_view.init_grid()
-        self.turmites_view.draw_turmites()
 
     @staticmethod
     def setup_state_table(table: QtW.QTableWidget):
@@ -584,20 +1308,52 @@ class ProjectView:
         )
 
     def init(self):
-        self.ui.transitionTableTableWidget.resizeColumnsToContents()
-        self.ui.transitionTableTableWidget.horizontalHeader().setSectionResizeMode(
-            QtW.QHeaderView.ResizeMode.Interactive
-        )
+        self.ui.transitionTableTableView.setItemDelegate(TransitionTableDelegate(self.ui.transitionTableTableView))
 
         self.draw_state_table(self.ui.cellStatesTableWidget, self.project.cell_state_colors, "Add cell state")
         self.draw_turmites_combo_box()
 
         self.draw_turmite_specific()
 
+        self.ui.transitionTableTableView.resizeColumnsToContents()
+        self.ui.transitionTableTableView.horizontalHeader().setSectionResizeMode(
+            QtW.QHeaderView.ResizeMode.Interactive
+        )
+
         self.ui.actionSaveProject.triggered.connect(self.save_project)
         self.ui.actionClearSimulationView.triggered.connect(self.clear_simulation_view)
-        self.ui.removeTurmitePushButton.disconnect()
+        try:
+            self.ui.actionRandomFillVisibleRegion.disconnect()
+        except TypeError:
+            pass
+        self.ui.actionRandomFillVisibleRegion.triggered.connect(self.random_fill_visible_region)
+        try:
+            self.ui.actionGridSettings.disconnect()
+        except TypeError:
+            pass
+        self.ui.actionGridSettings.triggered.connect(self.edit_grid_settings)
+        try:
+            self.ui.actionExportGridImage.disconnect()
+        except TypeError:
+            pass
+        self.ui.actionExportGridImage.triggered.connect(self.export_grid_image)
+        try:
+            self.ui.actionExportFrames.disconnect()
+        except TypeError:
+            pass
+        self.ui.actionExportFrames.triggered.connect(self.export_frames)
+        try:
+            self.ui.removeTurmitePushButton.disconnect()
+        except TypeError:
+            pass
         self.ui.removeTurmitePushButton.clicked.connect(self.remove_turmite)
+        try:
+            self.ui.addTransitionTableEntryPushButton.disconnect()
+            self.ui.removeTransitionTableEntriesPushButton.disconnect()
+        except TypeError:
+            pass
+        self.ui.addTransitionTableEntryPushButton.clicked.connect(self.add_transition_table_entry)
+        self.ui.removeTransitionTableEntriesPushButton.clicked.connect(self.remove_transition_table_entries)
 
         self.turmites_view = TurmitesGraphicsView(
             self.ui.simulationView,
@@ -618,27 +1374,298 @@ class ProjectView:
             self.ui.reorderUpToolButton.disconnect()
         except TypeError:
             pass
+        try:
+            self.ui.actionRecordVisits.disconnect()
+            self.ui.actionShowVisitHeatmap.disconnect()
+            self.ui.actionExportVisitHeatmap.disconnect()
+            self.ui.actionRecordPaths.disconnect()
+            self.ui.actionShowTrails.disconnect()
+            self.ui.actionExportTurmitePath.disconnect()
+            self.ui.actionAutosave.disconnect()
+        except TypeError:
+            pass
+        try:
+            self.ui.actionSetCheckpoint.disconnect()
+            self.ui.actionCompareWithCheckpoint.disconnect()
+            self.ui.actionCompareWithProject.disconnect()
+            self.ui.actionClearComparison.disconnect()
+        except TypeError:
+            pass
+        self.ui.actionSetCheckpoint.triggered.connect(self.set_checkpoint)
+        self.ui.actionCompareWithCheckpoint.triggered.connect(self.compare_with_checkpoint)
+        self.ui.actionCompareWithCheckpoint.setEnabled(False)
+        self.ui.actionCompareWithProject.triggered.connect(self.compare_with_project)
+        self.ui.actionClearComparison.triggered.connect(self.clear_comparison)
+        self.ui.actionClearComparison.setEnabled(False)
+        self.ui.actionRecordVisits.setChecked(self.project.model.visits is not None)
+        self.ui.actionRecordVisits.toggled.connect(self.set_record_visits)
+        self.ui.actionShowVisitHeatmap.setChecked(False)
+        self.ui.actionShowVisitHeatmap.toggled.connect(self.turmites_view.set_show_heatmap)
+        self.ui.actionExportVisitHeatmap.triggered.connect(self.export_visit_heatmap)
+        self.ui.actionRecordPaths.setChecked(self.project.model.paths is not None)
+        self.ui.actionRecordPaths.toggled.connect(self.set_record_paths)
+        self.ui.actionShowTrails.setChecked(False)
+        self.ui.actionShowTrails.toggled.connect(self.set_show_trails)
+        self.ui.actionExportTurmitePath.triggered.connect(self.export_turmite_path)
+        self.ui.actionAutosave.toggled.connect(self.set_autosave)
+        self.set_autosave(self.ui.actionAutosave.isChecked())
         self.ui.actionPlay.triggered.connect(self.start_simulation)
         self.ui.playToolButton.clicked.connect(self.start_simulation)
         self.ui.fullStepToolButton.clicked.connect(self.full_step)
         self.ui.actionFullStep.triggered.connect(self.full_step)
         self.ui.stepOneTurmiteToolButton.clicked.connect(self.step_one_turmite)
         self.ui.actionStepOneTurmite.triggered.connect(self.step_one_turmite)
+        try:
+            self.ui.actionJumpToIteration.disconnect()
+        except TypeError:
+            pass
+        self.ui.actionJumpToIteration.triggered.connect(self.jump_to_iteration)
         self.ui.reorderUpToolButton.clicked.connect(self.reorder_up)
         self.ui.reorderDownToolButton.clicked.connect(self.reorder_down)
 
         self.update_iteration_nr()
 
+    def disconnect_ui(self):
+        """Disconnects the widgets and actions of the main window from this view, so they don't act on its project
+        anymore once another project replaced it."""
+        self.turmites_view.disconnect_ui()
+        # the simulation is stopped first, so the play button and action are connected to start_simulation
+        connections = (
+            (self.ui.selectedTurmiteComboBox.currentIndexChanged, self.draw_turmite_specific),
+            (self.ui.actionSaveProject.triggered, self.save_project),
+            (self.ui.actionClearSimulationView.triggered, self.clear_simulation_view),
+            (self.ui.actionRandomFillVisibleRegion.triggered, self.random_fill_visible_region),
+            (self.ui.actionGridSettings.triggered, self.edit_grid_settings),
+            (self.ui.actionExportGridImage.triggered, self.export_grid_image),
+            (self.ui.actionExportFrames.triggered, self.export_frames),
+            (self.ui.removeTurmitePushButton.clicked, self.remove_turmite),
+            (self.ui.addTransitionTableEntryPushButton.clicked, self.add_transition_table_entry),
+            (self.ui.removeTransitionTableEntriesPushButton.clicked, self.remove_transition_table_entries),
+            (self.ui.actionSetCheckpoint.triggered, self.set_checkpoint),
+            (self.ui.actionCompareWithCheckpoint.triggered, self.compare_with_checkpoint),
+            (self.ui.actionCompareWithProject.triggered, self.compare_with_project),
+            (self.ui.actionClearComparison.triggered, self.clear_comparison),
+            (self.ui.actionRecordVisits.toggled, self.set_record_visits),
+            (self.ui.actionShowVisitHeatmap.toggled, self.turmites_view.set_show_heatmap),
+            (self.ui.actionExportVisitHeatmap.triggered, self.export_visit_heatmap),
+            (self.ui.actionRecordPaths.toggled, self.set_record_paths),
+            (self.ui.actionShowTrails.toggled, self.set_show_trails),
+            (self.ui.actionExportTurmitePath.triggered, self.export_turmite_path),
+            (self.ui.actionAutosave.toggled, self.set_autosave),
+            (self.ui.actionPlay.triggered, self.start_simulation),
+            (self.ui.playToolButton.clicked, self.start_simulation),
+            (self.ui.fullStepToolButton.clicked, self.full_step),
+            (self.ui.actionFullStep.triggered, self.full_step),
+            (self.ui.stepOneTurmiteToolButton.clicked, self.step_one_turmite),
+            (self.ui.actionStepOneTurmite.triggered, self.step_one_turmite),
+            (self.ui.actionJumpToIteration.triggered, self.jump_to_iteration),
+            (self.ui.reorderUpToolButton.clicked, self.reorder_up),
+            (self.ui.reorderDownToolButton.clicked, self.reorder_down),
+        )
+        for signal, slot in connections:
+            try:
+                signal.disconnect(slot)
+            except TypeError:
+                pass
+
     def save_project(self):
         file_path, *_ = QtW.QFileDialog.getSaveFileName(self.ui.centralwidget, "Save Project", "", "JSON (*.json)")
 
         if not file_path:
             return
 
-        file_path = Path(file_path).with_suffix(".json")
+        self.save_project_to(Path(file_path).with_suffix(".json"))
+
+    def save_project_to(self, file_path: Path):
+        """Saves the project in the background, see :class:`ProjectSaver`."""
+        if self.project_saver is not None and self.project_saver.is_running():
+            QtW.QMessageBox.information(
+                self.ui.centralwidget, "Save Project", "The project is still being saved, please try again later."
+            )
+            return
+
+        saver = ProjectSaver(self.project, file_path)
+        saver.progress.connect(
+            lambda written: self.ui.statusbar.showMessage(f"Saving {file_path.name}: {written / 2 ** 20:.1f} MB")
+        )
+        saver.finished.connect(lambda *_: self.ui.statusbar.showMessage(f"Saved {file_path.name}", 5000))
+        saver.finished.connect(set_recent_project)
+        saver.failed.connect(
+            lambda message: QtW.QMessageBox.critical(self.ui.centralwidget, "Save failed", message)
+        )
+
+        self.project_saver = saver
+        self.ui.statusbar.showMessage(f"Saving {file_path.name}")
+        saver.start()
+
+    def set_autosave(self, autosave: bool):
+        if autosave:
+            self.autosaver.start()
+        else:
+            self.autosaver.stop()
+
+    def export_grid_image(self):
+        file_path, *_ = QtW.QFileDialog.getSaveFileName(self.ui.centralwidget, "Export grid image", "", "PNG (*.png)")
+
+        if not file_path:
+            return
+
+        renderer = turmites.rendering.GridRenderer(
+            self.project.cell_state_colors.to_rgb(),
+            [colors.to_rgb() for colors in self.project.turmite_state_colors]
+        )
+
+        progress_dialog = QtW.QProgressDialog("Exporting grid image...", "Cancel", 0, 0, self.ui.centralwidget)
+        progress_dialog.setWindowModality(QtC.Qt.WindowModal)
+
+        def progress(done: int, total: int) -> bool:
+            progress_dialog.setMaximum(total)
+            progress_dialog.setValue(done)
+            QtW.QApplication.processEvents()
+            return not progress_dialog.wasCanceled()
+
+        try:
+            turmites.rendering.export_image(
+                self.project.model, renderer, Path(file_path).with_suffix(".png"), progress=progress
+            )
+        except (OSError, ValueError) as e:
+            QtW.QMessageBox.critical(self.ui.centralwidget, "Export failed", str(e))
+        finally:
+            progress_dialog.close()
+            if isinstance(model.grid, SpillingGrid):
+                model.grid.close()
+
+    def set_record_visits(self, record_visits: bool):
+        if record_visits == (self.project.model.visits is not None):
+            return
+
+        self.project.model.visits = turmites.visits.VisitCounter() if record_visits else None
+        self.turmites_view.update_heatmap(redraw=True)
+
+    def export_visit_heatmap(self):
+        if self.project.model.visits is None:
+            QtW.QMessageBox.information(
+                self.ui.centralwidget, "Export visit heatmap",
+                "No visits have been recorded. Enable Simulation > Record visits and run the simulation first."
+            )
+            return
+
+        file_path, *_ = QtW.QFileDialog.getSaveFileName(
+            self.ui.centralwidget, "Export visit heatmap", "", "PNG (*.png)"
+        )
+        if not file_path:
+            return
+
+        try:
+            with open(Path(file_path).with_suffix(".png"), "wb") as f:
+                self.project.model.visits.write_png(f)
+        except (OSError, ValueError) as e:
+            QtW.QMessageBox.critical(self.ui.centralwidget, "Export failed", str(e))
+
+    def set_record_paths(self, record_paths: bool):
+        if record_paths == (self.project.model.paths is not None):
+            return
+
+        self.project.model.paths = turmites.paths.PathRecorder() if record_paths else None
+        self.turmites_view.draw_trails()
+
+    def set_show_trails(self, show_trails: bool):
+        if not show_trails:
+            self.turmites_view.set_trail_range(None)
+            return
+
+        iteration = self.project.model.iteration
+        first, ok = QtW.QInputDialog.getInt(
+            self.ui.centralwidget, "Show trails", "First iteration:", max(0, iteration - 1000), 0
+        )
+        if ok:
+            last, ok = QtW.QInputDialog.getInt(
+                self.ui.centralwidget, "Show trails", "Last iteration:", max(first, iteration), first
+            )
+        if not ok:
+            self.ui.actionShowTrails.setChecked(False)
+            return
+
+        self.turmites_view.set_trail_range((first, last))
+
+    def export_turmite_path(self):
+        paths = self.project.model.paths
+        turmite_index = self.ui.selectedTurmiteComboBox.currentIndex()
+        if paths is None or turmite_index not in paths.paths:
+            QtW.QMessageBox.information(
+                self.ui.centralwidget, "Export turmite path",
+                "No path has been recorded for this turmite. Enable Simulation > Record paths and run the "
+                "simulation first."
+            )
+            return
+
+        file_path, *_ = QtW.QFileDialog.getSaveFileName(
+            self.ui.centralwidget, "Export turmite path", "", "CSV (*.csv)"
+        )
+        if not file_path:
+            return
+
+        try:
+            with open(Path(file_path).with_suffix(".csv"), "w", encoding="utf-8", newline="") as f:
+                paths[turmite_index].write_csv(f, grid=self.project.model.grid)
+        except OSError as e:
+            QtW.QMessageBox.critical(self.ui.centralwidget, "Export failed", str(e))
+
+    def export_frames(self):
+        frames, ok = QtW.QInputDialog.getInt(self.ui.centralwidget, "Export frames", "Number of frames:", 100, 1)
+        if not ok:
+            return
+        iterations_per_frame, ok = QtW.QInputDialog.getInt(
+            self.ui.centralwidget, "Export frames", "Iterations per frame:", 100, 1
+        )
+        if not ok:
+            return
+        scale, ok = QtW.QInputDialog.getInt(self.ui.centralwidget, "Export frames", "Pixels per cell:", 4, 1, 64)
+        if not ok:
+            return
+
+        file_path, selected_filter = QtW.QFileDialog.getSaveFileName(
+            self.ui.centralwidget, "Export frames", "", "PNG frame sequence (*);;Video (*.mp4)"
+        )
+        if not file_path:
+            return
+
+        # the run is rendered from a copy, the project itself stays at the current iteration
+        model = self.project.model.fork()
+        renderer = turmites.rendering.GridRenderer(
+            self.project.cell_state_colors.to_rgb(),
+            [colors.to_rgb() for colors in self.project.turmite_state_colors]
+        )
+        rect = self.turmites_view.visible_cells_rect()
+
+        progress_dialog = QtW.QProgressDialog("Exporting frames...", "Cancel", 0, frames, self.ui.centralwidget)
+        progress_dialog.setWindowModality(QtC.Qt.WindowModal)
 
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(self.project.to_json(), f, indent=2)
+        def progress(done: int, total: int) -> bool:
+            progress_dialog.setValue(done)
+            QtW.QApplication.processEvents()
+            return not progress_dialog.wasCanceled()
+
+        try:
+            if selected_filter.startswith("Video"):
+                turmites.rendering.export_video(
+                    model, renderer, Path(file_path).with_suffix(".mp4"), frames, iterations_per_frame, rect, scale,
+                    progress=progress
+                )
+            else:
+                turmites.rendering.export_frames(
+                    model, renderer, Path(file_path), frames, iterations_per_frame, rect, scale, progress=progress
+                )
+        except turmites.turmite.UnknownStateError:
+            QtW.QMessageBox.critical(
+                self.ui.centralwidget,
+                "Unknown state encountered",
+                "The export was stopped because a turmite reached a state that has no entry in its transition table."
+            )
+        except (OSError, RuntimeError, ValueError) as e:
+            QtW.QMessageBox.critical(self.ui.centralwidget, "Export failed", str(e))
+        finally:
+            progress_dialog.close()
 
     def draw_turmite_specific(self):
         self.draw_transition_table()
@@ -646,6 +1673,22 @@ class ProjectView:
         self.ui.turmitePositionLabel.setText(f"Position: {self.current_turmite().position}")
 
     def start_simulation(self):
+        report = turmites.analysis.check_completeness(self.project.model)
+        if not report.complete:
+            missing = "\n".join(
+                f"Turmite #{i + 1}: {self.format_entries(entries)}" for i, entries in enumerate(report.missing) if entries
+            )
+            answer = QtW.QMessageBox.warning(
+                self.ui.centralwidget,
+                "Incomplete transition tables",
+                "The turmites can reach the following (cell state, turmite state) pairs, which have no entry in "
+                f"their transition table:\n{missing}\n"
+                "The simulation will be paused when it runs into one of them. Start anyway?",
+                QtW.QMessageBox.Ok | QtW.QMessageBox.Cancel
+            )
+            if answer != QtW.QMessageBox.Ok:
+                return
+
         try:
             self.ui.playToolButton.clicked.disconnect(self.start_simulation)
             self.ui.actionPlay.triggered.disconnect(self.start_simulation)
@@ -658,6 +1701,10 @@ class ProjectView:
         self.ui.actionPlay.setText("Stop")
 
     def stop_simulation(self):
+        # otherwise start_simulation would be connected twice
+        if not self.tick_timer.isActive():
+            return
+
         try:
             self.ui.playToolButton.clicked.disconnect(self.stop_simulation)
             self.ui.actionPlay.triggered.disconnect(self.stop_simulation)
@@ -674,21 +1721,20 @@ class ProjectView:
         self.ui.turmitePositionLabel.setText(f"Position: {self.current_turmite().position}")
 
     def tick(self):
-        for _ in range(self.ui.speedSpinBox.value()):
-            try:
-                self.project.model.step()
-            except turmites.turmite.UnknownStateError:
-                self.stop_simulation()
-                current_turmite = self.project.model.small_step
-                QtW.QMessageBox.critical(
-                    self.ui.centralwidget,
-                    f"Unknown state encountered in Turmite #{current_turmite + 1}",
-                    "The simulation was paused. There exists no entry in the transition table for the following:\n"
-                    f"Cell state: {self.project.model.grid[self.project.model.turmites[current_turmite].position]}\n"
-                    f"Turmite state: {self.project.model.turmites[current_turmite].state}\n"
-                    f"Add an appropriate entry to the transition table and resume the simulation."
-                )
-                return
+        try:
+            self.engine.run(self.ui.speedSpinBox.value())
+        except turmites.turmite.UnknownStateError:
+            self.stop_simulation()
+            current_turmite = self.project.model.small_step
+            QtW.QMessageBox.critical(
+                self.ui.centralwidget,
+                f"Unknown state encountered in Turmite #{current_turmite + 1}",
+                "The simulation was paused. There exists no entry in the transition table for the following:\n"
+                f"Cell state: {self.project.model.grid[self.project.model.turmites[current_turmite].position]}\n"
+                f"Turmite state: {self.project.model.turmites[current_turmite].state}\n"
+                f"Add an appropriate entry to the transition table and resume the simulation."
+            )
+            return
 
         self.update_iteration_nr()
         self.turmites_view.draw_turmites()
@@ -731,6 +1777,109 @@ class ProjectView:
         self.update_iteration_nr()
         self.turmites_view.draw_turmites()
 
+    def jump_to_iteration(self):
+        """Runs the simulation up to an iteration in one go, see :func:`turmites.cache.run_cached`."""
+        self.stop_simulation()
+        model = self.project.model
+
+        iteration, ok = QtW.QInputDialog.getInt(
+            self.ui.centralwidget, "Jump to iteration", "Iteration:", model.iteration + 1000, model.iteration + 1,
+            2 ** 31 - 1
+        )
+        if not ok:
+            return
+
+        QtW.QApplication.setOverrideCursor(QtC.Qt.WaitCursor)
+        try:
+            run = turmites.cache.run_cached(model, iteration - model.iteration, self.result_cache, self.engine.run)
+        except turmites.turmite.UnknownStateError:
+            current_turmite = model.small_step
+            QtW.QMessageBox.critical(
+                self.ui.centralwidget,
+                f"Unknown state encountered in Turmite #{current_turmite + 1}",
+                f"The simulation stopped at iteration {model.iteration}. There exists no entry in the transition "
+                f"table for the following:\n"
+                f"Cell state: {model.grid[model.turmites[current_turmite].position]}\n"
+                f"Turmite state: {model.turmites[current_turmite].state}"
+            )
+        except OSError as e:
+            QtW.QMessageBox.critical(self.ui.centralwidget, "Result cache", str(e))
+        else:
+            self.ui.statusbar.showMessage(
+                f"Reused the result of an earlier run of {run.seconds:.2f} s" if run.hit else
+                f"Ran to iteration {iteration} in {run.seconds:.2f} s",
+                5000
+            )
+        finally:
+            QtW.QApplication.restoreOverrideCursor()
+
+        self.update_iteration_nr()
+        self.turmites_view.draw_turmites()
+
+    def set_checkpoint(self):
+        self.stop_simulation()
+        self.close_checkpoint()
+        self.checkpoint = self.project.fork()
+        self.ui.actionCompareWithCheckpoint.setEnabled(True)
+        self.ui.statusbar.showMessage(f"Set a checkpoint at iteration {self.project.model.iteration}", 5000)
+
+    def close_engine(self):
+        if isinstance(self.engine, turmites.parallel.PartitionedEngine):
+            self.engine.close()
+
+    def close_checkpoint(self):
+        if self.checkpoint is not None and isinstance(self.checkpoint.model.grid, SpillingGrid):
+            self.checkpoint.model.grid.close()
+        self.checkpoint = None
+
+    def compare_with_checkpoint(self):
+        if self.checkpoint is not None:
+            self.show_comparison(self.checkpoint.model, "the checkpoint")
+
+    def compare_with_project(self):
+        file_path, *_ = QtW.QFileDialog.getOpenFileName(
+            self.ui.centralwidget, "Compare with Project", "", "JSON (*.json)"
+        )
+        if not file_path:
+            return
+
+        file_path = Path(file_path)
+        loader = ProjectLoader(file_path)
+        loader.finished.connect(lambda project: self.show_comparison(project.model, file_path.name))
+        loader.failed.connect(
+            lambda message: QtW.QMessageBox.critical(
+                self.ui.centralwidget, "Compare failed", f"Can't open {file_path.name}: {message}"
+            )
+        )
+
+        self.comparison_loader = loader
+        self.ui.statusbar.showMessage(f"Opening {file_path.name}")
+        loader.start()
+
+    def show_comparison(self, model: MultipleTurmiteModel, name: str):
+        """Highlights the differences of the simulation to the model, see :class:`turmites.diff.ModelDiff`."""
+        self.stop_simulation()
+        try:
+            diff = turmites.diff.ModelDiff.compute(model, self.project.model)
+        except ValueError as e:
+            QtW.QMessageBox.critical(self.ui.centralwidget, "Compare failed", str(e))
+            return
+
+        self.turmites_view.show_diff(diff)
+        self.ui.actionClearComparison.setEnabled(True)
+
+        counts = diff.grid.counts()
+        self.ui.statusbar.showMessage(
+            f"Compared with {name} at iteration {diff.old_iteration}: {len(diff.grid)} cells differ "
+            f"({counts[turmites.diff.ADDED]} added, {counts[turmites.diff.REMOVED]} removed, "
+            f"{counts[turmites.diff.CHANGED]} changed), {len(diff.turmites)} turmites differ"
+        )
+
+    def clear_comparison(self):
+        self.turmites_view.show_diff(None)
+        self.ui.actionClearComparison.setEnabled(False)
+        self.ui.statusbar.clearMessage()
+
     def reorder_up(self):
         if self.ui.selectedTurmiteComboBox.currentIndex() == 0:
             return
@@ -740,6 +1889,9 @@ class ProjectView:
             self.project.model.turmites[curr_t_i - 1], self.project.model.turmites[curr_t_i]
         self.project.turmite_state_colors[curr_t_i], self.project.turmite_state_colors[curr_t_i - 1] = \
             self.project.turmite_state_colors[curr_t_i - 1], self.project.turmite_state_colors[curr_t_i]
+        if self.project.model.paths is not None:
+            self.project.model.paths.swap(curr_t_i, curr_t_i - 1)
+        self.project.model.invalidate_hash()
         self.ui.selectedTurmiteComboBox.setCurrentIndex(curr_t_i - 1)
         self.turmites_view.draw_turmites()
         self.draw_turmite_specific()
@@ -753,6 +1905,9 @@ class ProjectView:
             self.project.model.turmites[curr_t_i + 1], self.project.model.turmites[curr_t_i]
         self.project.turmite_state_colors[curr_t_i], self.project.turmite_state_colors[curr_t_i + 1] = \
             self.project.turmite_state_colors[curr_t_i + 1], self.project.turmite_state_colors[curr_t_i]
+        if self.project.model.paths is not None:
+            self.project.model.paths.swap(curr_t_i, curr_t_i + 1)
+        self.project.model.invalidate_hash()
         self.ui.selectedTurmiteComboBox.setCurrentIndex(curr_t_i + 1)
         self.turmites_view.draw_turmites()
         self.draw_turmite_specific()
@@ -761,6 +1916,49 @@ class ProjectView:
         self.project.model.grid.clear()
         self.turmites_view.draw_turmites()
 
+    def random_fill_visible_region(self):
+        weights = {state: 1 for state in self.project.cell_state_colors.states}
+        if not weights:
+            return
+
+        self.project.model.grid.random_fill(self.turmites_view.visible_cells_rect(), weights)
+        self.turmites_view.draw_turmites()
+
+    def edit_grid_settings(self):
+        model = self.project.model
+        dialog = GridSettingsDialog(self.ui.centralwidget, model.grid)
+        if not dialog.exec():
+            return
+
+        try:
+            grid = dialog.create_grid(model.grid)
+        except ValueError as e:
+            QtW.QMessageBox.critical(self.ui.centralwidget, "Invalid grid settings", str(e))
+            return
+
+        if grid.bounded:
+            # turmites outside of the grid are moved to the nearest cell inside of it
+            for turmite in model.turmites:
+                x, y = turmite.position
+                turmite.position = grid.normalize(turmite.position) or (
+                    min(max(x, 0), grid.width - 1), min(max(y, 0), grid.height - 1)
+                )
+
+        model.grid = grid
+        model.invalidate_hash()
+        self.ui.set_project(self.project)
+
+    def selected_cell_state(self) -> CellColor | None:
+        selected_states = self.ui.cellStatesTableWidget.selectedIndexes()
+        if not selected_states:
+            msg_box = QtW.QMessageBox()
+            msg_box.setText("No cell state selected. Select a cell state in the lower right table to paint.")
+            msg_box.setIcon(QtW.QMessageBox.Critical)
+            msg_box.exec()
+            return None
+
+        return self.ui.cellStatesTableWidget.cellWidget(0, selected_states[0].column()).state
+
     def remove_turmite(self):
         if len(self.project.model.turmites) < 2:
             return
@@ -768,6 +1966,9 @@ class ProjectView:
         curr_t_i = self.ui.selectedTurmiteComboBox.currentIndex()
         self.project.turmite_state_colors.pop(curr_t_i)
         self.project.model.turmites.pop(curr_t_i)
+        if self.project.model.paths is not None:
+            self.project.model.paths.remove(curr_t_i)
+        self.project.model.invalidate_hash()
 
         self.draw_turmites_combo_box()
         self.turmites_view.draw_turmites()
@@ -780,11 +1981,18 @@ class MainWindow(QtW.QMainWindow, Ui_MainWindow):
         self.setupUi(self)
 
         self.project_view = None
+        self.project_loader: ProjectLoader | None = None
+        # whether the simulation actions were enabled before a project started loading
+        self.actions_enabled_before_loading: dict[QtW.QAction, bool] = {}
 
-        project = Project() if project is None else project
+        project = default_project() if project is None else project
         self.set_project(project)
 
+        # windows of forked simulations, which are kept open as long as this one exists
+        self.fork_windows: list[MainWindow] = []
+
         self.actionOpenProject.triggered.connect(self.open_project)
+        self.actionForkSimulation.triggered.connect(self.fork_simulation)
         self.actionQuit.triggered.connect(self.close)
 
     def open_project(self):
@@ -793,15 +2001,76 @@ class MainWindow(QtW.QMainWindow, Ui_MainWindow):
         if not file_path:
             return
 
-        with open(file_path, "r", encoding="utf-8") as f:
-            project = Project.from_json(json.load(f))
+        self.load_project(Path(file_path))
+
+    def load_project(self, file_path: Path) -> ProjectLoader:
+        """Opens the project in the background, the current one can be used until it is loaded."""
+        loader = ProjectLoader(file_path)
+        loader.finished.connect(lambda project: self.project_loaded(loader, project))
+        loader.failed.connect(lambda message: self.project_load_failed(loader, message))
+
+        self.project_loader = loader
+        self.set_loading(True)
+        self.statusBar().showMessage(f"Opening {file_path.name}")
+        loader.start()
+        return loader
+
+    def project_loaded(self, loader: ProjectLoader, project: Project):
+        # a project opened later replaces this one anyway
+        if loader is not self.project_loader:
+            return
 
+        self.project_loader = None
+        self.set_loading(False)
         self.set_project(project)
+        set_recent_project(loader.file_path)
+        self.statusBar().showMessage(f"Opened {loader.file_path.name}", 5000)
+
+    def project_load_failed(self, loader: ProjectLoader, message: str):
+        QtW.QMessageBox.critical(self, "Open failed", f"Can't open {loader.file_path.name}: {message}")
+        if loader is not self.project_loader:
+            return
+
+        self.project_loader = None
+        self.set_loading(False)
+        self.statusBar().clearMessage()
+
+    def set_loading(self, loading: bool):
+        """Changes to the current project would be replaced by the project that is being loaded, so it can only be
+        looked at until then."""
+        if loading == bool(self.actions_enabled_before_loading):
+            return
+
+        self.centralwidget.setEnabled(not loading)
+        if loading:
+            self.actions_enabled_before_loading = {
+                action: action.isEnabled() for action in self.menuSimulation.actions()
+            }
+            for action in self.actions_enabled_before_loading:
+                action.setEnabled(False)
+        else:
+            for action, enabled in self.actions_enabled_before_loading.items():
+                action.setEnabled(enabled)
+            self.actions_enabled_before_loading = {}
+
+    def fork_simulation(self):
+        project = self.project_view.project
+
+        window = MainWindow(project.fork())
+        window.setWindowTitle(f"{self.windowTitle()} (fork at iteration {project.model.iteration})")
+        self.fork_windows.append(window)
+        window.show()
 
     def set_project(self, project: Project):
         if self.project_view is not None:
             self.project_view.stop_simulation()
+            self.project_view.autosaver.stop()
             self.project_view.tick_timer.timeout.disconnect(self.project_view.tick)
+            self.project_view.turmites_view.stop_population()
+            self.project_view.close_checkpoint()
+            self.project_view.close_engine()
+            self.project_view.disconnect_ui()
+            self.statusBar().removeWidget(self.project_view.turmites_view.population_progress_bar)
         self.project_view = ProjectView(project, self)
         self.project_view.init()
 
@@ -813,18 +2082,80 @@ class MainWindow(QtW.QMainWindow, Ui_MainWindow):
         msg_box.setStandardButtons(QtW.QMessageBox.Ok | QtW.QMessageBox.Cancel)
 
         if msg_box.exec() == QtW.QMessageBox.Ok:
+            # a save that is in progress is finished first
+            if self.project_view.project_saver is not None:
+                self.project_view.project_saver.wait()
+            self.project_view.autosaver.stop()
+            self.project_view.close_engine()
             close_event.accept()
         else:
             close_event.ignore()
 
 
-def main(args: list[str]):
-    with open("test_project_langtons_ant.json", "r", encoding="utf-8") as f:
-        test_proj = Project.from_json(json.load(f))
+def recover_autosave() -> Project | None:
+    """Offers to recover the projects of autosave journals that weren't deleted because the application crashed,
+    starting with the most recent one."""
+    journals = sorted(autosave_directory().glob("*.journal"), key=lambda path: path.stat().st_mtime, reverse=True)
+
+    for path in journals:
+        try:
+            model, extra = turmites.journal.recover(path)
+        except (OSError, ValueError, KeyError):
+            # nothing was saved before the crash
+            path.unlink(missing_ok=True)
+            continue
+
+        modified = QtC.QDateTime.fromSecsSinceEpoch(int(path.stat().st_mtime)).toString()
+        answer = QtW.QMessageBox.question(
+            None,
+            "Recover project",
+            f"A project was not closed properly. Do you want to recover it as it was at iteration {model.iteration} "
+            f"on {modified}?\n\nNo discards it, Cancel asks again at the next start.",
+            QtW.QMessageBox.Yes | QtW.QMessageBox.No | QtW.QMessageBox.Cancel
+        )
+        if answer == QtW.QMessageBox.Cancel:
+            return None
+
+        # a recovered project is saved to a new journal
+        path.unlink(missing_ok=True)
+        if answer == QtW.QMessageBox.Yes:
+            return Project.from_json(extra, model)
+
+    return None
 
+
+def main(args: list[str]):
     app = QtW.QApplication(args)
-    window = MainWindow(test_proj)
+    app.setApplicationName("Turmites")
+
+    parser = argparse.ArgumentParser(description="Simulates turmites.")
+    parser.add_argument(
+        "project", nargs="?", type=Path, help="The project to open, by default the most recently used one."
+    )
+    parser.add_argument(
+        "--profile-startup", action="store_true", help="Print how long the phases of the startup take."
+    )
+    # Qt removes its own arguments
+    options = parser.parse_args(app.arguments()[1:])
+
+    profile = StartupProfile(options.profile_startup)
+    profile.mark("imports and Qt")
+
+    # an explicitly given project is opened instead of offering to recover one
+    file_path = options.project
+    project = recover_autosave() if file_path is None else None
+    if project is None and file_path is None:
+        file_path = recent_project()
+    profile.mark("project")
+
+    # a project from a file is loaded after the window is shown, which starts with a new project until then
+    window = MainWindow(project)
+    profile.mark("window")
     window.show()
+    if file_path is not None:
+        window.load_project(file_path).finished.connect(lambda *_: profile.mark("project loaded"))
+    QtC.QTimer.singleShot(0, lambda: profile.mark("interactive"))
+
     app.exec_()
 
 
@@ -96,6 +96,11 @@ class Ui_MainWindow(object):
         self.placeToolButton.setObjectName("placeToolButton")
         self.inputControlButtonGroup.addButton(self.placeToolButton)
         self.horizontalLayout_5.addWidget(self.placeToolButton)
+        self.rectangleToolButton = QtWidgets.QToolButton(self.inputControlFrame)
+        self.rectangleToolButton.setCheckable(True)
+        self.rectangleToolButton.setObjectName("rectangleToolButton")
+        self.inputControlButtonGroup.addButton(self.rectangleToolButton)
+        self.horizontalLayout_5.addWidget(self.rectangleToolButton)
         self.horizontalLayout.addWidget(self.inputControlFrame)
         spacerItem = QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Minimum)
         self.horizontalLayout.addItem(spacerItem)
@@ -185,53 +190,27 @@ class Ui_MainWindow(object):
         self.line.setFrameShadow(QtWidgets.QFrame.Sunken)
         self.line.setObjectName("line")
         self.verticalLayout_5.addWidget(self.line)
-        self.transitionTableTableWidget = QtWidgets.QTableWidget(self.transitionTableGroupBox)
-        self.transitionTableTableWidget.setStyleSheet("QTableWidget::item { padding: 0px }")
-        self.transitionTableTableWidget.setSelectionMode(QtWidgets.QAbstractItemView.NoSelection)
-        self.transitionTableTableWidget.setRowCount(0)
-        self.transitionTableTableWidget.setColumnCount(6)
-        self.transitionTableTableWidget.setObjectName("transitionTableTableWidget")
-        item = QtWidgets.QTableWidgetItem()
-        item.setTextAlignment(QtCore.Qt.AlignLeading|QtCore.Qt.AlignVCenter)
-        font = QtGui.QFont()
-        font.setBold(True)
-        font.setWeight(75)
-        item.setFont(font)
-        self.transitionTableTableWidget.setHorizontalHeaderItem(0, item)
-        item = QtWidgets.QTableWidgetItem()
-        item.setTextAlignment(QtCore.Qt.AlignLeading|QtCore.Qt.AlignVCenter)
-        font = QtGui.QFont()
-        font.setBold(True)
-        font.setWeight(75)
-        item.setFont(font)
-        self.transitionTableTableWidget.setHorizontalHeaderItem(1, item)
-        item = QtWidgets.QTableWidgetItem()
-        item.setTextAlignment(QtCore.Qt.AlignLeading|QtCore.Qt.AlignVCenter)
-        font = QtGui.QFont()
-        font.setUnderline(True)
-        font.setKerning(True)
-        item.setFont(font)
-        self.transitionTableTableWidget.setHorizontalHeaderItem(2, item)
-        item = QtWidgets.QTableWidgetItem()
-        item.setTextAlignment(QtCore.Qt.AlignLeading|QtCore.Qt.AlignVCenter)
-        font = QtGui.QFont()
-        font.setUnderline(True)
-        item.setFont(font)
-        self.transitionTableTableWidget.setHorizontalHeaderItem(3, item)
-        item = QtWidgets.QTableWidgetItem()
-        item.setTextAlignment(QtCore.Qt.AlignLeading|QtCore.Qt.AlignVCenter)
-        font = QtGui.QFont()
-        font.setUnderline(True)
-        item.setFont(font)
-        self.transitionTableTableWidget.setHorizontalHeaderItem(4, item)
-        item = QtWidgets.QTableWidgetItem()
-        self.transitionTableTableWidget.setHorizontalHeaderItem(5, item)
-        self.transitionTableTableWidget.horizontalHeader().setVisible(True)
-        self.transitionTableTableWidget.horizontalHeader().setCascadingSectionResizes(False)
-        self.transitionTableTableWidget.horizontalHeader().setHighlightSections(True)
-        self.transitionTableTableWidget.horizontalHeader().setSortIndicatorShown(False)
-        self.transitionTableTableWidget.horizontalHeader().setStretchLastSection(True)
-        self.verticalLayout_5.addWidget(self.transitionTableTableWidget)
+        self.transitionTableTableView = QtWidgets.QTableView(self.transitionTableGroupBox)
+        self.transitionTableTableView.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
+        self.transitionTableTableView.setEditTriggers(QtWidgets.QAbstractItemView.DoubleClicked|QtWidgets.QAbstractItemView.SelectedClicked|QtWidgets.QAbstractItemView.EditKeyPressed)
+        self.transitionTableTableView.setObjectName("transitionTableTableView")
+        self.transitionTableTableView.horizontalHeader().setStretchLastSection(True)
+        self.transitionTableTableView.verticalHeader().setVisible(False)
+        self.verticalLayout_5.addWidget(self.transitionTableTableView)
+        self.transitionTableButtonsLayout = QtWidgets.QHBoxLayout()
+        self.transitionTableButtonsLayout.setObjectName("transitionTableButtonsLayout")
+        self.addTransitionTableEntryPushButton = QtWidgets.QPushButton(self.transitionTableGroupBox)
+        self.addTransitionTableEntryPushButton.setObjectName("addTransitionTableEntryPushButton")
+        self.transitionTableButtonsLayout.addWidget(self.addTransitionTableEntryPushButton)
+        self.removeTransitionTableEntriesPushButton = QtWidgets.QPushButton(self.transitionTableGroupBox)
+        self.removeTransitionTableEntriesPushButton.setObjectName("removeTransitionTableEntriesPushButton")
+        self.transitionTableButtonsLayout.addWidget(self.removeTransitionTableEntriesPushButton)
+        self.verticalLayout_5.addLayout(self.transitionTableButtonsLayout)
+        self.missingEntriesLabel = QtWidgets.QLabel(self.transitionTableGroupBox)
+        self.missingEntriesLabel.setText("")
+        self.missingEntriesLabel.setWordWrap(True)
+        self.missingEntriesLabel.setObjectName("missingEntriesLabel")
+        self.verticalLayout_5.addWidget(self.missingEntriesLabel)
         self.turmiteStatesGroupBox = QtWidgets.QGroupBox(self.transitionTableGroupBox)
         sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Preferred, QtWidgets.QSizePolicy.Fixed)
         sizePolicy.setHorizontalStretch(0)
@@ -312,6 +291,8 @@ class Ui_MainWindow(object):
         self.actionFullStep.setObjectName("actionFullStep")
         self.actionStepOneTurmite = QtWidgets.QAction(MainWindow)
         self.actionStepOneTurmite.setObjectName("actionStepOneTurmite")
+        self.actionJumpToIteration = QtWidgets.QAction(MainWindow)
+        self.actionJumpToIteration.setObjectName("actionJumpToIteration")
         self.actionPlay = QtWidgets.QAction(MainWindow)
         self.actionPlay.setObjectName("actionPlay")
         self.actionOpenRules = QtWidgets.QAction(MainWindow)
@@ -328,16 +309,74 @@ class Ui_MainWindow(object):
         self.actionOpenProject.setObjectName("actionOpenProject")
         self.actionResetSimulationViewZoom = QtWidgets.QAction(MainWindow)
         self.actionResetSimulationViewZoom.setObjectName("actionResetSimulationViewZoom")
+        self.actionRandomFillVisibleRegion = QtWidgets.QAction(MainWindow)
+        self.actionRandomFillVisibleRegion.setObjectName("actionRandomFillVisibleRegion")
+        self.actionGridSettings = QtWidgets.QAction(MainWindow)
+        self.actionGridSettings.setObjectName("actionGridSettings")
+        self.actionRecordVisits = QtWidgets.QAction(MainWindow)
+        self.actionRecordVisits.setCheckable(True)
+        self.actionRecordVisits.setObjectName("actionRecordVisits")
+        self.actionShowVisitHeatmap = QtWidgets.QAction(MainWindow)
+        self.actionShowVisitHeatmap.setCheckable(True)
+        self.actionShowVisitHeatmap.setObjectName("actionShowVisitHeatmap")
+        self.actionExportVisitHeatmap = QtWidgets.QAction(MainWindow)
+        self.actionExportVisitHeatmap.setObjectName("actionExportVisitHeatmap")
+        self.actionForkSimulation = QtWidgets.QAction(MainWindow)
+        self.actionForkSimulation.setObjectName("actionForkSimulation")
+        self.actionAutosave = QtWidgets.QAction(MainWindow)
+        self.actionAutosave.setCheckable(True)
+        self.actionAutosave.setChecked(True)
+        self.actionAutosave.setObjectName("actionAutosave")
+        self.actionRecordPaths = QtWidgets.QAction(MainWindow)
+        self.actionRecordPaths.setCheckable(True)
+        self.actionRecordPaths.setObjectName("actionRecordPaths")
+        self.actionShowTrails = QtWidgets.QAction(MainWindow)
+        self.actionShowTrails.setCheckable(True)
+        self.actionShowTrails.setObjectName("actionShowTrails")
+        self.actionExportTurmitePath = QtWidgets.QAction(MainWindow)
+        self.actionExportTurmitePath.setObjectName("actionExportTurmitePath")
+        self.actionExportGridImage = QtWidgets.QAction(MainWindow)
+        self.actionExportGridImage.setObjectName("actionExportGridImage")
+        self.actionExportFrames = QtWidgets.QAction(MainWindow)
+        self.actionExportFrames.setObjectName("actionExportFrames")
+        self.actionSetCheckpoint = QtWidgets.QAction(MainWindow)
+        self.actionSetCheckpoint.setObjectName("actionSetCheckpoint")
+        self.actionCompareWithCheckpoint = QtWidgets.QAction(MainWindow)
+        self.actionCompareWithCheckpoint.setObjectName("actionCompareWithCheckpoint")
+        self.actionCompareWithProject = QtWidgets.QAction(MainWindow)
+        self.actionCompareWithProject.setObjectName("actionCompareWithProject")
+        self.actionClearComparison = QtWidgets.QAction(MainWindow)
+        self.actionClearComparison.setObjectName("actionClearComparison")
         self.menuFile.addAction(self.actionSaveProject)
         self.menuFile.addAction(self.actionOpenProject)
+        self.menuFile.addAction(self.actionAutosave)
+        self.menuFile.addSeparator()
+        self.menuFile.addAction(self.actionExportGridImage)
+        self.menuFile.addAction(self.actionExportFrames)
+        self.menuFile.addAction(self.actionExportVisitHeatmap)
+        self.menuFile.addAction(self.actionExportTurmitePath)
         self.menuFile.addSeparator()
         self.menuFile.addAction(self.actionQuit)
         self.menuSimulation.addAction(self.actionPlay)
         self.menuSimulation.addAction(self.actionFullStep)
         self.menuSimulation.addAction(self.actionStepOneTurmite)
+        self.menuSimulation.addAction(self.actionJumpToIteration)
         self.menuSimulation.addSeparator()
         self.menuSimulation.addAction(self.actionClearSimulationView)
+        self.menuSimulation.addAction(self.actionRandomFillVisibleRegion)
+        self.menuSimulation.addAction(self.actionGridSettings)
+        self.menuSimulation.addAction(self.actionForkSimulation)
+        self.menuSimulation.addSeparator()
+        self.menuSimulation.addAction(self.actionRecordVisits)
+        self.menuSimulation.addAction(self.actionShowVisitHeatmap)
+        self.menuSimulation.addAction(self.actionRecordPaths)
+        self.menuSimulation.addAction(self.actionShowTrails)
         self.menuSimulation.addAction(self.actionResetSimulationViewZoom)
+        self.menuSimulation.addSeparator()
+        self.menuSimulation.addAction(self.actionSetCheckpoint)
+        self.menuSimulation.addAction(self.actionCompareWithCheckpoint)
+        self.menuSimulation.addAction(self.actionCompareWithProject)
+        self.menuSimulation.addAction(self.actionClearComparison)
         self.menubar.addAction(self.menuFile.menuAction())
         self.menubar.addAction(self.menuSimulation.menuAction())
 
@@ -357,6 +396,8 @@ class Ui_MainWindow(object):
         self.paintToolButton.setText(_translate("MainWindow", "Paint"))
         self.placeToolButton.setToolTip(_translate("MainWindow", "duplicate the currently selected Turmite and place it by right-clicking"))
         self.placeToolButton.setText(_translate("MainWindow", "Place"))
+        self.rectangleToolButton.setToolTip(_translate("MainWindow", "fill a rectangle with the currently selected cell state by dragging with the right mouse button"))
+        self.rectangleToolButton.setText(_translate("MainWindow", "Rectangle"))
         self.simulationGroupBox.setTitle(_translate("MainWindow", "Simulation"))
         self.iterationNumberLabel.setText(_translate("MainWindow", "TextLabel"))
         self.rulesGroupBox.setTitle(_translate("MainWindow", "Rules"))
@@ -368,16 +409,8 @@ class Ui_MainWindow(object):
         self.reorderDownToolButton.setText(_translate("MainWindow", "⌄"))
         self.removeTurmitePushButton.setText(_translate("MainWindow", "Remove Turmite"))
         self.turmitePositionLabel.setText(_translate("MainWindow", "TextLabel"))
-        item = self.transitionTableTableWidget.horizontalHeaderItem(0)
-        item.setText(_translate("MainWindow", "Current Cell State"))
-        item = self.transitionTableTableWidget.horizontalHeaderItem(1)
-        item.setText(_translate("MainWindow", "Current Turmite State"))
-        item = self.transitionTableTableWidget.horizontalHeaderItem(2)
-        item.setText(_translate("MainWindow", "New Direction"))
-        item = self.transitionTableTableWidget.horizontalHeaderItem(3)
-        item.setText(_translate("MainWindow", "New Cell State"))
-        item = self.transitionTableTableWidget.horizontalHeaderItem(4)
-        item.setText(_translate("MainWindow", "New Turmite State"))
+        self.addTransitionTableEntryPushButton.setText(_translate("MainWindow", "Add transition table entry"))
+        self.removeTransitionTableEntriesPushButton.setText(_translate("MainWindow", "Remove selected entries"))
         self.turmiteStatesGroupBox.setTitle(_translate("MainWindow", "Turmite states"))
         self.cellStatesGroupBox.setTitle(_translate("MainWindow", "Cell States"))
         self.menuFile.setTitle(_translate("MainWindow", "File"))
@@ -387,6 +420,8 @@ class Ui_MainWindow(object):
         self.actionSaveRules.setText(_translate("MainWindow", "Rules"))
         self.actionFullStep.setText(_translate("MainWindow", "Step all Turmite"))
         self.actionStepOneTurmite.setText(_translate("MainWindow", "Step single Turmite"))
+        self.actionJumpToIteration.setText(_translate("MainWindow", "Jump to iteration..."))
+        self.actionJumpToIteration.setToolTip(_translate("MainWindow", "Run the simulation up to an iteration without drawing the steps in between. Results of earlier runs are reused"))
         self.actionPlay.setText(_translate("MainWindow", "Start"))
         self.actionOpenRules.setText(_translate("MainWindow", "Rules"))
         self.actionClearSimulationView.setText(_translate("MainWindow", "Clear simulation view"))
@@ -395,3 +430,35 @@ class Ui_MainWindow(object):
         self.actionSaveProject.setText(_translate("MainWindow", "Save project"))
         self.actionOpenProject.setText(_translate("MainWindow", "Open project"))
         self.actionResetSimulationViewZoom.setText(_translate("MainWindow", "Reset simulation view zoom"))
+        self.actionRandomFillVisibleRegion.setText(_translate("MainWindow", "Random fill visible region"))
+        self.actionRandomFillVisibleRegion.setToolTip(_translate("MainWindow", "Fill the visible region with randomly chosen cell states"))
+        self.actionGridSettings.setText(_translate("MainWindow", "Grid settings"))
+        self.actionGridSettings.setToolTip(_translate("MainWindow", "Choose between an infinite grid and a fixed-size grid with wrapping or walled edges"))
+        self.actionRecordVisits.setText(_translate("MainWindow", "Record visits"))
+        self.actionRecordVisits.setToolTip(_translate("MainWindow", "Count how often turmites visit every cell. Turning it off discards the counts"))
+        self.actionShowVisitHeatmap.setText(_translate("MainWindow", "Show visit heatmap"))
+        self.actionShowVisitHeatmap.setToolTip(_translate("MainWindow", "Overlay the recorded visit counts on a logarithmic scale"))
+        self.actionExportVisitHeatmap.setText(_translate("MainWindow", "Export visit heatmap"))
+        self.actionExportVisitHeatmap.setToolTip(_translate("MainWindow", "Save the recorded visit counts as a PNG image with one pixel per cell"))
+        self.actionForkSimulation.setText(_translate("MainWindow", "Fork simulation"))
+        self.actionForkSimulation.setToolTip(_translate("MainWindow", "Open a copy of the simulation at the current iteration in a new window, e.g. to try a different transition table"))
+        self.actionAutosave.setText(_translate("MainWindow", "Autosave"))
+        self.actionAutosave.setToolTip(_translate("MainWindow", "Regularly save the project, so it can be recovered after a crash"))
+        self.actionRecordPaths.setText(_translate("MainWindow", "Record paths"))
+        self.actionRecordPaths.setToolTip(_translate("MainWindow", "Record the path of every turmite. Turning it off discards the paths"))
+        self.actionShowTrails.setText(_translate("MainWindow", "Show trails..."))
+        self.actionShowTrails.setToolTip(_translate("MainWindow", "Draw the recorded paths of the turmites during a range of iterations"))
+        self.actionExportTurmitePath.setText(_translate("MainWindow", "Export turmite path"))
+        self.actionExportTurmitePath.setToolTip(_translate("MainWindow", "Save the recorded positions of the selected turmite as CSV"))
+        self.actionExportGridImage.setText(_translate("MainWindow", "Export grid image"))
+        self.actionExportGridImage.setToolTip(_translate("MainWindow", "Save the whole pattern as a PNG image with one pixel per cell"))
+        self.actionExportFrames.setText(_translate("MainWindow", "Export frames"))
+        self.actionExportFrames.setToolTip(_translate("MainWindow", "Render a simulation run of the visible region as a PNG frame sequence or a video"))
+        self.actionSetCheckpoint.setText(_translate("MainWindow", "Set checkpoint"))
+        self.actionSetCheckpoint.setToolTip(_translate("MainWindow", "Remember the current state of the simulation to compare it with later states"))
+        self.actionCompareWithCheckpoint.setText(_translate("MainWindow", "Compare with checkpoint"))
+        self.actionCompareWithCheckpoint.setToolTip(_translate("MainWindow", "Highlight the cells and turmites that changed since the checkpoint"))
+        self.actionCompareWithProject.setText(_translate("MainWindow", "Compare with project..."))
+        self.actionCompareWithProject.setToolTip(_translate("MainWindow", "Highlight the cells and turmites in which a saved project differs from this one"))
+        self.actionClearComparison.setText(_translate("MainWindow", "Clear comparison"))
+        self.actionClearComparison.setToolTip(_translate("MainWindow", "Remove the highlighted differences"))
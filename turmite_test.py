@@ -1,10 +1,37 @@
+import concurrent.futures
+import contextlib
 import copy
+import itertools
 import json
+import os
 import random
+import struct
+import subprocess
+import sys
+import zlib
+
+import pytest
 
 from turmites.turmite import *
 from turmites.examples import langtons_ant_transition_table
-from main import Project, StateColors, QtG
+from turmites.bounded_grid import BoundedGrid
+from turmites.tiled_grid import SpillingGrid, TiledGrid
+import turmites.analysis
+import turmites.cache
+import turmites.diff
+import turmites.ensemble
+import turmites.jit
+import turmites.journal
+import turmites.parallel
+import turmites.paths
+import turmites.rendering
+import turmites.rules
+import turmites.spatial
+import turmites.tile_encoding
+import turmites.visits
+from turmites.tile_encoding import TILE_CELLS
+import main as gui
+from main import Project, ProjectSaver, StateColors, TransitionTableModel, QtC, QtG, QtW
 
 
 def main():
@@ -61,7 +88,7 @@ def many_turmites():
     )
 
     for _ in range(i):
-        new_t = copy.deepcopy(turmites[_ % 2])
+        new_t = copy.copy(turmites[_ % 2])
         new_t.position = random.randint(-20, 20), random.randint(-20, 20)
         p.model.turmites.append(new_t)
         p.turmite_state_colors.append(turmite_state_colors[_ % 2])
@@ -72,6 +99,646 @@ def many_turmites():
         json.dump(data, f, indent=2)
 
 
+def two_ants(grid: InfiniteGrid = None) -> MultipleTurmiteModel:
+    """Two ants with separate tables that meet after a few hundred iterations."""
+    model = MultipleTurmiteModel(
+        [Turmite(langtons_ant_transition_table.copy()), Turmite(langtons_ant_transition_table.invert_direction())],
+        grid
+    )
+    model.turmites[1].position = 6, 3
+    return model
+
+
+def model_state(model: MultipleTurmiteModel) -> tuple:
+    return (
+        model.iteration, model.small_step, sorted(model.grid.items()),
+        [(turmite.position, turmite.direction % 4, turmite.state) for turmite in model.turmites]
+    )
+
+
+def test_cloned_turmites_share_their_table_until_it_is_unshared():
+    model = MultipleTurmiteModel([Turmite(langtons_ant_transition_table.copy())])
+    for _ in range(3):
+        model.turmites.append(copy.copy(model.turmites[0]))
+
+    data = model.to_json()
+    assert len(data["transition_tables"]) == 1
+    loaded = MultipleTurmiteModel.from_json(json.loads(json.dumps(data)))
+    assert len({id(turmite.transition_table) for turmite in loaded.turmites}) == 1
+
+    edited = model.unshare_transition_table(model.turmites[2])
+    edited.set_entry(0, 0, 3, 1, 0)
+    assert model.unshare_transition_table(model.turmites[2]) is edited
+    assert [turmite.transition_table.get_entry(0, 0)[0] for turmite in model.turmites] == [-1, -1, 3, -1]
+    assert len(model.to_json()["transition_tables"]) == 2
+
+
+def test_completeness_check_finds_the_entries_a_run_needs():
+    model = two_ants()
+    report = turmites.analysis.check_completeness(model)
+    assert report.complete and report.colors == {0, 1} and report.states == [{0}, {0}]
+
+    # a state that is only reached through another state
+    table = model.unshare_transition_table(model.turmites[1])
+    table.set_entry(1, 0, 1, 2, 1)
+    table.set_entry(2, 1, 1, 0, 0)
+    report = turmites.analysis.check_completeness(model)
+    assert report.colors == {0, 1, 2} and report.states == [{0}, {0, 1}]
+    assert report.missing == [{(2, 0)}, {(0, 1), (1, 1), (2, 0)}]
+    with pytest.raises(UnknownStateError):
+        model.step_many(1000)
+
+    for turmite_state, cell_color in [(0, 2), (1, 0), (1, 1)]:
+        table.set_entry(cell_color, turmite_state, 0, cell_color, 0)
+    model.turmites[0].transition_table.set_entry(2, 0, 0, 2, 0)
+    assert turmites.analysis.check_completeness(model).complete
+    model.step_many(1000)
+
+
+@pytest.mark.parametrize("edge, positions, direction", [
+    ("wrap", [(3, 1), (4, 1), (0, 1), (1, 1)], 3),
+    ("stop", [(3, 1), (4, 1), (4, 1), (4, 1)], 3),
+    ("reflect", [(3, 1), (4, 1), (4, 1), (3, 1)], 1),
+])
+def test_bounded_grid_edges(edge, positions, direction):
+    straight = TransitionTable({(0, 0): (0, 1, 0), (1, 0): (0, 1, 0)})
+    model = MultipleTurmiteModel([Turmite(straight, (2, 1), 3)], BoundedGrid(0, 5, 3, edge))
+
+    visited = []
+    for _ in range(4):
+        model.step()
+        visited.append(model.turmites[0].position)
+    assert visited == positions
+    assert model.turmites[0].direction % 4 == direction
+
+    loaded = MultipleTurmiteModel.from_json(json.loads(json.dumps(model.to_json())))
+    assert (loaded.grid.width, loaded.grid.height, loaded.grid.edge) == (5, 3, edge)
+    assert model_state(loaded) == model_state(model)
+
+
+@pytest.mark.parametrize("edge", ["stop", "reflect"])
+def test_turmites_stay_inside_bounded_grids(edge):
+    model = two_ants(BoundedGrid(0, 12, 9, edge))
+    for _ in range(2000):
+        model.step()
+        for x, y in (turmite.position for turmite in model.turmites):
+            assert 0 <= x < 12 and 0 <= y < 9
+
+
+def test_transition_table_model_edits_only_its_turmite():
+    model = MultipleTurmiteModel([Turmite(langtons_ant_transition_table.copy())])
+    model.turmites.append(copy.copy(model.turmites[0]))
+    colors = StateColors({0: QtG.QColor(0xFF_FFFFFF), 1: QtG.QColor(0xFF_000000), 2: QtG.QColor(0xFF_FF0000)})
+    table_model = TransitionTableModel(model, model.turmites[1], colors, StateColors({0: QtG.QColor(0xFF_00FF00)}))
+    rejected = []
+    table_model.entry_rejected.connect(rejected.append)
+
+    assert table_model.setData(table_model.index(0, TransitionTableModel.TURN_DIRECTION), 2)
+    assert table_model.data(table_model.index(0, TransitionTableModel.TURN_DIRECTION), QtC.Qt.EditRole) == 2
+    assert model.turmites[0].transition_table.get_entry(0, 0)[0] == -1
+
+    # the entry for cell state 1 exists already, 2 is free
+    assert not table_model.setData(table_model.index(0, TransitionTableModel.CELL_COLOR), 1)
+    assert len(rejected) == 1
+    assert table_model.setData(table_model.index(0, TransitionTableModel.CELL_COLOR), 2)
+    assert table_model.add_entry()
+    table_model.remove_rows([1])
+
+    assert sorted(model.turmites[1].transition_table) == [((0, 0), (0, 0, 0)), ((2, 0), (2, 1, 0))]
+    assert table_model.rowCount() == 2
+    assert sorted(model.turmites[0].transition_table) == sorted(langtons_ant_transition_table)
+
+
+@pytest.mark.skipif(not turmites.jit.available(), reason="Numba is not installed")
+def test_jit_engine_matches_step_many_after_editing_a_table():
+    model = two_ants(TiledGrid(0))
+    reference = model.fork()
+    engine = turmites.jit.JitEngine(model)
+
+    engine.run(500)
+    reference.step_many(500)
+    assert model_state(model) == model_state(reference)
+
+    # edited in place, like the transition table editor does
+    for edited in (model, reference):
+        edited.unshare_transition_table(edited.turmites[0]).set_entry(0, 0, 1, 1, 0)
+    engine.run(500)
+    reference.step_many(500)
+    assert model_state(model) == model_state(reference)
+
+
+@pytest.mark.skipif(not turmites.jit.available(), reason="Numba is not installed")
+def test_jit_engine_matches_step_many_after_replacing_a_table():
+    model = two_ants(TiledGrid(0))
+    reference = model.fork()
+    engine = turmites.jit.JitEngine(model)
+    engine.run(500)
+    reference.step_many(500)
+
+    # the old table is freed, and new tables are made until one of them gets its id
+    old_id = id(model.turmites[0].transition_table)
+    model.turmites[0].transition_table = None
+    tables = [TransitionTable({(0, 0): (1, 1, 0), (1, 0): (1, 0, 0)})]
+    while id(tables[-1]) != old_id and len(tables) < 10_000:
+        tables.append(TransitionTable({(0, 0): (1, 1, 0), (1, 0): (1, 0, 0)}))
+    model.turmites[0].transition_table = tables[-1]
+    reference.turmites[0].transition_table = tables[0].copy()
+    engine.run(500)
+    reference.step_many(500)
+    assert model_state(model) == model_state(reference)
+
+
+def spread_ants(count: int = 12) -> MultipleTurmiteModel:
+    """Ants far apart from each other, apart from a pair that interacts early on."""
+    model = MultipleTurmiteModel([Turmite(langtons_ant_transition_table) for _ in range(count)])
+    for i, turmite in enumerate(model.turmites):
+        turmite.position = (i % 4) * 150, (i // 4) * 150
+    model.turmites[-1].position = 4, 3
+    return model
+
+
+def test_partitioned_engine_matches_step_many():
+    model, reference = spread_ants(), spread_ants()
+    model.step_small()
+    reference.step_small()
+
+    with concurrent.futures.ThreadPoolExecutor(4) as executor:
+        turmites.parallel.PartitionedEngine(model, batch_iterations=32, executor=executor).run(700)
+    reference.step_many(700)
+    assert model_state(model) == model_state(reference)
+
+
+def test_partitioned_engine_stops_at_a_missing_entry_like_step_many():
+    table = langtons_ant_transition_table.copy()
+    table.remove_entry(1, 0)
+    model, reference = spread_ants(), spread_ants()
+    for edited in (model, reference):
+        edited.turmites[-1].transition_table = table
+
+    with pytest.raises(UnknownStateError):
+        with concurrent.futures.ThreadPoolExecutor(4) as executor:
+            turmites.parallel.PartitionedEngine(model, batch_iterations=32, executor=executor).run(700)
+    with pytest.raises(UnknownStateError):
+        reference.step_many(700)
+    assert model_state(model) == model_state(reference)
+
+
+def test_partitioned_engine_shuts_down_only_its_own_executor(monkeypatch):
+    monkeypatch.setattr(turmites.parallel, "free_threading_enabled", lambda: True)
+    model, reference = spread_ants(), spread_ants()
+
+    with turmites.parallel.PartitionedEngine(model, batch_iterations=32) as engine:
+        engine.run(200)
+    reference.step_many(200)
+    assert model_state(model) == model_state(reference)
+    with pytest.raises(RuntimeError):
+        engine.executor.submit(int)
+
+    with concurrent.futures.ThreadPoolExecutor(2) as executor:
+        with turmites.parallel.PartitionedEngine(model, executor=executor):
+            pass
+        assert executor.submit(int).result() == 0
+
+
+def test_state_hash_survives_a_missing_transition():
+    model = two_ants()
+    model.turmites[1].transition_table.remove_entry(1, 0)
+    model.state_hash
+
+    with pytest.raises(UnknownStateError):
+        for _ in range(2000):
+            model.step_small()
+    assert model.iteration > 0
+    state_hash = model.state_hash
+    model.invalidate_hash()
+    assert model.state_hash == state_hash
+
+
+def test_distinct_values_of_encoded_tiles():
+    grid = TiledGrid(0, max_decoded_tiles=1)
+    grid.fill_rect((0, 0, 64, 64), 3)
+    grid.fill_rect((64, 0, 64, 64), 1)
+    grid.set_many(((x, x % 5), x % 7) for x in range(64, 192, 3))
+    grid[200, 200] = 9
+    grid.compact()
+
+    assert grid.distinct_values() == {value for _, value in grid.items()} | {grid.default}
+    assert all(isinstance(tile, bytes) for tile in grid._tiles.values())
+
+
+def test_numba_is_only_imported_when_the_jit_engine_runs():
+    imported = subprocess.run(
+        [sys.executable, "-c", "import sys, turmites.jit, turmites.rendering; print('numba' in sys.modules)"],
+        capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    ).stdout
+    assert imported.strip() == "False"
+
+
+def test_spilling_grid_matches_an_infinite_grid(tmp_path):
+    with SpillingGrid(0, memory_budget=3 * TILE_CELLS, path=tmp_path / "tiles.sqlite") as grid:
+        model, reference = two_ants(random_grid(grid, colors=2)), two_ants(random_grid(InfiniteGrid(0), colors=2))
+        model.turmites[0].position = reference.turmites[0].position = 90.0, 70.0
+        for _ in range(5):
+            model.step_many(400)
+            reference.step_many(400)
+            assert model_state(model) == model_state(reference)
+        assert grid.tiles_in_memory() <= 3 < len(grid.tile_keys())
+
+        fork = grid.fork()
+        fork.clear()
+        assert sorted(grid.items()) == sorted(reference.grid.items())
+        assert dict(TiledGrid.from_json(json.loads(json.dumps(grid.to_json()))).items()) == dict(grid.items())
+        fork.close()
+
+
+def test_tiled_grid_accepts_float_positions():
+    grid = TiledGrid(0)
+    grid[3.0, -70.0] = 2
+    assert grid[3, -70] == grid[3.0, -70.0] == 2
+    assert list(grid.items()) == [((3, -70), 2)]
+
+
+@pytest.mark.parametrize("colors", [[0], [5], [0, 1], [0, 1, 2], [0, 1, 2, 3, 4, 5], list(range(40))])
+@pytest.mark.parametrize("filled", [1, 100, TILE_CELLS])
+def test_tile_encodings_round_trip(colors, filled):
+    rng = random.Random(filled)
+    tile = bytearray(TILE_CELLS)
+    for index in rng.sample(range(TILE_CELLS), filled):
+        tile[index] = rng.choice(colors)
+
+    encoded = turmites.tile_encoding.encode(tile, 0)
+    assert turmites.tile_encoding.decode(encoded, 0) == tile
+    assert turmites.tile_encoding.values(encoded, 0) == set(tile)
+
+
+def test_ensemble_leaves_failed_replicas_alone():
+    replicas = [two_ants(TiledGrid(0)) for _ in range(3)]
+    # fails while aligning, before the batched steps
+    replicas[1].step_small()
+    replicas[1].turmites[1].transition_table.remove_entry(0, 0)
+    # fails in the middle of the run
+    replicas[2].turmites[0].transition_table.remove_entry(1, 0)
+    references = [replica.fork() for replica in replicas]
+
+    results = turmites.ensemble.EnsembleEngine(replicas).run(300)
+
+    for replica, reference, result in zip(replicas, references, results):
+        with pytest.raises(UnknownStateError) if result.error else contextlib.nullcontext():
+            reference.step_many(300)
+        assert model_state(replica) == model_state(reference)
+    assert [result.error is not None for result in results] == [False, True, True]
+    assert (replicas[1].iteration, replicas[1].small_step) == (0, 1)
+
+
+def test_visits_count_only_completed_steps():
+    model = two_ants()
+    model.turmites[0].position = 2.0, 1.0
+    model.turmites[1].transition_table.remove_entry(1, 0)
+    model.visits = turmites.visits.VisitCounter()
+
+    steps = 0
+    with pytest.raises(UnknownStateError):
+        for _ in range(2000):
+            model.step_small()
+            steps += 1
+    for _ in range(3):
+        with pytest.raises(UnknownStateError):
+            model.step_small()
+
+    assert sum(count for _, count, _ in model.visits.items()) == steps
+    assert model.visits[2.0, 1.0] == model.visits[2, 1]
+
+
+def test_paths_follow_removed_and_swapped_turmites():
+    recorder = turmites.paths.PathRecorder()
+    for index in range(4):
+        recorder.record(index, 0, (index, 0.0), (index, 1.0), 2)
+
+    recorder.swap(0, 3)
+    recorder.swap(1, 5)
+    assert {index: path.position_at(0) for index, path in recorder.paths.items()} == {
+        0: (3, 0), 3: (0, 0), 5: (1, 0), 2: (2, 0)
+    }
+    recorder.remove(2)
+    assert {index: path.position_at(0) for index, path in recorder.paths.items()} == {
+        0: (3, 0), 2: (0, 0), 4: (1, 0)
+    }
+
+
+@pytest.mark.parametrize("turn_directions", [(0, 3), (1, 3), (0, 1, 2, 3)])
+def test_enumerated_tables_are_canonical_and_complete(turn_directions):
+    rules = turmites.rules
+    mirror = rules.tables_mirror(turn_directions)
+    tables = list(rules.enumerate_tables(3, 1, turn_directions))
+    assert all(rules.is_canonical(table, mirror) for table in tables)
+
+    keys = [(cell_color, 0) for cell_color in range(3)]
+    values = [(turn_direction, new_cell_color, 0) for turn_direction in turn_directions for new_cell_color in range(3)]
+    classes = {
+        frozenset(rules.canonical_form(TransitionTable(dict(zip(keys, entries))), mirror=mirror))
+        for entries in itertools.product(values, repeat=len(keys))
+    }
+    assert len(tables) == len(classes)
+
+
+def random_grid(grid: InfiniteGrid, cells: int = 2000, seed: int = 0, colors: int = 4) -> InfiniteGrid:
+    rng = random.Random(seed)
+    grid.set_many(((rng.randrange(-100, 150), rng.randrange(-80, 120)), rng.randrange(colors)) for _ in range(cells))
+    return grid
+
+
+GRIDS = {
+    "infinite": lambda: InfiniteGrid(0),
+    "tiled": lambda: TiledGrid(0),
+    "wrap": lambda: BoundedGrid(0, 150, 90, "wrap"),
+    "stop": lambda: BoundedGrid(0, 150, 90, "stop"),
+}
+
+
+@pytest.mark.parametrize("grid_type", GRIDS)
+def test_rendering_bands_match_the_cells(grid_type):
+    model = MultipleTurmiteModel([Turmite(langtons_ant_transition_table)], random_grid(GRIDS[grid_type]()))
+    renderer = turmites.rendering.GridRenderer({0: (255, 255, 255), 1: (0, 0, 0), 2: (255, 0, 0)})
+    rect = -120, -90, 300, 230
+
+    rows = list(renderer.rows(model, rect, max_band_pixels=1000))
+    cell_indices = renderer.cell_indices
+    expected = [
+        bytearray(cell_indices.get(model.grid[x, y], 0) for x in range(rect[0], rect[0] + rect[2]))
+        for y in range(rect[1], rect[1] + rect[3])
+    ]
+    assert rows == expected
+
+
+def read_png(path) -> tuple[list[tuple[int, ...]], list[bytes]]:
+    """The palette and the rows of palette indices of an unfiltered 8-bit palette PNG."""
+    with open(path, "rb") as f:
+        data = f.read()
+    chunks, offset = {}, 8
+    while offset < len(data):
+        length, chunk_type = struct.unpack(">I4s", data[offset:offset + 8])
+        chunks[chunk_type] = chunks.get(chunk_type, b"") + data[offset + 8:offset + 8 + length]
+        offset += length + 12
+
+    width, height = struct.unpack(">II", chunks[b"IHDR"][:8])
+    palette = [tuple(chunks[b"PLTE"][i:i + 3]) for i in range(0, len(chunks[b"PLTE"]), 3)]
+    pixels = zlib.decompress(chunks[b"IDAT"])
+    assert pixels[::width + 1] == bytes(height)
+    return palette, [pixels[y * (width + 1) + 1:(y + 1) * (width + 1)] for y in range(height)]
+
+
+def test_exported_frames_show_every_step(tmp_path):
+    colors = {0: (255, 255, 255), 1: (0, 0, 0)}
+    model = two_ants()
+    reference = model.fork()
+    rect = -20, -15, 40, 30
+
+    paths = turmites.rendering.export_frames(
+        model, turmites.rendering.GridRenderer(colors), tmp_path, 3, 40, rect, 2, advance=model.step_many
+    )
+
+    assert [path.name for path in paths] == ["frame_000000.png", "frame_000001.png", "frame_000002.png"]
+    for i, path in enumerate(paths):
+        if i:
+            reference.step_many(40)
+        palette, rows = read_png(path)
+        assert len(rows) == 2 * rect[3]
+        for y in range(rect[3]):
+            assert rows[2 * y] == rows[2 * y + 1]
+            assert [palette[index] for index in rows[2 * y][::2]] == [
+                colors[reference.grid[x, rect[1] + y]] for x in range(rect[0], rect[0] + rect[2])
+            ]
+
+
+@pytest.mark.parametrize("grid_type", GRIDS)
+def test_forks_run_independently(grid_type):
+    model = two_ants(random_grid(GRIDS[grid_type](), colors=2))
+    model.step_many(100)
+    model.state_hash
+    before = model_state(model)
+
+    fork = model.fork()
+    fork.unshare_transition_table(fork.turmites[0]).set_entry(0, 0, 1, 1, 0)
+    fork.step_many(300)
+    assert model_state(model) == before
+    assert fork.turmites[1].transition_table is not model.turmites[1].transition_table
+
+    model.step_many(300)
+    assert model_state(model) != model_state(fork)
+    for forked in (model, fork):
+        state_hash = forked.state_hash
+        forked.invalidate_hash()
+        assert forked.state_hash == state_hash
+    # only the tiles around the turmites differ
+    assert 0 < len(model.grid.changed_tiles(fork.grid)) <= 4
+
+
+def test_project_saver_writes_the_state_it_was_started_in(tmp_path):
+    model = two_ants(random_grid(TiledGrid(0), colors=2))
+    project = Project(
+        model,
+        StateColors({1: QtG.QColor(0xFF_000000), 0: QtG.QColor(0xFF_FFFFFF)}),
+        [StateColors({0: QtG.QColor(0xFF_00FF00)}), StateColors({0: QtG.QColor(0xFF_FF0000)})]
+    )
+    saved = model_state(model)
+
+    saver = ProjectSaver(project, tmp_path / "project.json")
+    saver.start()
+    # the simulation goes on while the snapshot is written
+    model.step_many(500)
+    saver.wait()
+
+    with open(tmp_path / "project.json", encoding="utf-8") as f:
+        loaded = Project.from_json(json.load(f))
+    assert model_state(loaded.model) == saved != model_state(model)
+    assert not (tmp_path / "project.json.tmp").exists()
+
+
+def test_loaded_project_replaces_the_handlers_of_the_startup_project(tmp_path, monkeypatch):
+    monkeypatch.setenv("QT_QPA_PLATFORM", "offscreen")
+    monkeypatch.setattr(gui, "set_recent_project", lambda file_path: None)
+    app = QtW.QApplication.instance() or QtW.QApplication([])
+    with open(tmp_path / "project.json", "w", encoding="utf-8") as f:
+        json.dump(gui.default_project().to_json(), f)
+
+    window = gui.MainWindow()
+    window.actionAutosave.setChecked(False)
+    actions = (window.actionGridSettings, window.actionExportFrames, window.actionJumpToIteration, window.actionPlay,
+               window.actionSaveProject, window.actionResetSimulationViewZoom)
+    # toolbars and menus are connected to some of the actions as well
+    receivers = [action.receivers(action.triggered) for action in actions]
+    startup_view = window.project_view
+    startup_view_changes = []
+    startup_view.turmites_view.on_view_changed = lambda: startup_view_changes.append(True)
+    window.load_project(tmp_path / "project.json")
+    while window.project_loader is not None:
+        app.processEvents()
+
+    assert window.project_view is not startup_view
+    assert [action.receivers(action.triggered) for action in actions] == receivers
+    assert window.fullStepToolButton.receivers(window.fullStepToolButton.clicked) == 1
+    scroll_bar = window.simulationView.horizontalScrollBar()
+    scroll_bar.setRange(0, 100)
+    scroll_bar.setValue(50)
+    assert not startup_view_changes
+    window.project_view.close_engine()
+
+
+@pytest.mark.parametrize("grid_type", ["infinite", "tiled", "wrap"])
+def test_journal_recovers_the_last_complete_record(grid_type, tmp_path):
+    model = two_ants(random_grid(GRIDS[grid_type](), colors=2))
+    journal = turmites.journal.Journal(tmp_path / "journal.jsonl")
+    journal.compact(model.to_json(include_grid=False), {"record": 0}, model.grid.fork())
+
+    states = [model_state(model)]
+    for record in range(1, 4):
+        model.step_many(150)
+        journal.append(model.to_json(include_grid=False), {"record": record}, model.grid.fork())
+        states.append(model_state(model))
+    # nothing changed, so nothing is written
+    journal.append(model.to_json(include_grid=False), {"record": 3}, model.grid.fork())
+    assert journal.records == 3
+
+    recovered, extra = turmites.journal.recover(journal.path)
+    assert extra == {"record": 3} and model_state(recovered) == states[3]
+
+    # a crash while the last line was written
+    with open(journal.path, "rb+") as file:
+        file.truncate(journal.size - 20)
+    recovered, extra = turmites.journal.recover(journal.path)
+    assert extra == {"record": 2} and model_state(recovered) == states[2]
+
+
+@pytest.mark.parametrize("grid_type", ["infinite", "tiled", "wrap"])
+def test_cached_runs_restore_the_same_state(grid_type, tmp_path):
+    cache = turmites.cache.ResultCache(tmp_path)
+    def start():
+        return two_ants(random_grid(GRIDS[grid_type](), colors=2))
+
+    computed, restored = start(), start()
+    restored.iteration = 1000
+
+    assert not turmites.cache.run_cached(computed, 400, cache).hit
+    run = turmites.cache.run_cached(restored, 400, cache)
+    assert run.hit and run.cells == len(computed.grid)
+    assert restored.iteration == 1400
+    assert model_state(restored)[1:] == model_state(computed)[1:]
+    state_hash = restored.state_hash
+    restored.invalidate_hash()
+    assert restored.state_hash == state_hash
+
+    # another rule doesn't hit the cache, a damaged result is computed again
+    restored.unshare_transition_table(restored.turmites[0]).set_entry(0, 0, 1, 1, 0)
+    assert not turmites.cache.run_cached(restored, 400, cache).hit
+    for path, _ in cache.entries():
+        path.write_bytes(b"damaged")
+    assert not turmites.cache.run_cached(start(), 400, cache).hit
+
+
+@pytest.mark.parametrize("grid_type", GRIDS)
+@pytest.mark.parametrize("rect", [(-120, -90, 300, 230), (-1, 3, 70, 1), (140, 80, 20, 20), (5, 5, 0, 4)])
+def test_region_queries_match_single_cells(grid_type, rect):
+    grid = random_grid(GRIDS[grid_type]())
+    x0, y0, width, height = rect
+    positions = [(x, y) for y in range(y0, y0 + height) for x in range(x0, x0 + width)]
+
+    assert list(grid.get_block(rect)) == [grid[position] for position in positions]
+    assert sorted(grid.items_in_rect(rect)) == sorted(
+        (position, grid[position]) for position in positions if grid[position] != grid.default
+    )
+
+    # the sizes of the bounded grids are multiples of 3, so cells that wrap around get the same value twice
+    values = [(x * 7 + y) % 3 for x, y in positions]
+    grid.set_block(rect, values)
+    assert [grid[position] for position in positions] == [
+        grid.default if grid.bounded and grid.normalize(position) is None else value
+        for position, value in zip(positions, values)
+    ]
+
+
+def test_turmite_index_matches_the_turmite_positions():
+    rng = random.Random(1)
+    model = MultipleTurmiteModel([
+        Turmite(langtons_ant_transition_table, (rng.randrange(-60, 60), rng.randrange(-60, 60)))
+        for _ in range(300)
+    ])
+    model.turmites.append(Turmite(langtons_ant_transition_table, model.turmites[7].position))
+    index = turmites.spatial.TurmiteIndex()
+
+    for iterations in (0, 1, 25):
+        model.step_many(iterations)
+        index.sync(model.turmites)
+        positions = [turmite.position for turmite in model.turmites]
+
+        for rect in [(-20, -35, 47, 18), (-100, -100, 200, 200), (3, 4, 1, 1), (0, 0, 0, 5)]:
+            x0, y0, width, height = rect
+            assert index.in_rect(rect) == [
+                i for i, (x, y) in enumerate(positions) if x0 <= x < x0 + width and y0 <= y < y0 + height
+            ]
+        for position in positions[::10]:
+            assert index.at(position) == [i for i, other in enumerate(positions) if other == position]
+
+        co_located: dict[Position, list[int]] = {}
+        for i, position in enumerate(positions):
+            co_located.setdefault(position, []).append(i)
+        assert index.co_located() == {position: indices for position, indices in co_located.items() if len(indices) > 1}
+
+    model.turmites.pop(3)
+    index.sync(model.turmites)
+    assert index.in_rect((-100, -100, 200, 200)) == list(range(len(model.turmites)))
+
+
+def cell_value(grid: InfiniteGrid, position: Position):
+    """Like ``grid[position]``, but cells outside of bounded grids are default cells instead of wrapping around."""
+    x, y = position
+    if grid.bounded and not (0 <= x < grid.width and 0 <= y < grid.height):
+        return grid.default
+    return grid[position]
+
+
+@pytest.mark.parametrize("old_type, new_type", [
+    ("infinite", "infinite"), ("tiled", "tiled"), ("tiled", "infinite"), ("wrap", "wrap"), ("wrap", "tiled"),
+    ("stop", "wrap"), ("infinite", "stop"),
+])
+def test_grid_diff_matches_the_changed_cells(old_type, new_type):
+    old = two_ants(random_grid(GRIDS[old_type](), colors=2))
+    old.step_many(100)
+    new = two_ants(GRIDS[new_type]())
+    new.grid.set_many(old.grid.items())
+    new.turmites[1].transition_table = old.turmites[1].transition_table
+    new.step_many(300)
+
+    diff = turmites.diff.ModelDiff.compute(old, new)
+    positions = {position for grid in (old.grid, new.grid) for position, _ in grid.items()}
+    expected = sorted(
+        (position, cell_value(old.grid, position), cell_value(new.grid, position)) for position in positions
+        if cell_value(old.grid, position) != cell_value(new.grid, position)
+    )
+    assert sorted(diff.grid.cells()) == expected and len(diff.grid) == len(expected) > 0
+    assert [change.index for change in diff.turmites] == [0, 1]
+    assert not any(change.transition_table_changed for change in diff.turmites)
+
+    x, y, width, height = diff.grid.bounding_box()
+    assert (x, y) == tuple(min(position[i] for position, _, _ in expected) for i in (0, 1))
+    assert diff.grid.counts()[turmites.diff.ADDED] == sum(1 for _, old_value, _ in expected if old_value == 0)
+
+
+@pytest.mark.parametrize("grid_type", GRIDS)
+def test_bulk_operations_notify_once(grid_type):
+    grid = GRIDS[grid_type]()
+    single, bulk = [], []
+    grid.listeners.append(lambda position, value: single.append(position))
+    grid.bulk_listeners.append(bulk.append)
+
+    grid.fill_rect((2, 3, 10, 5), 1)
+    grid.stamp({(0, 0): 2, (1, 0): 0}, (4, 4))
+
+    assert single == []
+    assert [len(changes) for changes in bulk] == [50, 2]
+    assert bulk[1] == {(4, 4): 2, (5, 4): 0}
+    assert len(grid) == 49 and grid[4, 4] == 2 and grid[5, 4] == grid.default
+
+
 if __name__ == "__main__":
     langtons_ant_project()
     many_turmites()
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import dataclasses
+import typing
+
+from .turmite import CellColor, MultipleTurmiteModel, TransitionTable, TurmiteState
+
+Entry = typing.Tuple[CellColor, TurmiteState]
+
+
+@dataclasses.dataclass
+class CompletenessReport:
+    """Which transition table entries the turmites of a model might need, but that are missing."""
+
+    colors: set[CellColor]
+    """All cell colors that can occur on the grid."""
+    states: list[set[TurmiteState]]
+    """All states every turmite can get into."""
+    missing: list[set[Entry]]
+    """The missing entries of every turmite."""
+
+    @property
+    def complete(self) -> bool:
+        """Whether it is proven that the model never raises :class:`UnknownStateError`."""
+        return not any(self.missing)
+
+
+def reachable_entries(transition_tables: dict[int, tuple[TransitionTable, set[TurmiteState]]],
+                      colors: set[CellColor]) -> tuple[set[CellColor], dict[int, set[TurmiteState]]]:
+    """Computes the closure of the colors and states that can occur, starting from the given colors on the grid and
+    the given start states of every transition table.
+
+    Colors are shared between all tables, as every turmite can step on cells colored by any other turmite. The
+    result is an over-approximation: some of the combinations may never actually happen.
+    """
+    colors = set(colors)
+    states = {key: set(start_states) for key, (_, start_states) in transition_tables.items()}
+
+    changed = True
+    while changed:
+        changed = False
+
+        for key, (transition_table, _) in transition_tables.items():
+            table_states = states[key]
+            for (cell_color, turmite_state), (_, new_cell_color, new_turmite_state) in transition_table:
+                if cell_color in colors and turmite_state in table_states:
+                    if new_cell_color not in colors:
+                        colors.add(new_cell_color)
+                        changed = True
+                    if new_turmite_state not in table_states:
+                        table_states.add(new_turmite_state)
+                        changed = True
+
+    return colors, states
+
+
+def check_completeness(model: MultipleTurmiteModel) -> CompletenessReport:
+    """Finds every transition table entry that could be needed in some future step of the model but is missing.
+
+    If there are none, stepping the model can't raise :class:`UnknownStateError`.
+    """
+    # turmites that share a table are analyzed together
+    transition_tables: dict[int, tuple[TransitionTable, set[TurmiteState]]] = {}
+    for turmite in model.turmites:
+        transition_tables.setdefault(id(turmite.transition_table), (turmite.transition_table, set()))[1].add(
+            turmite.state
+        )
+
+    colors, states = reachable_entries(transition_tables, model.grid.distinct_values() | {model.grid.default})
+
+    missing = {
+        key: {
+            (cell_color, turmite_state)
+            for cell_color in colors for turmite_state in states[key]
+            if (cell_color, turmite_state) not in transition_table
+        }
+        for key, (transition_table, _) in transition_tables.items()
+    }
+
+    return CompletenessReport(
+        colors,
+        [states[id(turmite.transition_table)] for turmite in model.turmites],
+        [missing[id(turmite.transition_table)] for turmite in model.turmites]
+    )
@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import base64
+import typing
+import zlib
+
+from .infinite_grid import DIRECTION_OFFSETS, InfiniteGrid, Position, Rect
+from .tile_encoding import TILE_SHIFT, TILE_SIZE
+
+EdgeBehaviour = typing.Literal["wrap", "stop", "reflect"]
+
+EDGE_BEHAVIOURS: dict[EdgeBehaviour, str] = {
+    "wrap": "Torus: leaving on one side enters on the opposite side",
+    "stop": "Walls: turmites can't move through the edge and stay in place",
+    "reflect": "Walls: turmites turn around at the edge",
+}
+
+
+class BoundedGrid(InfiniteGrid[int]):
+    """A grid of fixed size, stored densely in a single :class:`bytearray` with one byte per cell.
+
+    Cell values have to be between 0 and 255. With the ``"wrap"`` edge behaviour, all positions are taken modulo
+    the size of the grid. Otherwise, positions outside of the grid read as the default value and writes to them
+    are ignored.
+    """
+
+    bounded = True
+
+    def __init__(self, default: int, width: int, height: int, edge: EdgeBehaviour = "wrap",
+                 _cells: bytearray = None):
+        if width <= 0 or height <= 0:
+            raise ValueError(f"Invalid grid size {width}x{height}.")
+        if edge not in EDGE_BEHAVIOURS:
+            raise ValueError(f"Unknown edge behaviour {edge!r}.")
+        self._check_value(default)
+
+        super().__init__(default)
+
+        self.width = width
+        self.height = height
+        self.edge = edge
+        self._cells = bytearray([default]) * (width * height) if _cells is None else _cells
+        self._count = len(self._cells) - self._cells.count(default)
+
+    @staticmethod
+    def _check_value(value: int):
+        if not isinstance(value, int) or not 0 <= value < 256:
+            raise ValueError(f"Cell values of a bounded grid have to be between 0 and 255, not {value!r}.")
+
+    def _index(self, key: Position) -> int | None:
+        x, y = key
+        x, y = int(x), int(y)
+
+        if self.edge == "wrap":
+            return (y % self.height) * self.width + x % self.width
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return y * self.width + x
+        return None
+
+    def normalize(self, key: Position) -> Position | None:
+        """The position inside of the grid that ``key`` refers to, or ``None`` if it is outside of the grid."""
+        index = self._index(key)
+        return None if index is None else (index % self.width, index // self.width)
+
+    def _store(self, key: Position, value: int):
+        index = self._index(key)
+        if index is None:
+            return
+        self._check_value(value)
+
+        old_value = self._cells[index]
+        if self._zobrist_hash is not None:
+            self._update_zobrist_hash((index % self.width, index // self.width), old_value, value)
+
+        self._count += (value != self.default) - (old_value != self.default)
+        self._cells[index] = value
+
+    def __setitem__(self, key: Position, value: int):
+        key = self.normalize(key)
+        if key is not None:
+            super().__setitem__(key, value)
+
+    def __getitem__(self, item: Position) -> int:
+        index = self._index(item)
+        return self.default if index is None else self._cells[index]
+
+    def __len__(self):
+        return self._count
+
+    def items(self):
+        cells, width, default = self._cells, self.width, self.default
+
+        for index, value in enumerate(cells):
+            if value != default:
+                yield (index % width, index // width), value
+
+    def distinct_values(self) -> set[int]:
+        return set(self._cells)
+
+    def _row_spans(self, rect: Rect) -> typing.Iterator[tuple[int, int, int, int]]:
+        """The parts of the rows of the rectangle that lie in the grid, each as the index of the first cell in the
+        rectangle and in :attr:`_cells` and the number of cells. With ``"wrap"``, a row can consist of several
+        parts."""
+        x0, y0, width, height = rect
+
+        for y in range(y0, y0 + height):
+            row = (y - y0) * width
+            if self.edge == "wrap":
+                cells_row = (y % self.height) * self.width
+                x = x0
+                while x < x0 + width:
+                    length = min(self.width - x % self.width, x0 + width - x)
+                    yield row + x - x0, cells_row + x % self.width, length
+                    x += length
+            elif 0 <= y < self.height:
+                x, end_x = max(x0, 0), min(x0 + width, self.width)
+                if x < end_x:
+                    yield row + x - x0, y * self.width + x, end_x - x
+
+    def items_in_rect(self, rect: Rect) -> typing.Iterator[tuple[Position, int]]:
+        x0, y0, width, _ = rect
+        default = self.default
+
+        for start, cells_start, length in self._row_spans(rect):
+            part = self._cells[cells_start:cells_start + length]
+            if part.count(default) == length:
+                continue
+
+            y = y0 + start // width
+            for x, value in enumerate(part, x0 + start % width):
+                if value != default:
+                    yield (x, y), value
+
+    def get_block(self, rect: Rect) -> bytearray:
+        _, _, width, height = rect
+        block = bytearray([self.default]) * (width * height)
+        for start, cells_start, length in self._row_spans(rect):
+            block[start:start + length] = self._cells[cells_start:cells_start + length]
+        return block
+
+    def set_block(self, rect: Rect, values: typing.Sequence[int]):
+        _, _, width, height = rect
+        if len(values) != width * height:
+            raise ValueError(f"A block of {width}x{height} cells needs {width * height} values, not {len(values)}.")
+        try:
+            block = bytes(values)
+        except (TypeError, ValueError):
+            raise ValueError("Cell values of a bounded grid have to be between 0 and 255.") from None
+
+        cells, default = self._cells, self.default
+        changes: dict[Position, int] | None = {} if self.bulk_listeners else None
+
+        for start, cells_start, length in self._row_spans(rect):
+            old_part, part = cells[cells_start:cells_start + length], block[start:start + length]
+            if old_part == part:
+                continue
+
+            if changes is not None or self._zobrist_hash is not None:
+                for index, (old_value, value) in enumerate(zip(old_part, part), cells_start):
+                    if old_value != value:
+                        position = index % self.width, index // self.width
+                        if self._zobrist_hash is not None:
+                            self._update_zobrist_hash(position, old_value, value)
+                        if changes is not None:
+                            changes[position] = value
+
+            self._count += old_part.count(default) - part.count(default)
+            cells[cells_start:cells_start + length] = part
+
+        if changes:
+            self._call_bulk_listeners(changes)
+
+    def set_many(self, cells: typing.Mapping[Position, int] | typing.Iterable[tuple[Position, int]]):
+        normalized = {}
+        for key, value in dict(cells).items():
+            key = self.normalize(key)
+            if key is not None:
+                normalized[key] = value
+
+        super().set_many(normalized)
+
+    def changed_tiles(self, other: InfiniteGrid[int]) -> set[tuple[int, int]]:
+        if not (
+            isinstance(other, BoundedGrid) and other.default == self.default
+            and (other.width, other.height) == (self.width, self.height)
+        ):
+            return super().changed_tiles(other)
+
+        # compares the part of every row that lies in each tile
+        changed = set()
+        for y in range(self.height):
+            row = y * self.width
+            for x in range(0, self.width, TILE_SIZE):
+                key = x >> TILE_SHIFT, y >> TILE_SHIFT
+                end = min(x + TILE_SIZE, self.width)
+                if key not in changed and self._cells[row + x:row + end] != other._cells[row + x:row + end]:
+                    changed.add(key)
+        return changed
+
+    def fork(self) -> "BoundedGrid":
+        grid = BoundedGrid(self.default, self.width, self.height, self.edge, bytearray(self._cells))
+        grid._zobrist_hash = self._zobrist_hash
+        return grid
+
+    def clear(self):
+        changes = dict.fromkeys((position for position, _ in self.items()), self.default)
+        self._cells[:] = bytearray([self.default]) * len(self._cells)
+        self._count = 0
+        if self._zobrist_hash is not None:
+            self._zobrist_hash = 0
+
+        self._call_bulk_listeners(changes)
+
+    def neighbour(self, position: Position, direction: int) -> tuple[Position, int]:
+        x, y = position
+        dx, dy = DIRECTION_OFFSETS[direction]
+        new_x, new_y = x + dx, y + dy
+
+        if self.edge == "wrap":
+            return (new_x % self.width, new_y % self.height), direction
+        if 0 <= new_x < self.width and 0 <= new_y < self.height:
+            return (new_x, new_y), direction
+        if self.edge == "reflect":
+            return position, (direction + 2) % 4
+        return position, direction
+
+    def to_json(self) -> dict:
+        return {
+            "type": "bounded",
+            "width": self.width,
+            "height": self.height,
+            "edge": self.edge,
+            "default": self.default,
+            "cells": base64.b64encode(zlib.compress(bytes(self._cells))).decode("ascii")
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "BoundedGrid":
+        return cls(
+            data["default"],
+            data["width"],
+            data["height"],
+            data["edge"],
+            bytearray(zlib.decompress(base64.b64decode(data["cells"])))
+        )
+
+    @classmethod
+    def from_grid(cls, grid: InfiniteGrid[int], width: int, height: int, edge: EdgeBehaviour = "wrap",
+                  offset: Position = (0, 0)) -> "BoundedGrid":
+        """A bounded grid with the cells of ``grid`` in the rectangle of the given size starting at ``offset``."""
+        bounded_grid = cls(grid.default, width, height, edge)
+        offset_x, offset_y = offset
+
+        for (x, y), value in grid.items():
+            if 0 <= x - offset_x < width and 0 <= y - offset_y < height:
+                bounded_grid._store((x - offset_x, y - offset_y), value)
+
+        return bounded_grid
@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import dataclasses
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import time
+import typing
+from pathlib import Path
+
+from . import tile_encoding
+from .infinite_grid import InfiniteGrid, Rect
+from .tile_encoding import TILE_CELLS, TILE_SHIFT, TILE_SIZE
+from .turmite import CellColor, MultipleTurmiteModel
+
+_TILE_MASK = TILE_SIZE - 1
+
+# changes whenever runs that used to be equal could lead to different results
+_KEY_VERSION = 1
+
+
+def default_directory() -> Path:
+    return Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "turmites" / "results"
+
+
+def _grid_digest(grid: InfiniteGrid[CellColor], digest: typing.Any):
+    """Adds the cells of the grid to the digest. Grids with the same cells get the same digest, no matter how they
+    store them, only the geometry of bounded grids is added as well."""
+    if grid.bounded:
+        geometry = ["bounded", grid.width, grid.height, grid.edge]
+    else:
+        geometry = ["infinite"]
+    digest.update(json.dumps([geometry, grid.default]).encode("utf-8"))
+
+    if isinstance(grid.default, int) and 0 <= grid.default < 256:
+        tiles: dict[tuple[int, int], bytearray] = {}
+        try:
+            for (x, y), value in grid.items():
+                key = x >> TILE_SHIFT, y >> TILE_SHIFT
+                tile = tiles.get(key)
+                if tile is None:
+                    tile = tiles[key] = bytearray([grid.default]) * TILE_CELLS
+                tile[(y & _TILE_MASK) << TILE_SHIFT | (x & _TILE_MASK)] = value
+        except (TypeError, ValueError):
+            pass
+        else:
+            empty = bytearray([grid.default]) * TILE_CELLS
+            for key in sorted(tiles):
+                if tiles[key] != empty:
+                    digest.update(b"%d,%d:" % key)
+                    digest.update(tile_encoding.encode(tiles[key], grid.default))
+            return
+
+    # cells that don't fit into a byte
+    digest.update(json.dumps(sorted(
+        [x, y, value] for (x, y), value in grid.items() if value != grid.default
+    )).encode("utf-8"))
+
+
+def run_key(model: MultipleTurmiteModel, iterations: int) -> str:
+    """A hash of everything the result of running the model for the given number of iterations depends on: the
+    transition tables, the turmites, the grid and the small step.
+
+    The iteration the model is at doesn't matter, so runs of the same pattern that started at different times share
+    their results.
+    """
+    turmites = [
+        [
+            sorted([list(key), [value[0] % 4, *value[1:]]] for key, value in turmite.transition_table),
+            list(turmite.position),
+            turmite.direction % 4,
+            turmite.state
+        ]
+        for turmite in model.turmites
+    ]
+
+    digest = hashlib.sha256()
+    digest.update(json.dumps([_KEY_VERSION, TILE_SIZE, iterations, model.small_step, turmites]).encode("utf-8"))
+    _grid_digest(model.grid, digest)
+    return digest.hexdigest()
+
+
+@dataclasses.dataclass
+class CachedRun:
+    key: str
+    hit: bool
+    """Whether the result was taken from the cache."""
+    seconds: float
+    """How long the run took when it was computed."""
+    cells: int
+    """The number of non-default cells afterwards."""
+    bounding_box: Rect | None
+
+
+class ResultCache:
+    """Results of runs, stored in a directory under the :func:`run_key` of the run.
+
+    Every result is a compressed JSON file with the model after the run and some metrics. Once the directory gets
+    larger than ``max_size`` bytes, the least recently used results are deleted.
+    """
+
+    def __init__(self, directory: Path = None, max_size: int = 1 << 30):
+        self.directory = default_directory() if directory is None else Path(directory)
+        self.max_size = max_size
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json.gz"
+
+    def get(self, key: str) -> tuple[dict, dict] | None:
+        """The model JSON and the metrics of the result, or ``None`` if it isn't cached."""
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, EOFError):
+            # a damaged file is treated like a missing one
+            path.unlink(missing_ok=True)
+            return None
+
+        # the modification time is the time of the last use
+        os.utime(path)
+        return data["model"], data["metrics"]
+
+    def put(self, key: str, model: MultipleTurmiteModel, metrics: dict):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # results are written under a temporary name, so others never read a partial file
+        file, temporary_path = tempfile.mkstemp(".tmp", dir=path.parent)
+        try:
+            with gzip.open(os.fdopen(file, "wb"), "wt", encoding="utf-8") as f:
+                json.dump({"model": model.to_json(include_history=False), "metrics": metrics}, f)
+            os.replace(temporary_path, path)
+        except BaseException:
+            Path(temporary_path).unlink(missing_ok=True)
+            raise
+
+        self.evict()
+
+    def entries(self) -> list[tuple[Path, os.stat_result]]:
+        if not self.directory.exists():
+            return []
+        return [(path, path.stat()) for path in self.directory.glob("*/*.json.gz")]
+
+    def size(self) -> int:
+        return sum(stat.st_size for _, stat in self.entries())
+
+    def evict(self, max_size: int = None):
+        """Deletes the least recently used results until the cache is at most ``max_size`` bytes large."""
+        max_size = self.max_size if max_size is None else max_size
+        entries = sorted(self.entries(), key=lambda entry: entry[1].st_mtime)
+
+        size = sum(stat.st_size for _, stat in entries)
+        for path, stat in entries:
+            if size <= max_size:
+                break
+            path.unlink(missing_ok=True)
+            size -= stat.st_size
+
+    def clear(self):
+        self.evict(0)
+
+
+def _apply(model: MultipleTurmiteModel, data: dict, iterations: int):
+    """Puts the model into the state of the cached result in place, so views of it notice the changes."""
+    result = MultipleTurmiteModel.from_json(data)
+
+    for turmite, result_turmite in zip(model.turmites, result.turmites):
+        turmite.position = result_turmite.position
+        turmite.direction = result_turmite.direction
+        turmite.state = result_turmite.state
+
+    grid = model.grid
+    changes = {position: grid.default for position, _ in grid.items()}
+    changes.update(result.grid.items())
+    grid.set_many((position, value) for position, value in changes.items() if grid[position] != value)
+
+    model.small_step = result.small_step
+    model.iteration += iterations
+    model.invalidate_hash()
+
+
+def run_cached(model: MultipleTurmiteModel, iterations: int, cache: ResultCache,
+               advance: typing.Callable[[int], None] = None) -> CachedRun:
+    """Runs the model for the given number of iterations with ``advance``, by default ``model.step_many``, unless the
+    result is already cached.
+
+    Models that record visits or paths are always run, as their history isn't cached. Runs that raise an error aren't
+    cached either.
+    """
+    advance = model.step_many if advance is None else advance
+    if model.visits is not None or model.paths is not None:
+        start = time.perf_counter()
+        advance(iterations)
+        return CachedRun("", False, time.perf_counter() - start, len(model.grid), model.grid.bounding_box())
+
+    key = run_key(model, iterations)
+    cached = cache.get(key)
+    if cached is not None:
+        data, metrics = cached
+        _apply(model, data, iterations)
+        return CachedRun(key, True, metrics["seconds"], metrics["cells"], model.grid.bounding_box())
+
+    start = time.perf_counter()
+    advance(iterations)
+    seconds = time.perf_counter() - start
+
+    cells = len(model.grid)
+    cache.put(key, model, {"seconds": seconds, "cells": cells})
+    return CachedRun(key, False, seconds, cells, model.grid.bounding_box())
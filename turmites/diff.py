@@ -0,0 +1,291 @@
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import json
+import sys
+import typing
+from pathlib import Path
+
+from . import cache, png
+from .infinite_grid import InfiniteGrid, Position, Rect
+from .png import RGB
+from .tiled_grid import TileKey, tile_spans
+from .tile_encoding import TILE_SHIFT, TILE_SIZE
+from .turmite import CellColor, MultipleTurmiteModel, TurmiteState
+
+UNCHANGED = 0
+ADDED = 1
+"""A default cell that got another value."""
+REMOVED = 2
+"""A cell that got the default value."""
+CHANGED = 3
+"""A cell that changed from one non-default value to another."""
+
+# the palette of diff images: background, unchanged non-default cells, the kinds of changes and changed turmites
+_BACKGROUND = 0
+_CONTEXT = 4
+_TURMITE = 5
+DIFF_PALETTE: list[RGB] = [(255, 255, 255), (0, 170, 0), (220, 0, 0), (0, 90, 220), (215, 215, 215), (0, 0, 0)]
+
+
+def _block(grid: InfiniteGrid[CellColor], rect: Rect) -> typing.Sequence[CellColor]:
+    """Like :meth:`InfiniteGrid.get_block`, but cells outside of a bounded grid are default cells instead of
+    wrapping around."""
+    if not grid.bounded:
+        return grid.get_block(rect)
+
+    x0, y0, width, height = rect
+    x1, y1 = min(x0 + width, grid.width), min(y0 + height, grid.height)
+    inner_x, inner_y = max(x0, 0), max(y0, 0)
+    if (inner_x, inner_y, x1, y1) == (x0, y0, x0 + width, y0 + height):
+        return grid.get_block(rect)
+
+    block = bytearray([grid.default]) * (width * height)
+    if inner_x < x1 and inner_y < y1:
+        inner = grid.get_block((inner_x, inner_y, x1 - inner_x, y1 - inner_y))
+        for y in range(inner_y, y1):
+            start = (y - y0) * width + inner_x - x0
+            inner_start = (y - inner_y) * (x1 - inner_x)
+            block[start:start + x1 - inner_x] = inner[inner_start:inner_start + x1 - inner_x]
+    return block
+
+
+def _candidate_tiles(old: InfiniteGrid[CellColor], new: InfiniteGrid[CellColor]) -> set[TileKey]:
+    """The tiles that might differ. Tiles the grids share since a fork and tiles with the same encoding are skipped
+    without looking at their cells."""
+    if (old.bounded or new.bounded) and not (
+        old.bounded and new.bounded and (old.width, old.height) == (new.width, new.height)
+    ):
+        # changed_tiles would read cells outside of a bounded grid, which wrap around, so every tile with a
+        # non-default cell is compared
+        return {
+            (x >> TILE_SHIFT, y >> TILE_SHIFT) for grid in (old, new) for (x, y), _ in grid.items()
+        }
+    return old.changed_tiles(new)
+
+
+@dataclasses.dataclass
+class GridDiff:
+    """The cells in which two grids differ, stored as the blocks of both grids for every tile of
+    ``TILE_SIZE`` x ``TILE_SIZE`` cells that contains a change."""
+
+    default: CellColor
+    tiles: dict[TileKey, tuple[typing.Sequence[CellColor], typing.Sequence[CellColor]]]
+    """The old and the new values of all cells of every changed tile, row by row."""
+    compared_tiles: int
+    """The number of tiles that were compared cell by cell, all others were known to be equal."""
+    changed_cells: int
+
+    @classmethod
+    def compute(cls, old: InfiniteGrid[CellColor], new: InfiniteGrid[CellColor]) -> "GridDiff":
+        """Compares the grids tile by tile. Raises :class:`ValueError` if their default values differ."""
+        if old.default != new.default:
+            raise ValueError("Only grids with the same default value can be compared.")
+
+        candidates = _candidate_tiles(old, new)
+        tiles = {}
+        changed_cells = 0
+        for tile_x, tile_y in sorted(candidates, key=lambda key: (key[1], key[0])):
+            rect = tile_x << TILE_SHIFT, tile_y << TILE_SHIFT, TILE_SIZE, TILE_SIZE
+            old_block, new_block = _block(old, rect), _block(new, rect)
+            if old_block != new_block:
+                tiles[tile_x, tile_y] = old_block, new_block
+                changed_cells += sum(1 for old_value, new_value in zip(old_block, new_block) if old_value != new_value)
+
+        return cls(old.default, tiles, len(candidates), changed_cells)
+
+    def __len__(self):
+        return self.changed_cells
+
+    def cells(self) -> typing.Iterator[tuple[Position, CellColor, CellColor]]:
+        """Every changed cell with its old and new value, row by row within each tile."""
+        for (tile_x, tile_y), (old_block, new_block) in self.tiles.items():
+            x0, y0 = tile_x << TILE_SHIFT, tile_y << TILE_SHIFT
+            for index, (old_value, new_value) in enumerate(zip(old_block, new_block)):
+                if old_value != new_value:
+                    yield (x0 + (index & (TILE_SIZE - 1)), y0 + (index >> TILE_SHIFT)), old_value, new_value
+
+    def kinds(self, key: TileKey) -> bytearray:
+        """:data:`UNCHANGED`, :data:`ADDED`, :data:`REMOVED` or :data:`CHANGED` for every cell of a tile."""
+        kinds = bytearray(TILE_SIZE * TILE_SIZE)
+        if key not in self.tiles:
+            return kinds
+
+        default = self.default
+        for index, (old_value, new_value) in enumerate(zip(*self.tiles[key])):
+            if old_value != new_value:
+                kinds[index] = ADDED if old_value == default else REMOVED if new_value == default else CHANGED
+        return kinds
+
+    def counts(self) -> dict[int, int]:
+        """How many cells were added, removed and changed."""
+        counts = {ADDED: 0, REMOVED: 0, CHANGED: 0}
+        for key in self.tiles:
+            kinds = self.kinds(key)
+            for kind in counts:
+                counts[kind] += kinds.count(kind)
+        return counts
+
+    def bounding_box(self) -> Rect | None:
+        """The smallest rectangle containing all changed cells, or ``None`` if the grids are equal."""
+        positions = [position for position, _, _ in self.cells()]
+        if not positions:
+            return None
+
+        min_x = min(x for x, _ in positions)
+        min_y = min(y for _, y in positions)
+        return (
+            min_x, min_y,
+            max(x for x, _ in positions) + 1 - min_x,
+            max(y for _, y in positions) + 1 - min_y
+        )
+
+
+TurmiteSnapshot = typing.Tuple[Position, int, TurmiteState]
+"""Position, direction modulo 4 and state of a turmite."""
+
+
+@dataclasses.dataclass
+class TurmiteChange:
+    index: int
+    old: TurmiteSnapshot | None
+    """``None`` if the turmite only exists in the new model."""
+    new: TurmiteSnapshot | None
+    """``None`` if the turmite only exists in the old model."""
+    transition_table_changed: bool
+
+
+@dataclasses.dataclass
+class ModelDiff:
+    old_iteration: int
+    new_iteration: int
+    grid: GridDiff
+    turmites: list[TurmiteChange]
+    """The turmites that differ, matched by their index."""
+
+    @classmethod
+    def compute(cls, old: MultipleTurmiteModel, new: MultipleTurmiteModel) -> "ModelDiff":
+        changes = []
+        for index in range(max(len(old.turmites), len(new.turmites))):
+            old_turmite = old.turmites[index] if index < len(old.turmites) else None
+            new_turmite = new.turmites[index] if index < len(new.turmites) else None
+            old_snapshot, new_snapshot = (
+                None if turmite is None else (turmite.position, turmite.direction % 4, turmite.state)
+                for turmite in (old_turmite, new_turmite)
+            )
+            transition_table_changed = (
+                old_turmite is not None and new_turmite is not None
+                and frozenset(old_turmite.transition_table) != frozenset(new_turmite.transition_table)
+            )
+            if old_snapshot != new_snapshot or transition_table_changed:
+                changes.append(TurmiteChange(index, old_snapshot, new_snapshot, transition_table_changed))
+
+        return cls(old.iteration, new.iteration, GridDiff.compute(old.grid, new.grid), changes)
+
+    def summary(self) -> str:
+        counts = self.grid.counts()
+        lines = [
+            f"Iterations {self.old_iteration} and {self.new_iteration}",
+            f"{len(self.grid)} changed cells ({counts[ADDED]} added, {counts[REMOVED]} removed, "
+            f"{counts[CHANGED]} changed) in {len(self.grid.tiles)} of {self.grid.compared_tiles} compared tiles",
+        ]
+        bounding_box = self.grid.bounding_box()
+        if bounding_box is not None:
+            lines.append("Changed region: x {}, y {}, {}x{}".format(*bounding_box))
+
+        lines.append(f"{len(self.turmites)} changed turmites")
+        for change in self.turmites:
+            if change.old is None:
+                lines.append(f"  #{change.index + 1} added at {change.new[0]}")
+            elif change.new is None:
+                lines.append(f"  #{change.index + 1} removed at {change.old[0]}")
+            else:
+                (old_position, old_direction, old_state), (position, direction, state) = change.old, change.new
+                line = (f"  #{change.index + 1} {old_position} -> {position}, direction {old_direction} -> "
+                        f"{direction}, state {old_state} -> {state}")
+                if change.transition_table_changed:
+                    line += ", different transition table"
+                lines.append(line)
+        return "\n".join(lines)
+
+    def write_png(self, file: typing.BinaryIO, grid: InfiniteGrid[CellColor], rect: Rect, scale: int = 1):
+        """Draws the changes in the rectangle: added cells green, removed ones red and changed ones blue. Other
+        non-default cells of ``grid``, usually the new grid, are drawn light gray, the new positions of changed
+        turmites black."""
+        x0, y0, width, height = rect
+        writer = png.PaletteWriter(file, width * scale, height * scale, DIFF_PALETTE)
+        turmites = {
+            change.new[0] for change in self.turmites if change.new is not None
+        }
+        kinds = {key: self.grid.kinds(key) for key in self.grid.tiles}
+
+        for y in range(y0, y0 + height):
+            context = _block(grid, (x0, y, width, 1))
+            row = bytearray(_CONTEXT if value != grid.default else _BACKGROUND for value in context)
+
+            for key, x, end_x, _, _ in tile_spans((x0, y, width, 1), kinds):
+                start = ((y - (key[1] << TILE_SHIFT)) << TILE_SHIFT) + x - (key[0] << TILE_SHIFT)
+                for offset, kind in enumerate(kinds[key][start:start + end_x - x]):
+                    if kind != UNCHANGED:
+                        row[x - x0 + offset] = kind
+
+            for turmite_x, turmite_y in turmites:
+                if turmite_y == y and x0 <= turmite_x < x0 + width:
+                    row[turmite_x - x0] = _TURMITE
+
+            scaled = png.scale_row(row, scale)
+            for _ in range(scale):
+                writer.write_row(scaled)
+
+        writer.close()
+
+
+def _load(path: Path, iterations: int, result_cache: cache.ResultCache | None) -> MultipleTurmiteModel:
+    with open(path, "r", encoding="utf-8") as f:
+        model = MultipleTurmiteModel.from_json(json.load(f)["model"])
+
+    if iterations:
+        if result_cache is None:
+            model.step_many(iterations)
+        else:
+            cache.run_cached(model, iterations, result_cache)
+    return model
+
+
+def main(args: list[str]):
+    parser = argparse.ArgumentParser(
+        prog="python -m turmites.diff",
+        description="Compare the grids and turmites of two projects, e.g. two rule variants or two saved iterations "
+                    "of one run."
+    )
+    parser.add_argument("old", type=Path)
+    parser.add_argument("new", type=Path)
+    parser.add_argument("--iterations", type=int, default=0,
+                        help="run both projects for this many iterations first, results of earlier runs are reused")
+    parser.add_argument("--no-cache", action="store_true", help="neither use nor store cached results")
+    parser.add_argument("--image", type=Path, help="draw the changes into this PNG file")
+    parser.add_argument("--margin", type=int, default=16, help="cells around the changes in the image")
+    parser.add_argument("--scale", type=int, default=1, help="pixels per cell")
+    parsed = parser.parse_args(args[1:])
+
+    result_cache = None if parsed.no_cache else cache.ResultCache()
+    old = _load(parsed.old, parsed.iterations, result_cache)
+    new = _load(parsed.new, parsed.iterations, result_cache)
+
+    diff = ModelDiff.compute(old, new)
+    print(diff.summary())
+
+    if parsed.image is not None:
+        bounding_box = diff.grid.bounding_box()
+        if bounding_box is None:
+            print("The grids are equal, no image written.", file=sys.stderr)
+        else:
+            x, y, width, height = bounding_box
+            rect = x - parsed.margin, y - parsed.margin, width + 2 * parsed.margin, height + 2 * parsed.margin
+            with open(parsed.image, "wb") as f:
+                diff.write_png(f, new.grid, rect, parsed.scale)
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
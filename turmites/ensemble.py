@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import dataclasses
+import typing
+
+from .bounded_grid import BoundedGrid
+from .infinite_grid import DIRECTION_OFFSETS, InfiniteGrid, Rect
+from .jit import _CompiledTables
+from .tiled_grid import TiledGrid
+from .turmite import CellColor, MultipleTurmiteModel, TransitionTable, UnknownStateError
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_MAX_VALUE = 256
+
+
+@dataclasses.dataclass
+class ReplicaResult:
+    iterations: int
+    """The number of iterations the replica was advanced by."""
+    cells: int
+    """The number of non-default cells afterwards."""
+    bounding_box: Rect | None
+    error: UnknownStateError | None = None
+    """Set if the replica stopped early because a transition table entry was missing."""
+
+
+def random_replicas(model: MultipleTurmiteModel, count: int, rect: Rect, weights: typing.Mapping[CellColor, float],
+                    seed: int = None) -> list[MultipleTurmiteModel]:
+    """Copies of the model, each with the rectangle filled at random. Replica ``i`` uses the seed ``seed + i``."""
+    replicas = []
+    for i in range(count):
+        replica = MultipleTurmiteModel.from_json(model.to_json())
+        replica.grid.random_fill(rect, weights, None if seed is None else seed + i)
+        replicas.append(replica)
+    return replicas
+
+
+class EnsembleEngine:
+    """Advances many independent replicas of a model in lockstep.
+
+    All replicas need the same number of turmites. Their turmites are kept as arrays with one row per replica and
+    the grids around them as a stack of dense windows of equal size, so every small step is a handful of NumPy
+    operations for all replicas together instead of one interpreted step per replica. Windows grow when a turmite
+    is about to leave them, like in :class:`~turmites.jit.JitEngine`.
+
+    Without NumPy, or if the replicas can't be represented densely, every replica is stepped in pure Python.
+    """
+
+    def __init__(self, models: list[MultipleTurmiteModel], margin: int = 32, max_window_cells: int = 1 << 26):
+        self.models = models
+        self.margin = margin
+        self.max_window_cells = max_window_cells
+
+    def run(self, iterations: int) -> list[ReplicaResult]:
+        start_iterations = [model.iteration for model in self.models]
+        errors: list[UnknownStateError | None] = [None] * len(self.models)
+
+        if self._supported():
+            self._run_batched(iterations, errors)
+        else:
+            for i, model in enumerate(self.models):
+                errors[i] = self._run_sequential(model, iterations * len(model.turmites))
+
+        return [
+            ReplicaResult(model.iteration - start_iteration, len(model.grid), model.grid.bounding_box(), error)
+            for model, start_iteration, error in zip(self.models, start_iterations, errors)
+        ]
+
+    @staticmethod
+    def _run_sequential(model: MultipleTurmiteModel, small_steps: int) -> UnknownStateError | None:
+        try:
+            for _ in range(small_steps):
+                model.step_small()
+        except UnknownStateError as e:
+            return e
+        return None
+
+    def _supported(self) -> bool:
+        if np is None or not self.models:
+            return False
+
+        n_turmites = len(self.models[0].turmites)
+        for model in self.models:
+            default = model.grid.default
+            if (
+                len(model.turmites) != n_turmites or not n_turmites or model.grid.bounded
+                or model.visits is not None or model.paths is not None
+                or not isinstance(default, int) or not 0 <= default < _MAX_VALUE
+            ):
+                return False
+
+            if not all(
+                0 <= turmite.state < _MAX_VALUE and _CompiledTables.supports(turmite.transition_table)
+                for turmite in model.turmites
+            ):
+                return False
+
+        return True
+
+    def _run_batched(self, iterations: int, errors: list[UnknownStateError | None]):
+        models = self.models
+        n_turmites = len(models[0].turmites)
+
+        # start every replica at its first turmite, the rest of the small steps is done in Python at the end
+        remaining = [iterations * n_turmites] * len(models)
+        for i, model in enumerate(models):
+            aligning_steps = min(remaining[i], (n_turmites - model.small_step) % n_turmites)
+            errors[i] = self._run_sequential(model, aligning_steps)
+            remaining[i] -= aligning_steps
+
+        active = np.array([error is None for error in errors])
+        batched_iterations = min(steps // n_turmites for steps in remaining)
+
+        if batched_iterations and active.any():
+            steps_done = self._run_windows(batched_iterations, active)
+            for i in range(len(models)):
+                remaining[i] -= int(steps_done[i])
+
+        # replicas that ran into a missing entry repeat the failing step in Python, which raises the error
+        for i, model in enumerate(models):
+            if errors[i] is None:
+                errors[i] = self._run_sequential(model, remaining[i])
+
+    def _run_windows(self, iterations: int, active) -> typing.Any:
+        """Runs the active replicas for at most the given number of iterations and returns the number of small steps
+        done by every replica.
+
+        Replicas that reach a missing transition table entry stop before that step. All replicas stop early if the
+        windows would get larger than ``max_window_cells``.
+        """
+        models = self.models
+        n_turmites = len(models[0].turmites)
+
+        tables: dict[int, TransitionTable] = {}
+        for model in models:
+            for turmite in model.turmites:
+                tables.setdefault(id(turmite.transition_table), turmite.transition_table)
+        table_index = {key: i for i, key in enumerate(tables)}
+        compiled = _CompiledTables(list(tables.values()))
+        n_colors, n_states = compiled.turns.shape[1:]
+
+        table_ids = np.array(
+            [[table_index[id(turmite.transition_table)] for turmite in model.turmites] for model in models],
+            dtype=np.int64
+        )
+        directions = np.array(
+            [[turmite.direction % 4 for turmite in model.turmites] for model in models], dtype=np.int64
+        )
+        states = np.array([[turmite.state for turmite in model.turmites] for model in models], dtype=np.int64)
+        positions = np.array(
+            [[turmite.position for turmite in model.turmites] for model in models], dtype=np.int64
+        ).reshape(len(models), n_turmites, 2)
+        offsets = np.array(DIRECTION_OFFSETS, dtype=np.int64)
+        steps_done = np.zeros(len(models), dtype=np.int64)
+        replicas = np.arange(len(models))
+
+        # replicas that already failed are left exactly as they are
+        started = active.tolist()
+
+        margin = self.margin
+        windows = None
+        t = 0
+        while steps_done.max() < iterations * n_turmites and active.any():
+            if windows is None:
+                loaded = self._load_windows(positions, margin)
+                if loaded is None:
+                    break
+                origins, windows, margin = loaded
+                initial_windows = windows.copy()
+                height, width = windows.shape[1:]
+                xs = positions[:, :, 0] - origins[:, None, 0]
+                ys = positions[:, :, 1] - origins[:, None, 1]
+
+            x, y = xs[:, t], ys[:, t]
+            cell_colors = windows[replicas, y, x].astype(np.int64)
+            state = states[:, t]
+
+            entry = (table_ids[:, t], np.minimum(cell_colors, n_colors - 1), np.minimum(state, n_states - 1))
+            turn = compiled.turns[entry]
+            active &= (cell_colors < n_colors) & (state < n_states) & (turn >= 0)
+
+            direction = (directions[:, t] + turn) & 3
+            new_x = x + offsets[direction, 0]
+            new_y = y + offsets[direction, 1]
+
+            if (active & ((new_x < 0) | (new_y < 0) | (new_x >= width) | (new_y >= height))).any():
+                # nothing of this step has been applied yet, it is repeated in larger windows
+                self._write_back(origins, windows, initial_windows)
+                positions = np.stack([xs + origins[:, None, 0], ys + origins[:, None, 1]], axis=2)
+                windows = None
+                margin *= 2
+                continue
+
+            a = active
+            windows[replicas[a], y[a], x[a]] = compiled.new_colors[entry][a]
+            states[a, t] = compiled.new_states[entry][a]
+            directions[a, t] = direction[a]
+            xs[a, t] = new_x[a]
+            ys[a, t] = new_y[a]
+            steps_done[a] += 1
+
+            t = (t + 1) % n_turmites
+
+        if windows is not None:
+            self._write_back(origins, windows, initial_windows)
+            positions = np.stack([xs + origins[:, None, 0], ys + origins[:, None, 1]], axis=2)
+
+        for model, model_started, model_positions, model_directions, model_states, model_steps in zip(
+                models, started, positions.tolist(), directions.tolist(), states.tolist(), steps_done.tolist()
+        ):
+            if not model_started:
+                continue
+            for turmite, position, direction, state in zip(
+                    model.turmites, model_positions, model_directions, model_states
+            ):
+                turmite.position = tuple(position)
+                turmite.direction = direction
+                turmite.state = state
+            model.invalidate_hash()
+
+            # every replica started at its first turmite
+            model.iteration += model_steps // n_turmites
+            model.small_step = model_steps % n_turmites
+
+        return steps_done
+
+    def _load_windows(self, positions, margin: int):
+        """Loads windows of equal size around the turmites of every replica, shrinking the margin if they would get
+        too large. Returns the origin of every window, the stacked windows and the margin, or ``None``."""
+        n_replicas = positions.shape[0]
+        min_corners = positions.min(axis=1)
+        extents = positions.max(axis=1) - min_corners
+
+        while True:
+            width, height = (extents.max(axis=0) + 2 * margin + 1).tolist()
+            if n_replicas * width * height <= self.max_window_cells:
+                break
+            if margin <= 1:
+                return None
+            margin //= 2
+
+        origins = min_corners - margin
+        windows = np.empty((n_replicas, height, width), dtype=np.uint8)
+        for model, (min_x, min_y), window in zip(self.models, origins.tolist(), windows):
+            if not self._read_window(model.grid, min_x, min_y, window):
+                return None
+
+        return origins, windows, margin
+
+    @staticmethod
+    def _read_window(grid: InfiniteGrid[CellColor], min_x: int, min_y: int, window) -> bool:
+        height, width = window.shape
+        rect = min_x, min_y, width, height
+
+        if isinstance(grid, (BoundedGrid, TiledGrid)):
+            window[:] = np.frombuffer(grid.get_block(rect), dtype=np.uint8).reshape(height, width)
+            return True
+
+        window.fill(grid.default)
+        for (x, y), cell_color in grid.items_in_rect(rect):
+            if not isinstance(cell_color, int) or not 0 <= cell_color < _MAX_VALUE:
+                return False
+            window[y - min_y, x - min_x] = cell_color
+
+        return True
+
+    def _write_back(self, origins, windows, initial_windows):
+        for model, (min_x, min_y), window, initial_window in zip(
+                self.models, origins.tolist(), windows, initial_windows
+        ):
+            ys, xs = np.nonzero(window != initial_window)
+            model.grid.set_many(
+                ((x + min_x, y + min_y), cell_color)
+                for x, y, cell_color in zip(xs.tolist(), ys.tolist(), window[ys, xs].tolist())
+            )
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import typing
+
+if typing.TYPE_CHECKING:
+    from .turmite import MultipleTurmiteModel
+
+MASK = (1 << 64) - 1
+
+
+def mix(value: int) -> int:
+    """The splitmix64 finalizer, a cheap 64 bit mixing function. Replaces the usual table of random numbers, which
+    isn't possible on an infinite grid."""
+    value = (value + 0x9E3779B97F4A7C15) & MASK
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK
+    return value ^ (value >> 31)
+
+
+def _position_key(position: tuple[int, int]) -> int:
+    x, y = position
+    return (int(x) & 0xFFFFFFFF) | ((int(y) & 0xFFFFFFFF) << 32)
+
+
+def cell_hash(position: tuple[int, int], value: typing.Hashable) -> int:
+    """Zobrist key of a cell with the given value. The grid hash is the XOR of the keys of all non-default cells."""
+    # multiplying by an odd constant spreads the value over all bits of the key
+    return mix(_position_key(position) ^ (hash(value) * 0xD6E8FEB86659FD93 & MASK))
+
+
+def turmite_hash(index: int, position: tuple[int, int], direction: int, state: int) -> int:
+    return mix(
+        _position_key(position)
+        ^ ((index + 1) * 0xA0761D6478BD642F & MASK)
+        ^ (((state << 2 | direction & 3) + 1) * 0xE7037ED1A0B428DB & MASK)
+    )
+
+
+def small_step_hash(small_step: int) -> int:
+    return mix(small_step ^ 0x5DEECE66D)
+
+
+class CycleDetector:
+    """Detects when a model returns to a state it was in before, by comparing state hashes.
+
+    Call :meth:`check` once per iteration. Memory is bounded by ``max_entries``: when the table is full, only the
+    states at every second recorded iteration are kept, and from then on only every ``stride``-th iteration is
+    recorded. Every iteration is still looked up, so any cycle is found at most one period after an iteration of
+    the cycle has been recorded.
+    """
+
+    def __init__(self, max_entries: int = 1 << 20):
+        self.max_entries = max_entries
+        self.stride = 1
+        self.seen: dict[int, int] = {}
+
+    def check(self, model: MultipleTurmiteModel) -> int | None:
+        """Returns the iteration at which the current state was seen before, if it was."""
+        state_hash = model.state_hash
+        iteration = self.seen.get(state_hash)
+        if iteration is not None:
+            return iteration
+
+        if model.iteration % self.stride == 0:
+            if len(self.seen) >= self.max_entries:
+                self.stride *= 2
+                self.seen = {key: value for key, value in self.seen.items() if value % self.stride == 0}
+
+            if model.iteration % self.stride == 0:
+                self.seen[state_hash] = model.iteration
+
+        return None
+
+
+def find_cycle(model: MultipleTurmiteModel, max_iterations: int,
+               max_entries: int = 1 << 20) -> tuple[int, int] | None:
+    """Steps the model until its state repeats, for at most ``max_iterations`` iterations.
+
+    Returns the iteration at which the cycle was first entered (as far as it was recorded) and its period, or
+    ``None`` if no cycle was found. The model is left at the iteration where the repetition was detected.
+    """
+    detector = CycleDetector(max_entries)
+
+    for _ in range(max_iterations + 1):
+        earlier_iteration = detector.check(model)
+        if earlier_iteration is not None:
+            return earlier_iteration, model.iteration - earlier_iteration
+
+        model.step()
+
+    return None
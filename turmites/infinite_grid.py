@@ -1,28 +1,79 @@
 from __future__ import annotations
 
+import random
 import typing
 
+from .hashing import cell_hash
+from .tile_encoding import TILE_SHIFT
+
 Position = typing.Tuple[int, int]
+Rect = typing.Tuple[int, int, int, int]
+"""``(x, y, width, height)`` in cells."""
 
 T = typing.TypeVar("T")
 
+# offsets of the cell in front of a turmite facing in each direction: down, left, up, right
+DIRECTION_OFFSETS = ((0, 1), (-1, 0), (0, -1), (1, 0))
+
 
 class InfiniteGrid(typing.Generic[T]):
+    # whether the grid has edges, see BoundedGrid
+    bounded = False
+
     def __init__(self, default: T, _grid: dict[Position, T] = None):
         self._grid: dict[Position, T] = {} if _grid is None else _grid
         self.default = default
         self.listeners: list[typing.Callable[[Position, T], None]] = []
+        # bulk operations don't call the listeners above for every cell, but these once with all changes
+        self.bulk_listeners: list[typing.Callable[[dict[Position, T]], None]] = []
+        # only maintained once it has been requested
+        self._zobrist_hash: int | None = None
 
     def _call_listeners(self, key: Position, value: T):
         for grid_listener in self.listeners:
             grid_listener(key, value)
 
-    def __setitem__(self, key: Position, value: T):
+    def _call_bulk_listeners(self, changes: dict[Position, T]):
+        if not changes:
+            return
+
+        for bulk_listener in self.bulk_listeners:
+            bulk_listener(changes)
+
+    def _store(self, key: Position, value: T):
+        if self._zobrist_hash is not None:
+            self._update_zobrist_hash(key, self._grid.get(key, self.default), value)
+
         if value == self.default:
             self._grid.pop(key, None)
         else:
             self._grid[key] = value
 
+    def _update_zobrist_hash(self, key: Position, old_value: T, value: T):
+        if old_value != self.default:
+            self._zobrist_hash ^= cell_hash(key, old_value)
+        if value != self.default:
+            self._zobrist_hash ^= cell_hash(key, value)
+
+    @property
+    def zobrist_hash(self) -> int:
+        """64 bit hash of the contents of the grid. It is computed once and then updated in O(1) on every write."""
+        if self._zobrist_hash is None:
+            zobrist_hash = 0
+            for key, value in self.items():
+                zobrist_hash ^= cell_hash(key, value)
+            self._zobrist_hash = zobrist_hash
+
+        return self._zobrist_hash
+
+    def neighbour(self, position: Position, direction: int) -> tuple[Position, int]:
+        """The position and direction of a turmite after moving forward from ``position`` in ``direction``."""
+        x, y = position
+        dx, dy = DIRECTION_OFFSETS[direction]
+        return (x + dx, y + dy), direction
+
+    def __setitem__(self, key: Position, value: T):
+        self._store(key, value)
         self._call_listeners(key, value)
 
     def __getitem__(self, item: Position):
@@ -35,18 +86,139 @@ class InfiniteGrid(typing.Generic[T]):
         for key, value in self._grid.items():
             yield key, value
 
+    def items_in_rect(self, rect: Rect) -> typing.Iterator[tuple[Position, T]]:
+        """The non-default cells in the rectangle.
+
+        This takes time proportional to the smaller of the rectangle and the grid. Grids that are stored in tiles or
+        densely only read the part of the grid that the rectangle covers.
+        """
+        x0, y0, width, height = rect
+
+        if width * height <= len(self):
+            default = self.default
+            for y in range(y0, y0 + height):
+                for x in range(x0, x0 + width):
+                    value = self[x, y]
+                    if value != default:
+                        yield (x, y), value
+        else:
+            for (x, y), value in self.items():
+                if x0 <= x < x0 + width and y0 <= y < y0 + height:
+                    yield (x, y), value
+
+    def get_block(self, rect: Rect) -> typing.MutableSequence[T]:
+        """The values of all cells in the rectangle, row by row. Grids of byte values return a :class:`bytearray`."""
+        x0, y0, width, height = rect
+        block = [self.default] * (width * height)
+        for (x, y), value in self.items_in_rect(rect):
+            block[(y - y0) * width + x - x0] = value
+        return block
+
+    def set_block(self, rect: Rect, values: typing.Sequence[T]):
+        """Sets all cells in the rectangle to the values, given row by row like :meth:`get_block` returns them, and
+        notifies the bulk listeners once."""
+        x0, y0, width, height = rect
+        if len(values) != width * height:
+            raise ValueError(f"A block of {width}x{height} cells needs {width * height} values, not {len(values)}.")
+
+        self.set_many(
+            ((x, y), values[(y - y0) * width + x - x0])
+            for y in range(y0, y0 + height) for x in range(x0, x0 + width)
+            if self[x, y] != values[(y - y0) * width + x - x0]
+        )
+
+    def distinct_values(self) -> set[T]:
+        """All values of non-default cells, possibly along with the default value."""
+        return set(self._grid.values())
+
+    def bounding_box(self) -> Rect | None:
+        """The smallest rectangle containing all non-default cells, or ``None`` if there are none."""
+        positions = [position for position, _ in self.items()]
+        if not positions:
+            return None
+
+        min_x = min(x for x, _ in positions)
+        min_y = min(y for _, y in positions)
+        return (
+            min_x, min_y,
+            max(x for x, _ in positions) + 1 - min_x,
+            max(y for _, y in positions) + 1 - min_y
+        )
+
+    def changed_tiles(self, other: InfiniteGrid[T]) -> set[tuple[int, int]]:
+        """The keys of the tiles of ``TILE_SIZE`` x ``TILE_SIZE`` cells (see :mod:`~turmites.tile_encoding`) in which
+        this grid and ``other`` differ.
+
+        This compares every non-default cell of both grids. Grids that are stored in tiles skip the tiles they still
+        share with ``other``, e.g. after :meth:`fork`.
+        """
+        if other.default != self.default:
+            raise ValueError("Only grids with the same default value can be compared.")
+
+        changed = set()
+        for grid, other_grid in ((self, other), (other, self)):
+            for (x, y), value in grid.items():
+                key = x >> TILE_SHIFT, y >> TILE_SHIFT
+                if key not in changed and other_grid[x, y] != value:
+                    changed.add(key)
+        return changed
+
+    def fork(self) -> "InfiniteGrid[T]":
+        """A copy of the cells that can be changed independently of this grid. Listeners aren't copied.
+
+        Tiled grids share their tiles with the fork until either of them changes a tile, this grid copies its
+        dictionary.
+        """
+        grid = InfiniteGrid[T](self.default, dict(self._grid))
+        grid._zobrist_hash = self._zobrist_hash
+        return grid
+
     def to_json(self) -> dict:
         return {
             "grid": [[";".join(map(str, key)), value] for key, value in self._grid.items()],
             "default": self.default
         }
 
+    def set_many(self, cells: typing.Mapping[Position, T] | typing.Iterable[tuple[Position, T]]):
+        """Sets all given cells and notifies the bulk listeners once."""
+        changes = dict(cells)
+
+        for key, value in changes.items():
+            self._store(key, value)
+
+        self._call_bulk_listeners(changes)
+
+    def fill_rect(self, rect: Rect, value: T):
+        x0, y0, width, height = rect
+        self.set_many(((x, y), value) for y in range(y0, y0 + height) for x in range(x0, x0 + width))
+
+    def stamp(self, pattern: InfiniteGrid[T] | typing.Mapping[Position, T], offset: Position = (0, 0)):
+        """Copies the cells of the pattern, shifted by ``offset``. Default cells of a pattern grid are transparent."""
+        dx, dy = offset
+        self.set_many(((x + dx, y + dy), value) for (x, y), value in pattern.items())
+
+    def random_fill(self, rect: Rect, weights: typing.Mapping[T, float], seed: int = None):
+        """Fills the rectangle with values chosen at random with the given relative weights."""
+        x0, y0, width, height = rect
+        values = random.Random(seed).choices(list(weights.keys()), list(weights.values()), k=width * height)
+
+        self.set_many(
+            ((x0 + i % width, y0 + i // width), value) for i, value in enumerate(values)
+        )
+
     def clear(self):
-        for key in list(self._grid.keys()):
-            self[key] = self.default
+        changes = dict.fromkeys(self._grid, self.default)
+        self._grid.clear()
+        if self._zobrist_hash is not None:
+            self._zobrist_hash = 0
+
+        self._call_bulk_listeners(changes)
 
     @classmethod
     def from_json(cls, data: dict) -> "InfiniteGrid":
+        if cls is InfiniteGrid and "type" in data:
+            return grid_type(data["type"]).from_json(data)
+
         # noinspection PyTypeChecker
         return cls(
             data["default"],
@@ -55,3 +227,15 @@ class InfiniteGrid(typing.Generic[T]):
                 for key, value in data["grid"]
             )
         )
+
+
+def grid_type(name: str) -> type[InfiniteGrid]:
+    """The grid class stored as ``type`` in the JSON representation of grids other than :class:`InfiniteGrid`."""
+    if name == "bounded":
+        from .bounded_grid import BoundedGrid
+        return BoundedGrid
+    if name == "tiled":
+        from .tiled_grid import TiledGrid
+        return TiledGrid
+
+    raise ValueError(f"Unknown grid type {name!r}.")
@@ -0,0 +1,317 @@
+from __future__ import annotations
+
+import functools
+import importlib.util
+
+from .bounded_grid import BoundedGrid
+from .tiled_grid import TiledGrid
+from .turmite import MultipleTurmiteModel, TransitionTable
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_MAX_VALUE = 256
+
+_DONE = 0
+_EDGE = 1
+_UNKNOWN_STATE = 2
+
+# the most small steps per kernel call while paths are recorded, which bounds the buffer of their directions
+_MAX_RECORDED_STEPS = 1 << 20
+
+
+@functools.lru_cache(maxsize=None)
+def available() -> bool:
+    # importing numba takes longer than starting the rest of the application, so it is only imported by _kernel
+    return np is not None and importlib.util.find_spec("numba") is not None
+
+
+@functools.lru_cache(maxsize=None)
+def _kernel():
+    """:func:`_run` compiled by numba, which is imported on the first call."""
+    import numba
+
+    return numba.njit(cache=True)(_run)
+
+
+def _run(window, xs, ys, directions, states, table_ids, turns, new_colors, new_states, small_step, n_small_steps,
+         visits, last_visits, iteration, moves):
+    # visits and last_visits are empty if visits aren't recorded, moves if paths aren't
+    record_visits = visits.shape[0] != 0
+    record_moves = moves.shape[0] != 0
+    height, width = window.shape
+    n_turmites = xs.shape[0]
+    n_colors = turns.shape[1]
+    n_states = turns.shape[2]
+
+    done = 0
+    i = small_step
+    while done < n_small_steps:
+        x = xs[i]
+        y = ys[i]
+        cell_color = window[y, x]
+        state = states[i]
+        table_id = table_ids[i]
+
+        if cell_color >= n_colors or state >= n_states or turns[table_id, cell_color, state] < 0:
+            return done, _UNKNOWN_STATE
+
+        direction = (directions[i] + turns[table_id, cell_color, state]) & 3
+        if direction == 0:
+            new_x, new_y = x, y + 1
+        elif direction == 1:
+            new_x, new_y = x - 1, y
+        elif direction == 2:
+            new_x, new_y = x, y - 1
+        else:
+            new_x, new_y = x + 1, y
+
+        # leave everything untouched, so that the step can be repeated in a larger window
+        if new_x < 0 or new_y < 0 or new_x >= width or new_y >= height:
+            return done, _EDGE
+
+        if record_visits:
+            visits[y, x] += 1
+            last_visits[y, x] = iteration
+        if record_moves:
+            moves[done] = direction
+
+        window[y, x] = new_colors[table_id, cell_color, state]
+        states[i] = new_states[table_id, cell_color, state]
+        directions[i] = direction
+        xs[i] = new_x
+        ys[i] = new_y
+
+        done += 1
+        i += 1
+        if i == n_turmites:
+            i = 0
+            iteration += 1
+
+    return done, _DONE
+
+
+class _CompiledTables:
+    """Dense lookup arrays for all distinct transition tables of a model, indexed by ``[table, color, state]``."""
+
+    def __init__(self, transition_tables: list[TransitionTable]):
+        n_colors = n_states = 1
+        for transition_table in transition_tables:
+            for (cell_color, turmite_state), (_, new_cell_color, new_turmite_state) in transition_table:
+                n_colors = max(n_colors, cell_color + 1, new_cell_color + 1)
+                n_states = max(n_states, turmite_state + 1, new_turmite_state + 1)
+
+        shape = (len(transition_tables), n_colors, n_states)
+        self.turns = np.full(shape, -1, dtype=np.int8)
+        self.new_colors = np.zeros(shape, dtype=np.uint8)
+        self.new_states = np.zeros(shape, dtype=np.int32)
+
+        for table_id, transition_table in enumerate(transition_tables):
+            for (cell_color, turmite_state), (turn, new_cell_color, new_turmite_state) in transition_table:
+                self.turns[table_id, cell_color, turmite_state] = turn % 4
+                self.new_colors[table_id, cell_color, turmite_state] = new_cell_color
+                self.new_states[table_id, cell_color, turmite_state] = new_turmite_state
+
+    @staticmethod
+    def supports(transition_table: TransitionTable) -> bool:
+        return all(
+            0 <= value < _MAX_VALUE
+            for (cell_color, turmite_state), (_, new_cell_color, new_turmite_state) in transition_table
+            for value in (cell_color, turmite_state, new_cell_color, new_turmite_state)
+        )
+
+
+class JitEngine:
+    """Advances a :class:`MultipleTurmiteModel` with a Numba-compiled inner loop.
+
+    The loop runs on a dense window of the grid around the turmites, which grows whenever a turmite is about to
+    leave it. Afterwards, only the changed cells are written back to the grid with :meth:`InfiniteGrid.set_many`.
+    When Numba (and NumPy) is not installed or the model can't be represented densely (colors or states outside
+    of ``0..255``), the model is stepped in pure Python instead.
+    """
+
+    def __init__(self, model: MultipleTurmiteModel, margin: int = 32, max_window_cells: int = 1 << 24):
+        self.model = model
+        self.margin = margin
+        self.max_window_cells = max_window_cells
+
+        # compiled tables are reused as long as the same table objects are used and none of them was changed. The
+        # tables are kept alive with them, so that their ids can't be reused by other tables
+        self._compiled_key: tuple[tuple[int, int], ...] | None = None
+        self._compiled_tables: list[TransitionTable] = []
+        self._compiled: _CompiledTables | None = None
+
+    def run(self, iterations: int):
+        if not self._supported():
+            self.model.step_many(iterations)
+            return
+
+        model = self.model
+        turmites = model.turmites
+        n_small_steps = iterations * len(turmites)
+
+        tables = self._compile()
+        table_indices = {table_id: i for i, (table_id, _) in enumerate(self._compiled_key)}
+        table_ids = np.array([table_indices[id(turmite.transition_table)] for turmite in turmites], dtype=np.int32)
+        directions = np.array([turmite.direction % 4 for turmite in turmites], dtype=np.int8)
+        states = np.array([turmite.state for turmite in turmites], dtype=np.int32)
+
+        margin = self.margin
+        origin, window, margin = self._load_window(margin)
+        if window is None:
+            model.step_many(iterations)
+            return
+        initial_window = window.copy()
+        visits, last_visits = self._visit_windows(window)
+        moves = np.zeros(
+            min(n_small_steps, _MAX_RECORDED_STEPS) if model.paths is not None else 0, dtype=np.uint8
+        )
+
+        xs = np.array([turmite.position[0] - origin[0] for turmite in turmites], dtype=np.int64)
+        ys = np.array([turmite.position[1] - origin[1] for turmite in turmites], dtype=np.int64)
+
+        small_step = model.small_step
+        total_done = 0
+        while True:
+            steps = n_small_steps - total_done
+            if model.paths is not None:
+                steps = min(steps, moves.shape[0])
+                start_xs, start_ys = xs + origin[0], ys + origin[1]
+            iteration = model.iteration + (model.small_step + total_done) // len(turmites)
+
+            done, status = _kernel()(
+                window, xs, ys, directions, states, table_ids,
+                tables.turns, tables.new_colors, tables.new_states,
+                small_step, steps, visits, last_visits, iteration, moves
+            )
+            if model.paths is not None:
+                self._record_paths(start_xs, start_ys, small_step, iteration, moves[:done])
+            total_done += done
+            small_step = (small_step + done) % len(turmites)
+
+            if status == _DONE and total_done < n_small_steps:
+                continue
+            if status != _EDGE:
+                break
+
+            # a turmite reached the edge of the window: flush the window and load a larger one around all turmites.
+            # The window stops growing at max_window_cells and is only moved along with the turmites from then on
+            self._write_back(origin, window, initial_window, visits, last_visits)
+            positions = [(int(x) + origin[0], int(y) + origin[1]) for x, y in zip(xs, ys)]
+
+            new_origin, window, margin = self._load_window(margin * 2, positions)
+            if window is None:
+                break
+            initial_window = window.copy()
+            visits, last_visits = self._visit_windows(window)
+
+            xs += origin[0] - new_origin[0]
+            ys += origin[1] - new_origin[1]
+            origin = new_origin
+
+        if window is not None:
+            self._write_back(origin, window, initial_window, visits, last_visits)
+
+        for i, turmite in enumerate(turmites):
+            turmite.position = int(xs[i]) + origin[0], int(ys[i]) + origin[1]
+            turmite.direction = int(directions[i])
+            turmite.state = int(states[i])
+        model.invalidate_hash()
+
+        model.iteration += (model.small_step + total_done) // len(turmites)
+        model.small_step = small_step
+
+        # finish in pure Python, which raises UnknownStateError in the right place
+        for _ in range(n_small_steps - total_done):
+            model.step_small()
+
+    def _supported(self) -> bool:
+        if not available() or not self.model.turmites or self.model.grid.bounded:
+            return False
+
+        default = self.model.grid.default
+        if not isinstance(default, int) or not 0 <= default < _MAX_VALUE:
+            return False
+
+        return all(
+            0 <= turmite.state < _MAX_VALUE and _CompiledTables.supports(turmite.transition_table)
+            for turmite in self.model.turmites
+        )
+
+    def _compile(self) -> _CompiledTables:
+        tables: dict[int, TransitionTable] = {}
+        for turmite in self.model.turmites:
+            tables.setdefault(id(turmite.transition_table), turmite.transition_table)
+
+        key = tuple((table_id, table.version) for table_id, table in tables.items())
+        if key != self._compiled_key:
+            self._compiled_key = key
+            self._compiled_tables = list(tables.values())
+            self._compiled = _CompiledTables(self._compiled_tables)
+
+        return self._compiled
+
+    def _load_window(self, margin: int, positions: list[tuple[int, int]] = None):
+        if positions is None:
+            positions = [turmite.position for turmite in self.model.turmites]
+
+        xs = [x for x, _ in positions]
+        ys = [y for _, y in positions]
+
+        while True:
+            min_x, min_y = min(xs) - margin, min(ys) - margin
+            width, height = max(xs) + margin + 1 - min_x, max(ys) + margin + 1 - min_y
+
+            if width * height <= self.max_window_cells:
+                break
+            if margin <= 1:
+                return None, None, margin
+            margin //= 2
+
+        grid = self.model.grid
+        rect = min_x, min_y, width, height
+
+        if isinstance(grid, (BoundedGrid, TiledGrid)):
+            # their cells are bytes already
+            window = np.frombuffer(grid.get_block(rect), dtype=np.uint8).reshape(height, width)
+            return (min_x, min_y), window, margin
+
+        window = np.full((height, width), grid.default, dtype=np.uint8)
+        for (x, y), cell_color in grid.items_in_rect(rect):
+            if not isinstance(cell_color, int) or not 0 <= cell_color < _MAX_VALUE:
+                return None, None, margin
+            window[y - min_y, x - min_x] = cell_color
+
+        return (min_x, min_y), window, margin
+
+    def _visit_windows(self, window):
+        shape = window.shape if self.model.visits is not None else (0, 0)
+        return np.zeros(shape, dtype=np.uint32), np.zeros(shape, dtype=np.uint64)
+
+    def _record_paths(self, xs, ys, small_step: int, iteration: int, moves):
+        """Adds the directions of the small steps done from the given positions to the paths of the turmites."""
+        n_turmites = len(self.model.turmites)
+        for k in range(min(n_turmites, len(moves))):
+            i = (small_step + k) % n_turmites
+            self.model.paths[i].extend(
+                iteration + (small_step + k) // n_turmites, (int(xs[i]), int(ys[i])), moves[k::n_turmites].tobytes()
+            )
+
+    def _write_back(self, origin: tuple[int, int], window, initial_window, visits, last_visits):
+        min_x, min_y = origin
+        grid = self.model.grid
+
+        if self.model.visits is not None:
+            ys, xs = np.nonzero(visits)
+            for x, y, count, iteration in zip(
+                    xs.tolist(), ys.tolist(), visits[ys, xs].tolist(), last_visits[ys, xs].tolist()
+            ):
+                self.model.visits.record((x + min_x, y + min_y), iteration, count)
+
+        ys, xs = np.nonzero(window != initial_window)
+        grid.set_many(
+            ((x + min_x, y + min_y), cell_color)
+            for x, y, cell_color in zip(xs.tolist(), ys.tolist(), window[ys, xs].tolist())
+        )
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import base64
+import json
+import os
+import typing
+import zlib
+from pathlib import Path
+
+from . import tile_encoding
+from .infinite_grid import InfiniteGrid, Position
+from .tile_encoding import TILE_SHIFT, TILE_SIZE
+from .turmite import CellColor, MultipleTurmiteModel
+
+TileKey = typing.Tuple[int, int]
+
+
+def _tile_positions(grid: InfiniteGrid[CellColor], key: TileKey) -> typing.Iterator[Position]:
+    """The positions of the cells of a tile, restricted to the grid if it is bounded."""
+    tile_x, tile_y = key
+    x0, y0 = tile_x << TILE_SHIFT, tile_y << TILE_SHIFT
+    x1, y1 = x0 + TILE_SIZE, y0 + TILE_SIZE
+    if grid.bounded:
+        x0, y0 = max(x0, 0), max(y0, 0)
+        x1, y1 = min(x1, grid.width), min(y1, grid.height)
+
+    for y in range(y0, y1):
+        for x in range(x0, x1):
+            yield x, y
+
+
+def _encode_tile(grid: InfiniteGrid[CellColor], key: TileKey) -> str:
+    tile_x, tile_y = key
+    x0, y0 = tile_x << TILE_SHIFT, tile_y << TILE_SHIFT
+
+    # cells outside of a bounded grid stay at the default
+    tile = bytearray([grid.default]) * (TILE_SIZE * TILE_SIZE)
+    for x, y in _tile_positions(grid, key):
+        tile[(y - y0) << TILE_SHIFT | (x - x0)] = grid[x, y]
+
+    return base64.b64encode(zlib.compress(tile_encoding.encode(tile, grid.default))).decode("ascii")
+
+
+def _decode_tile(grid: InfiniteGrid[CellColor], key: TileKey, data: str) -> typing.Iterator[tuple[Position, int]]:
+    tile_x, tile_y = key
+    x0, y0 = tile_x << TILE_SHIFT, tile_y << TILE_SHIFT
+
+    tile = tile_encoding.decode(zlib.decompress(base64.b64decode(data)), grid.default)
+    for x, y in _tile_positions(grid, key):
+        yield (x, y), tile[(y - y0) << TILE_SHIFT | (x - x0)]
+
+
+class Journal:
+    """An append-only file from which a model can be recovered after a crash.
+
+    The first line is a snapshot of the whole model, every further line only contains the turmites and the tiles of
+    the grid that changed since the previous line. Records are JSON objects, one per line, and every line is synced to
+    disk before :meth:`append` returns, so at most the last line can be incomplete after a crash, which
+    :func:`recover` ignores.
+
+    Deltas need cell colors from 0 to 255. Recorded visits and paths are only stored in snapshots.
+
+    ``extra`` is any JSON data that should be recovered with the model, e.g. the colors of the states.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.size = 0
+        """The size of the file in bytes."""
+        self.snapshot_size = 0
+        """The size of the snapshot at the start of the file."""
+        self.records = 0
+        """The number of deltas after the snapshot."""
+        # the grid, model and extra data the last record was written from
+        self._base: InfiniteGrid[CellColor] | None = None
+        self._last: tuple[dict, typing.Any] | None = None
+
+    @property
+    def started(self) -> bool:
+        return self._base is not None
+
+    def compact(self, model_data: dict, extra: typing.Any, grid: InfiniteGrid[CellColor]):
+        """Replaces the file by a snapshot. ``model_data`` is the JSON of a model without its grid, which is passed
+        separately as it is needed for the following deltas. The grid mustn't change afterwards, pass a fork of a
+        grid that is still used."""
+        line = json.dumps({"type": "snapshot", "model": model_data, "extra": extra, "grid": grid.to_json()}) + "\n"
+
+        temporary_path = self.path.with_name(self.path.name + ".tmp")
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            file.write(line)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, self.path)
+
+        self._base = grid
+        self._last = model_data, extra
+        self.size = self.snapshot_size = len(line.encode("utf-8"))
+        self.records = 0
+
+    def append(self, model_data: dict, extra: typing.Any, grid: InfiniteGrid[CellColor]):
+        """Appends the changes since the last record, if there are any. Like for :meth:`compact` the grid mustn't
+        change afterwards.
+
+        Raises :class:`ValueError` if there is no snapshot yet or the grid can't be stored as a delta, the journal
+        needs to be compacted then.
+        """
+        if self._base is None:
+            raise ValueError("The journal has no snapshot.")
+
+        try:
+            tiles = [[x, y, _encode_tile(grid, (x, y))] for x, y in sorted(grid.changed_tiles(self._base))]
+        except (TypeError, ValueError) as e:
+            raise ValueError("The grid can't be stored as a delta.") from e
+        if not tiles and self._last == (model_data, extra):
+            self._base = grid
+            return
+
+        line = json.dumps({"type": "delta", "model": model_data, "extra": extra, "tiles": tiles}) + "\n"
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(line)
+            file.flush()
+            os.fsync(file.fileno())
+
+        self._base = grid
+        self._last = model_data, extra
+        self.size += len(line.encode("utf-8"))
+        self.records += 1
+
+    def delete(self):
+        self.path.unlink(missing_ok=True)
+        self._base = self._last = None
+
+
+def recover(path: Path) -> tuple[MultipleTurmiteModel, typing.Any]:
+    """The model and the extra data of the last complete record of a journal.
+
+    If there are deltas, the model has no recorded visits or paths, as these would be older than the model.
+    Raises :class:`ValueError` if not even the snapshot is complete.
+    """
+    model = extra = None
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # only the last line can be incomplete
+                break
+
+            if record["type"] == "snapshot":
+                model = MultipleTurmiteModel.from_json({**record["model"], "grid": record["grid"]})
+            elif model is not None:
+                grid = model.grid
+                grid.set_many(
+                    cell for x, y, tile in record["tiles"] for cell in _decode_tile(grid, (x, y), tile)
+                )
+                model = MultipleTurmiteModel.from_json(record["model"], grid)
+            extra = record["extra"]
+
+    if model is None:
+        raise ValueError(f"{path} contains no snapshot.")
+    return model, extra
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import concurrent.futures
+import os
+import sys
+
+from .infinite_grid import InfiniteGrid, Position
+from .turmite import CellColor, MultipleTurmiteModel, Turmite, UnknownStateError
+
+
+def free_threading_enabled() -> bool:
+    """Whether the interpreter runs without the GIL, i.e. threads actually execute Python code in parallel."""
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return is_gil_enabled is not None and not is_gil_enabled()
+
+
+class _DisjointSet:
+    def __init__(self, size: int):
+        self.parents = list(range(size))
+
+    def find(self, i: int) -> int:
+        while self.parents[i] != i:
+            self.parents[i] = self.parents[self.parents[i]]
+            i = self.parents[i]
+        return i
+
+    def union(self, a: int, b: int):
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            self.parents[max(a, b)] = min(a, b)
+
+
+def partition_turmites(turmites: list[Turmite], iterations: int) -> list[list[int]]:
+    """Group the indices of turmites that could touch a common cell within the given number of iterations.
+
+    During one iteration a turmite reads and writes the cell it stands on and then moves by one cell, so within
+    ``iterations`` iterations it only touches cells closer than ``iterations`` (manhattan distance) to where it
+    started. Turmites further than ``2 * iterations`` apart can therefore be advanced independently. The plane is
+    split into square regions of that size, so only turmites in neighbouring regions have to be compared.
+
+    The indices inside every group are sorted, which preserves the execution order of the model.
+    """
+
+    region_size = 2 * iterations + 1
+    regions: dict[Position, list[int]] = {}
+    for i, turmite in enumerate(turmites):
+        x, y = turmite.position
+        regions.setdefault((x // region_size, y // region_size), []).append(i)
+
+    groups = _DisjointSet(len(turmites))
+    for (region_x, region_y), indices in regions.items():
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for j in regions.get((region_x + dx, region_y + dy), ()):
+                    x2, y2 = turmites[j].position
+                    for i in indices:
+                        x1, y1 = turmites[i].position
+                        if abs(x1 - x2) + abs(y1 - y2) <= 2 * iterations:
+                            groups.union(i, j)
+
+    grouped: dict[int, list[int]] = {}
+    for i in range(len(turmites)):
+        grouped.setdefault(groups.find(i), []).append(i)
+
+    return list(grouped.values())
+
+
+def _run_group(turmites: list[Turmite], grid: InfiniteGrid[CellColor],
+               iterations: int) -> tuple[dict[Position, CellColor], bool]:
+    # Reads fall through to the shared grid, writes are only collected. The grid is never mutated concurrently.
+    changes: dict[Position, CellColor] = {}
+
+    try:
+        for _ in range(iterations):
+            for turmite in turmites:
+                position = turmite.position
+                cell_color = changes[position] if position in changes else grid[position]
+                changes[position] = turmite.step(cell_color)
+    except UnknownStateError:
+        return changes, True
+
+    return changes, False
+
+
+class PartitionedEngine:
+    """Advances a :class:`MultipleTurmiteModel` by running groups of far-apart turmites in parallel.
+
+    The result is identical to calling :meth:`MultipleTurmiteModel.step` the same number of times: turmites that
+    cannot interact within a batch of iterations don't observe each other, so the order in which their groups are
+    executed doesn't matter. Groups only synchronize between batches, when the partition is recomputed. If any
+    turmite runs into a missing transition table entry, the whole batch is rolled back and replayed sequentially,
+    so the :class:`UnknownStateError` is raised in exactly the same state as with sequential stepping.
+
+    Threads only speed things up on a free-threaded interpreter. Otherwise, unless an executor is given
+    explicitly, the engine simply steps the model sequentially. An executor created by the engine itself is shut
+    down by :meth:`close`, so the engine should be closed or used as a context manager.
+    """
+
+    def __init__(self, model: MultipleTurmiteModel, batch_iterations: int = 64, min_batch_iterations: int = 4,
+                 executor: concurrent.futures.Executor = None):
+        self.model = model
+        self.batch_iterations = batch_iterations
+        self.min_batch_iterations = min_batch_iterations
+
+        self._owns_executor = executor is None and free_threading_enabled()
+        if self._owns_executor:
+            executor = concurrent.futures.ThreadPoolExecutor(os.cpu_count())
+        self.executor = executor
+
+    def close(self):
+        """Shuts down the executor if the engine created it; a given executor is left to its owner."""
+        if self._owns_executor:
+            self.executor.shutdown()
+            self._owns_executor = False
+
+    def __enter__(self) -> "PartitionedEngine":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def run(self, iterations: int):
+        # on bounded grids, turmites that are far apart can still meet at the edges. Visits are only recorded by
+        # MultipleTurmiteModel.step_small
+        if (
+            self.executor is None or len(self.model.turmites) < 2 or self.model.grid.bounded
+            or self.model.visits is not None or self.model.paths is not None
+        ):
+            self.model.step_many(iterations)
+            return
+
+        if iterations <= 0:
+            return
+
+        # finish the current iteration first, so that every batch starts with the first turmite
+        small_step = self.model.small_step
+        if small_step:
+            for _ in range(len(self.model.turmites) - small_step):
+                self.model.step_small()
+            iterations -= 1
+
+        while iterations > 0:
+            iterations -= self._run_batch(min(iterations, self.batch_iterations))
+
+        for _ in range(small_step):
+            self.model.step_small()
+
+    def _run_batch(self, iterations: int) -> int:
+        turmites = self.model.turmites
+
+        groups = partition_turmites(turmites, iterations)
+        while len(groups) < 2 and iterations > self.min_batch_iterations:
+            iterations //= 2
+            groups = partition_turmites(turmites, iterations)
+
+        if len(groups) < 2:
+            self.model.step_many(iterations)
+            return iterations
+
+        snapshot = [(turmite.position, turmite.direction, turmite.state) for turmite in turmites]
+        # the turmites are moved outside of step_small
+        self.model.invalidate_hash()
+
+        futures = [
+            self.executor.submit(_run_group, [turmites[i] for i in group], self.model.grid, iterations)
+            for group in groups
+        ]
+        results = [future.result() for future in futures]
+
+        if any(failed for _, failed in results):
+            for turmite, (position, direction, state) in zip(turmites, snapshot):
+                turmite.position, turmite.direction, turmite.state = position, direction, state
+
+            self.model.step_many(iterations)
+            return iterations
+
+        # the groups touched disjoint cells, so their changes can be merged in any order
+        all_changes: dict[Position, CellColor] = {}
+        for changes, _ in results:
+            all_changes.update(changes)
+        self.model.grid.set_many(all_changes)
+
+        self.model.iteration += iterations
+        return iterations
+
@@ -0,0 +1,341 @@
+from __future__ import annotations
+
+import array
+import base64
+import bisect
+import sys
+import typing
+import zlib
+
+from .infinite_grid import DIRECTION_OFFSETS, InfiniteGrid, Position
+
+KEYFRAME_INTERVAL = 4096
+"""The number of steps after which the absolute position of a turmite is stored again."""
+
+# directions are buffered one per byte and packed four per byte in chunks of this many steps
+_CHUNK_STEPS = 4096
+
+_PACK_TABLES = [bytes((value << 2 * i) & 0xFF for value in range(256)) for i in range(4)]
+_UNPACK_TABLES = [bytes((value >> 2 * i) & 3 for value in range(256)) for i in range(4)]
+
+
+def _pack(directions: bytes) -> bytes:
+    """Packs four directions into every byte, the first one into the lowest bits."""
+    directions = bytes(directions) + bytes(-len(directions) % 4)
+    packed = 0
+    for i in range(4):
+        packed |= int.from_bytes(directions[i::4].translate(_PACK_TABLES[i]), "little")
+    return packed.to_bytes(len(directions) // 4, "little")
+
+
+def _unpack(data: bytes) -> bytearray:
+    directions = bytearray(4 * len(data))
+    for i in range(4):
+        directions[i::4] = data.translate(_UNPACK_TABLES[i])
+    return directions
+
+
+def _displace(position: Position, directions: bytes) -> Position:
+    """The position after moving one cell in every direction on an infinite grid."""
+    x, y = position
+    for direction, (dx, dy) in enumerate(DIRECTION_OFFSETS):
+        count = directions.count(direction)
+        x += dx * count
+        y += dy * count
+    return x, y
+
+
+def _array_to_json(values: array.array) -> str:
+    if sys.byteorder == "big":
+        values = array.array(values.typecode, values)
+        values.byteswap()
+    return base64.b64encode(zlib.compress(values.tobytes())).decode("ascii")
+
+
+def _array_from_json(typecode: str, data: str) -> array.array:
+    values = array.array(typecode, zlib.decompress(base64.b64decode(data)))
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+class TurmitePath:
+    """The path of a single turmite as the direction of every step, packed into two bits, and the absolute position
+    at least every :data:`KEYFRAME_INTERVAL` steps.
+
+    Another keyframe is started whenever the recorded steps aren't contiguous, i.e. when the turmite was moved by
+    hand or recording was interrupted, so every position between two keyframes can be found by replaying at most
+    :data:`KEYFRAME_INTERVAL` directions.
+    """
+
+    def __init__(self):
+        self.length = 0
+        """The number of recorded steps."""
+        self.end_iteration: int | None = None
+        """The iteration after the last recorded step."""
+        self.end_position: Position | None = None
+        """The position after the last recorded step."""
+
+        self._packed = bytearray()
+        self._pending = bytearray()
+
+        # the step, iteration and position of every keyframe
+        self._keyframe_steps = array.array("Q")
+        self._keyframe_iterations = array.array("Q")
+        self._keyframe_xs = array.array("q")
+        self._keyframe_ys = array.array("q")
+
+    @property
+    def first_iteration(self) -> int | None:
+        return self._keyframe_iterations[0] if self._keyframe_iterations else None
+
+    def _add_keyframe(self, iteration: int, position: Position):
+        self._keyframe_steps.append(self.length)
+        self._keyframe_iterations.append(iteration)
+        self._keyframe_xs.append(int(position[0]))
+        self._keyframe_ys.append(int(position[1]))
+
+    def _needs_keyframe(self, iteration: int, position: Position) -> bool:
+        return (
+            not self._keyframe_steps or self.length - self._keyframe_steps[-1] >= KEYFRAME_INTERVAL
+            or iteration != self.end_iteration or position != self.end_position
+        )
+
+    def _append(self, directions: bytes):
+        self._pending += directions
+        self.length += len(directions)
+
+        if len(self._pending) >= _CHUNK_STEPS:
+            self._packed += _pack(self._pending[:_CHUNK_STEPS])
+            del self._pending[:_CHUNK_STEPS]
+
+    def record(self, iteration: int, position: Position, new_position: Position, direction: int):
+        """Records a step from ``position`` to ``new_position`` in ``direction`` during ``iteration``."""
+        if self._needs_keyframe(iteration, position):
+            self._add_keyframe(iteration, position)
+
+        self._append(bytes((direction,)))
+        self.end_iteration = iteration + 1
+        self.end_position = new_position
+
+    def extend(self, iteration: int, position: Position, directions: bytes):
+        """Records the consecutive steps of a turmite on an infinite grid, starting from ``position`` during
+        ``iteration``."""
+        offset = 0
+        while offset < len(directions):
+            if self._needs_keyframe(iteration, position):
+                self._add_keyframe(iteration, position)
+
+            # up to the next keyframe or the end of the chunk, whichever comes first
+            count = min(
+                len(directions) - offset,
+                self._keyframe_steps[-1] + KEYFRAME_INTERVAL - self.length,
+                _CHUNK_STEPS - len(self._pending)
+            )
+            chunk = directions[offset:offset + count]
+            self._append(chunk)
+
+            position = _displace(position, chunk)
+            iteration += count
+            self.end_iteration = iteration
+            self.end_position = position
+            offset += count
+
+    def directions(self, start: int, stop: int) -> bytes:
+        """The directions of the recorded steps ``start`` to ``stop``, one per byte."""
+        stop = min(stop, self.length)
+        if start >= stop:
+            return b""
+
+        packed_steps = 4 * len(self._packed)
+        directions = bytearray()
+        if start < packed_steps:
+            first_byte = start // 4
+            end = min(stop, packed_steps)
+            unpacked = _unpack(bytes(self._packed[first_byte:(end + 3) // 4]))
+            directions += unpacked[start - 4 * first_byte:end - 4 * first_byte]
+        if stop > packed_steps:
+            directions += self._pending[max(start - packed_steps, 0):stop - packed_steps]
+        return bytes(directions)
+
+    def _segment(self, index: int) -> tuple[int, int, int, Position]:
+        """The first and last step, the first iteration and the position of a keyframe."""
+        stop = self._keyframe_steps[index + 1] if index + 1 < len(self._keyframe_steps) else self.length
+        return (
+            self._keyframe_steps[index], stop, self._keyframe_iterations[index],
+            (self._keyframe_xs[index], self._keyframe_ys[index])
+        )
+
+    @staticmethod
+    def _replay(position: Position, directions: bytes, grid: InfiniteGrid = None) -> Position:
+        if grid is None or not grid.bounded:
+            return _displace(position, directions)
+
+        for direction in directions:
+            position, _ = grid.neighbour(position, direction)
+        return position
+
+    def position_at(self, iteration: int, grid: InfiniteGrid = None) -> Position | None:
+        """The position before the step of the turmite in ``iteration``, or ``None`` if that is outside of the
+        recorded iterations. Paths on bounded grids need the ``grid`` to be replayed."""
+        if not self.length or not self.first_iteration <= iteration <= self.end_iteration:
+            return None
+
+        index = bisect.bisect_right(self._keyframe_iterations, iteration) - 1
+        start, stop, first_iteration, position = self._segment(index)
+        # an iteration that wasn't recorded gives the position at the end of the previous keyframe
+        step = min(start + iteration - first_iteration, stop)
+        return self._replay(position, self.directions(start, step), grid)
+
+    def positions(self, start_iteration: int = None, stop_iteration: int = None, grid: InfiniteGrid = None,
+                  step: int = 1) -> typing.Iterator[tuple[int, Position]]:
+        """The iteration and position before every ``step``-th recorded step from ``start_iteration`` up to
+        ``stop_iteration``, followed by the position after the last recorded step."""
+        if not self.length:
+            return
+
+        start_iteration = self.first_iteration if start_iteration is None else start_iteration
+        stop_iteration = self.end_iteration + 1 if stop_iteration is None else stop_iteration
+
+        if step != 1:
+            # every position is looked up on its own instead of replaying everything in between
+            for iteration in range(start_iteration, stop_iteration, step):
+                position = self.position_at(iteration, grid)
+                if position is not None:
+                    yield iteration, position
+            return
+
+        bounded = grid is not None and grid.bounded
+        for index in range(len(self._keyframe_steps)):
+            start, stop, first_iteration, position = self._segment(index)
+            end_iteration = first_iteration + stop - start
+            if end_iteration < start_iteration or first_iteration >= stop_iteration:
+                continue
+
+            iteration = first_iteration
+            for direction in self.directions(start, stop):
+                if iteration >= stop_iteration:
+                    break
+                if iteration >= start_iteration:
+                    yield iteration, position
+
+                if bounded:
+                    position, _ = grid.neighbour(position, direction)
+                else:
+                    dx, dy = DIRECTION_OFFSETS[direction]
+                    position = position[0] + dx, position[1] + dy
+                iteration += 1
+
+            # the end of a keyframe is only repeated by the next one if the steps were contiguous
+            if start_iteration <= iteration < stop_iteration and not (
+                index + 1 < len(self._keyframe_steps) and self._keyframe_iterations[index + 1] == iteration
+                and (self._keyframe_xs[index + 1], self._keyframe_ys[index + 1]) == position
+            ):
+                yield iteration, position
+
+    def write_csv(self, file: typing.TextIO, start_iteration: int = None, stop_iteration: int = None,
+                  grid: InfiniteGrid = None):
+        file.write("iteration,x,y\n")
+        for iteration, (x, y) in self.positions(start_iteration, stop_iteration, grid):
+            file.write(f"{iteration},{x},{y}\n")
+
+    def copy(self) -> "TurmitePath":
+        path = TurmitePath()
+        path.length = self.length
+        path.end_iteration = self.end_iteration
+        path.end_position = self.end_position
+        path._packed = bytearray(self._packed)
+        path._pending = bytearray(self._pending)
+        for name in ("_keyframe_steps", "_keyframe_iterations", "_keyframe_xs", "_keyframe_ys"):
+            values = getattr(self, name)
+            setattr(path, name, array.array(values.typecode, values))
+        return path
+
+    def storage_size(self) -> int:
+        """The number of bytes used by the directions and keyframes."""
+        return len(self._packed) + len(self._pending) + 32 * len(self._keyframe_steps)
+
+    def to_json(self) -> dict:
+        return {
+            "length": self.length,
+            "end_iteration": self.end_iteration,
+            "end_position": self.end_position,
+            "directions": base64.b64encode(zlib.compress(bytes(self._packed) + _pack(self._pending))).decode("ascii"),
+            "keyframe_steps": _array_to_json(self._keyframe_steps),
+            "keyframe_iterations": _array_to_json(self._keyframe_iterations),
+            "keyframe_xs": _array_to_json(self._keyframe_xs),
+            "keyframe_ys": _array_to_json(self._keyframe_ys)
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "TurmitePath":
+        path = cls()
+        path.length = data["length"]
+        path.end_iteration = data["end_iteration"]
+        path.end_position = None if data["end_position"] is None else tuple(data["end_position"])
+
+        directions = zlib.decompress(base64.b64decode(data["directions"]))
+        packed_steps = path.length // _CHUNK_STEPS * _CHUNK_STEPS
+        path._packed = bytearray(directions[:packed_steps // 4])
+        path._pending = _unpack(directions[packed_steps // 4:])[:path.length - packed_steps]
+
+        path._keyframe_steps = _array_from_json("Q", data["keyframe_steps"])
+        path._keyframe_iterations = _array_from_json("Q", data["keyframe_iterations"])
+        path._keyframe_xs = _array_from_json("q", data["keyframe_xs"])
+        path._keyframe_ys = _array_from_json("q", data["keyframe_ys"])
+        return path
+
+
+class PathRecorder:
+    """The :class:`TurmitePath` of every turmite of a model, by the index of the turmite."""
+
+    def __init__(self):
+        self.paths: dict[int, TurmitePath] = {}
+
+    def __getitem__(self, turmite_index: int) -> TurmitePath:
+        path = self.paths.get(turmite_index)
+        if path is None:
+            path = self.paths[turmite_index] = TurmitePath()
+        return path
+
+    def record(self, turmite_index: int, iteration: int, position: Position, new_position: Position, direction: int,
+               grid: InfiniteGrid = None):
+        """Records a step of a turmite. On bounded grids, the direction is replaced by one that leads from
+        ``position`` to ``new_position``, as turmites can be reflected or stopped at the edges."""
+        if grid is not None and grid.bounded and grid.neighbour(position, direction)[0] != new_position:
+            direction = next(
+                (d for d in range(4) if grid.neighbour(position, d)[0] == new_position), direction
+            )
+        self[turmite_index].record(iteration, position, new_position, direction)
+
+    def remove(self, turmite_index: int):
+        """Forgets the path of a removed turmite, the paths of the turmites after it move down by one index."""
+        self.paths = {
+            index - (index > turmite_index): path for index, path in self.paths.items() if index != turmite_index
+        }
+
+    def swap(self, first_index: int, second_index: int):
+        """Swaps the paths of two turmites that were swapped in the model."""
+        first, second = self.paths.pop(first_index, None), self.paths.pop(second_index, None)
+        if first is not None:
+            self.paths[second_index] = first
+        if second is not None:
+            self.paths[first_index] = second
+
+    def copy(self) -> "PathRecorder":
+        recorder = PathRecorder()
+        recorder.paths = {turmite_index: path.copy() for turmite_index, path in self.paths.items()}
+        return recorder
+
+    def storage_size(self) -> int:
+        return sum(path.storage_size() for path in self.paths.values())
+
+    def to_json(self) -> dict:
+        return {str(turmite_index): path.to_json() for turmite_index, path in self.paths.items()}
+
+    @classmethod
+    def from_json(cls, data: dict) -> "PathRecorder":
+        recorder = cls()
+        for turmite_index, path in data.items():
+            recorder.paths[int(turmite_index)] = TurmitePath.from_json(path)
+        return recorder
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import struct
+import typing
+import zlib
+
+RGB = typing.Tuple[int, int, int]
+
+_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_COLOR_TYPE_PALETTE = 3
+_IDAT_SIZE = 1 << 16
+
+
+def _chunk(chunk_type: bytes, data: bytes) -> bytes:
+    return (
+        struct.pack(">I", len(data))
+        + chunk_type
+        + data
+        + struct.pack(">I", zlib.crc32(chunk_type + data) & 0xFFFFFFFF)
+    )
+
+
+class PaletteWriter:
+    """Writes an 8-bit palette PNG row by row, so that the whole image never has to be in memory.
+
+    Every row is a :class:`bytes`-like object of ``width`` palette indices.
+    """
+
+    def __init__(self, file: typing.BinaryIO, width: int, height: int, palette: list[RGB], compression_level: int = 6):
+        if not 0 < len(palette) <= 256:
+            raise ValueError(f"A PNG palette must have between 1 and 256 entries, not {len(palette)}.")
+        if width <= 0 or height <= 0:
+            raise ValueError(f"Invalid image size {width}x{height}.")
+
+        self.file = file
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+
+        self._compressor = zlib.compressobj(compression_level)
+        self._buffer = bytearray()
+
+        self.file.write(_SIGNATURE)
+        self.file.write(_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, _COLOR_TYPE_PALETTE, 0, 0, 0)))
+        self.file.write(_chunk(b"PLTE", b"".join(bytes(color) for color in palette)))
+
+    def write_row(self, row: bytes | bytearray):
+        if len(row) != self.width:
+            raise ValueError(f"Expected a row of {self.width} pixels, got {len(row)}.")
+        if self.rows_written >= self.height:
+            raise ValueError("All rows of the image have already been written.")
+
+        # every row starts with its filter type, 0 means no filter
+        self._buffer += self._compressor.compress(b"\x00")
+        self._buffer += self._compressor.compress(row)
+        self.rows_written += 1
+
+        if len(self._buffer) >= _IDAT_SIZE:
+            self.file.write(_chunk(b"IDAT", bytes(self._buffer)))
+            self._buffer.clear()
+
+    def close(self):
+        if self.rows_written != self.height:
+            raise ValueError(f"Only {self.rows_written} of {self.height} rows were written.")
+
+        self._buffer += self._compressor.flush()
+        self.file.write(_chunk(b"IDAT", bytes(self._buffer)))
+        self._buffer.clear()
+        self.file.write(_chunk(b"IEND", b""))
+
+
+def scale_row(row: bytes | bytearray, scale: int) -> bytearray:
+    """Repeats every pixel of the row ``scale`` times."""
+    scaled = bytearray(len(row) * scale)
+    for i in range(scale):
+        scaled[i::scale] = row
+    return scaled
+
+
+def rgb_tables(palette: list[RGB]) -> list[bytes]:
+    """Translation tables from palette indices to the red, green and blue channel, for :func:`to_rgb`."""
+    return [bytes(color[channel] for color in palette).ljust(256, b"\x00") for channel in range(3)]
+
+
+def to_rgb(row: bytes | bytearray, tables: list[bytes]) -> bytearray:
+    """Converts a row of palette indices to packed 24-bit RGB."""
+    rgb = bytearray(len(row) * 3)
+    for channel, table in enumerate(tables):
+        rgb[channel::3] = row.translate(table)
+    return rgb
@@ -0,0 +1,316 @@
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import shutil
+import subprocess
+import sys
+import typing
+from pathlib import Path
+
+from . import cache, jit, parallel, png
+from .infinite_grid import Rect
+from .png import RGB
+from .bounded_grid import BoundedGrid
+from .tiled_grid import SpillingGrid, TiledGrid
+from .turmite import CellColor, MultipleTurmiteModel, TurmiteState
+
+ProgressCallback = typing.Callable[[int, int], typing.Optional[bool]]
+"""Called with the amount of finished and total work (frames or rows). Returning ``False`` cancels the export."""
+
+MAX_BAND_PIXELS = 1 << 24
+
+UNKNOWN_COLOR: RGB = (128, 128, 128)
+
+VIDEO_SUFFIXES = (".mp4", ".mkv", ".webm", ".mov", ".avi", ".gif")
+
+
+def palette_from_json(data: dict) -> dict[int, RGB]:
+    """Reads the colors of a serialized ``StateColors`` without needing Qt."""
+    return {int(state): ((color >> 16) & 0xFF, (color >> 8) & 0xFF, color & 0xFF) for state, color in data.items()}
+
+
+def model_bounding_box(model: MultipleTurmiteModel, margin: int = 0) -> Rect:
+    """The bounding box of all non-default cells and all turmites, extended by ``margin`` cells on every side."""
+    corners = [turmite.position for turmite in model.turmites]
+
+    grid_bounding_box = model.grid.bounding_box()
+    if grid_bounding_box is not None:
+        x, y, width, height = grid_bounding_box
+        corners += [(x, y), (x + width - 1, y + height - 1)]
+
+    if not corners:
+        corners = [(0, 0)]
+
+    min_x = min(x for x, _ in corners) - margin
+    min_y = min(y for _, y in corners) - margin
+    return (
+        min_x, min_y,
+        max(x for x, _ in corners) + margin + 1 - min_x,
+        max(y for _, y in corners) + margin + 1 - min_y
+    )
+
+
+class GridRenderer:
+    """Rasterizes a :class:`MultipleTurmiteModel` to palette indices, independently of any GUI toolkit.
+
+    Cells get the color of their state in ``cell_colors``. If ``turmite_colors`` is given, every turmite is drawn
+    as a single pixel (before scaling) in the color of its state.
+    """
+
+    def __init__(self, cell_colors: dict[CellColor, RGB], turmite_colors: list[dict[TurmiteState, RGB]] = None,
+                 unknown_color: RGB = UNKNOWN_COLOR):
+        self.palette: list[RGB] = [unknown_color]
+
+        self.cell_indices = {cell_color: self._palette_index(rgb) for cell_color, rgb in cell_colors.items()}
+        self.turmite_indices = None if turmite_colors is None else [
+            {state: self._palette_index(rgb) for state, rgb in colors.items()} for colors in turmite_colors
+        ]
+
+    def _palette_index(self, color: RGB) -> int:
+        color = tuple(color)
+        if color not in self.palette:
+            self.palette.append(color)
+        return self.palette.index(color)
+
+    def rasterize(self, model: MultipleTurmiteModel, rect: Rect) -> bytearray:
+        """Returns the palette indices of all cells in the rectangle, row by row."""
+        return next(self.bands(model, rect, rect[3]))
+
+    def bands(self, model: MultipleTurmiteModel, rect: Rect, band_height: int) -> typing.Iterator[bytearray]:
+        """Rasterizes the rectangle in horizontal bands of ``band_height`` rows, so that only one band is in memory.
+
+        Every band is read on its own, grids that store their cells as bytes with
+        :meth:`~turmites.infinite_grid.InfiniteGrid.get_block`, all others with
+        :meth:`~turmites.infinite_grid.InfiniteGrid.items_in_rect`.
+        """
+        x0, y0, width, height = rect
+        grid = model.grid
+        cell_indices = self.cell_indices
+        default_index = cell_indices.get(grid.default, 0)
+
+        # the palette index of every byte, for grids that store their cells as bytes
+        byte_indices: bytes | None = None
+        if isinstance(grid, (BoundedGrid, TiledGrid)):
+            byte_indices = bytes(
+                default_index if value == grid.default else cell_indices.get(value, 0) for value in range(256)
+            )
+
+        for band_y in range(y0, y0 + height, band_height):
+            rows = min(band_height, y0 + height - band_y)
+            band_rect = x0, band_y, width, rows
+
+            if byte_indices is not None:
+                pixels = grid.get_block(band_rect).translate(byte_indices)
+            else:
+                pixels = bytearray([default_index]) * (width * rows)
+                for (x, y), cell_color in grid.items_in_rect(band_rect):
+                    pixels[(y - band_y) * width + x - x0] = cell_indices.get(cell_color, 0)
+
+            if self.turmite_indices is not None:
+                for turmite, indices in zip(model.turmites, self.turmite_indices):
+                    x, y = turmite.position
+                    if x0 <= x < x0 + width and band_y <= y < band_y + rows:
+                        pixels[(y - band_y) * width + x - x0] = indices.get(turmite.state, 0)
+
+            yield pixels
+
+    def rows(self, model: MultipleTurmiteModel, rect: Rect, scale: int = 1,
+             max_band_pixels: int = MAX_BAND_PIXELS) -> typing.Iterator[bytearray]:
+        _, _, width, _ = rect
+        band_height = max(1, max_band_pixels // width)
+
+        for pixels in self.bands(model, rect, band_height):
+            for y in range(len(pixels) // width):
+                row = pixels[y * width:(y + 1) * width]
+                if scale != 1:
+                    row = png.scale_row(row, scale)
+                for _ in range(scale):
+                    yield row
+
+    def write_png(self, file: typing.BinaryIO, model: MultipleTurmiteModel, rect: Rect, scale: int = 1,
+                  progress: ProgressCallback = None, max_band_pixels: int = MAX_BAND_PIXELS) -> bool:
+        """Writes the rectangle as a PNG image with ``scale`` x ``scale`` pixels per cell.
+
+        The image is produced in bands of at most ``max_band_pixels`` cells and streamed to ``file``, so the
+        memory used stays bounded however large the rectangle is. Returns ``False`` if ``progress`` cancelled it.
+        """
+        writer = png.PaletteWriter(file, rect[2] * scale, rect[3] * scale, self.palette)
+
+        for row in self.rows(model, rect, scale, max_band_pixels):
+            writer.write_row(row)
+
+            if progress is not None and writer.rows_written % 1024 == 0:
+                if progress(writer.rows_written, writer.height) is False:
+                    return False
+
+        writer.close()
+
+        if progress is not None:
+            progress(writer.height, writer.height)
+        return True
+
+
+def export_image(model: MultipleTurmiteModel, renderer: GridRenderer, path: Path, scale: int = 1,
+                 progress: ProgressCallback = None):
+    """Writes the whole pattern, i.e. the bounding box of all non-default cells and turmites, as a PNG image."""
+    with open(path, "wb") as f:
+        completed = renderer.write_png(f, model, model_bounding_box(model), scale, progress)
+
+    if not completed:
+        Path(path).unlink()
+
+
+@contextlib.contextmanager
+def _default_advance(model: MultipleTurmiteModel) -> typing.Iterator[typing.Callable[[int], None]]:
+    if jit.available():
+        yield jit.JitEngine(model).run
+        return
+    with parallel.PartitionedEngine(model) as engine:
+        yield engine.run
+
+
+def _frames(model: MultipleTurmiteModel, frames: int, iterations_per_frame: int,
+            advance: typing.Callable[[int], None] | None, progress: ProgressCallback | None) -> typing.Iterator[int]:
+    if advance is None:
+        with _default_advance(model) as advance:
+            yield from _frames(model, frames, iterations_per_frame, advance, progress)
+        return
+
+    for i in range(frames):
+        # the first frame shows the initial state
+        if i:
+            advance(iterations_per_frame)
+
+        yield i
+
+        if progress is not None and progress(i + 1, frames) is False:
+            return
+
+
+def export_frames(model: MultipleTurmiteModel, renderer: GridRenderer, directory: Path, frames: int,
+                  iterations_per_frame: int, rect: Rect, scale: int = 1,
+                  advance: typing.Callable[[int], None] = None, progress: ProgressCallback = None) -> list[Path]:
+    """Steps the model ``iterations_per_frame`` iterations per frame and writes every frame as a PNG file.
+
+    ``advance`` is used to step the model; by default the fastest available engine is used.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    paths = []
+    for i in _frames(model, frames, iterations_per_frame, advance, progress):
+        path = directory / f"frame_{i:06d}.png"
+        with open(path, "wb") as f:
+            renderer.write_png(f, model, rect, scale)
+        paths.append(path)
+
+    return paths
+
+
+def export_video(model: MultipleTurmiteModel, renderer: GridRenderer, path: Path, frames: int,
+                 iterations_per_frame: int, rect: Rect, scale: int = 1, fps: int = 30,
+                 advance: typing.Callable[[int], None] = None, progress: ProgressCallback = None,
+                 ffmpeg: str = "ffmpeg"):
+    """Like :func:`export_frames`, but streams raw frames into ffmpeg, which has to be installed."""
+    executable = shutil.which(ffmpeg)
+    if executable is None:
+        raise FileNotFoundError(f"Video export requires ffmpeg, but {ffmpeg!r} was not found.")
+
+    width, height = rect[2] * scale, rect[3] * scale
+    process = subprocess.Popen(
+        [
+            executable, "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}", "-r", str(fps), "-i", "-",
+            # most codecs need even dimensions
+            "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", "-pix_fmt", "yuv420p",
+            str(path)
+        ],
+        stdin=subprocess.PIPE
+    )
+
+    tables = png.rgb_tables(renderer.palette)
+    try:
+        for _ in _frames(model, frames, iterations_per_frame, advance, progress):
+            for row in renderer.rows(model, rect, scale):
+                process.stdin.write(png.to_rgb(row, tables))
+    finally:
+        process.stdin.close()
+
+    if process.wait() != 0:
+        raise RuntimeError(f"ffmpeg exited with code {process.returncode}.")
+
+
+def main(args: list[str]):
+    parser = argparse.ArgumentParser(
+        prog="python -m turmites.rendering",
+        description="Render a simulation run of a project as a PNG frame sequence or a video, without a GUI."
+    )
+    parser.add_argument("project", type=Path)
+    parser.add_argument("output", type=Path,
+                        help=f"directory for PNG frames, a video file ({', '.join(VIDEO_SUFFIXES)}) or, with --image, "
+                             f"a PNG file")
+    parser.add_argument("--image", action="store_true",
+                        help="render the whole pattern of the project as a single image instead of a run")
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--iterations-per-frame", type=int, default=100)
+    parser.add_argument("--scale", type=int, default=1, help="pixels per cell")
+    parser.add_argument("--rect", type=int, nargs=4, metavar=("X", "Y", "WIDTH", "HEIGHT"),
+                        help="region to render, by default the initial pattern plus the margin")
+    parser.add_argument("--margin", type=int, default=64)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--no-turmites", action="store_true", help="don't draw the turmites")
+    parser.add_argument("--memory-budget", type=int, metavar="MIB",
+                        help="keep at most this much of the grid in memory and spill the rest to a temporary file")
+    parser.add_argument("--iterations", type=int, default=0,
+                        help="run the project for this many iterations first, results of earlier runs are reused")
+    parser.add_argument("--cache-dir", type=Path, help=f"where results are cached, by default in "
+                                                       f"{cache.default_directory()}")
+    parser.add_argument("--cache-size", type=int, default=1024, metavar="MIB",
+                        help="delete the least recently used results once the cache gets larger")
+    parser.add_argument("--no-cache", action="store_true", help="neither use nor store cached results")
+    parsed = parser.parse_args(args[1:])
+
+    with open(parsed.project, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    model = MultipleTurmiteModel.from_json(data["model"])
+    if parsed.memory_budget is not None:
+        model.grid = SpillingGrid.from_grid(model.grid, parsed.memory_budget << 20)
+    renderer = GridRenderer(
+        palette_from_json(data["cell_state_colors"]),
+        None if parsed.no_turmites else [palette_from_json(colors) for colors in data["turmite_state_colors"]]
+    )
+
+    if parsed.iterations:
+        with _default_advance(model) as advance:
+            if parsed.no_cache:
+                advance(parsed.iterations)
+            else:
+                result_cache = cache.ResultCache(parsed.cache_dir, parsed.cache_size << 20)
+                run = cache.run_cached(model, parsed.iterations, result_cache, advance)
+                print(f"{'Reused' if run.hit else 'Ran'} {parsed.iterations} iterations ({run.seconds:.2f} s), "
+                      f"{run.cells} cells", file=sys.stderr)
+
+    rect = model_bounding_box(model, parsed.margin) if parsed.rect is None else tuple(parsed.rect)
+
+    def progress(done: int, total: int):
+        print(f"\r{done}/{total}", end="", file=sys.stderr, flush=True)
+
+    if parsed.image:
+        export_image(model, renderer, parsed.output, parsed.scale, progress)
+    elif parsed.output.suffix.lower() in VIDEO_SUFFIXES:
+        export_video(model, renderer, parsed.output, parsed.frames, parsed.iterations_per_frame, rect,
+                     parsed.scale, parsed.fps, progress=progress)
+    else:
+        export_frames(model, renderer, parsed.output, parsed.frames, parsed.iterations_per_frame, rect,
+                      parsed.scale, progress=progress)
+    print(file=sys.stderr)
+
+    if isinstance(model.grid, SpillingGrid):
+        model.grid.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
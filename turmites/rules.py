@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import dataclasses
+import itertools
+import typing
+
+from .turmite import CellColor, TransitionTable, TurmiteState, TurmiteTurnDirection
+
+TURN_DIRECTIONS = (0, 1, 2, 3)
+"""Turn directions modulo 4: don't turn, clockwise, around and anticlockwise."""
+
+# the value of an entry, or () if it is missing
+_Value = typing.Tuple[int, ...]
+
+
+@dataclasses.dataclass(frozen=True)
+class Symmetry:
+    """A transformation of transition tables that doesn't change the behaviour of turmites, apart from mirroring.
+
+    The default color and the start state are never relabeled, as turmites start on an empty grid in that state.
+    """
+
+    mirror: bool
+    colors: tuple[CellColor, ...]
+    """The new label of every color."""
+    states: tuple[TurmiteState, ...]
+    """The new label of every state."""
+
+    def apply_value(self, value: tuple[TurmiteTurnDirection, CellColor, TurmiteState]) -> _Value:
+        turn_direction, new_cell_color, new_turmite_state = value
+        return (
+            (-turn_direction if self.mirror else turn_direction) % 4,
+            self.colors[new_cell_color],
+            self.states[new_turmite_state]
+        )
+
+
+def symmetries(colors: int, states: int, mirror: bool = True) -> list[Symmetry]:
+    """All symmetries of tables with the colors and states ``0`` to ``colors - 1`` and ``states - 1``, where ``0`` is
+    the default color and the start state. The identity is the first one."""
+    return [
+        Symmetry(mirrored, (0, *color_labels), (0, *state_labels))
+        for mirrored in ((False, True) if mirror else (False,))
+        for color_labels in itertools.permutations(range(1, colors))
+        for state_labels in itertools.permutations(range(1, states))
+    ]
+
+
+def _keys(colors: int, states: int) -> list[tuple[CellColor, TurmiteState]]:
+    return [(cell_color, turmite_state) for cell_color in range(colors) for turmite_state in range(states)]
+
+
+def canonical_form(transition_table: TransitionTable, default: CellColor = 0,
+                   start_state: TurmiteState = 0, mirror: bool = True) -> TransitionTable:
+    """The representative of all tables that behave like this one, up to mirroring and relabeling the colors other
+    than ``default`` and the states other than ``start_state``. Two tables are equivalent exactly if their canonical
+    forms are equal. Without ``mirror``, mirrored tables aren't considered equivalent.
+
+    Colors and states are relabeled to ``0, 1, ...`` with ``default`` and ``start_state`` as ``0``, turn directions
+    are taken modulo 4. Of all equivalent tables, the one whose entries are lexicographically smallest in the order
+    of their keys is chosen, missing entries coming first. This tries every permutation, so it is only meant for the
+    small tables of rule searches.
+    """
+    colors, states = {default}, {start_state}
+    for (cell_color, turmite_state), (_, new_cell_color, new_turmite_state) in transition_table:
+        colors.update((cell_color, new_cell_color))
+        states.update((turmite_state, new_turmite_state))
+
+    # any labeling where default and start state are 0, the permutations take care of the rest
+    color_labels = {default: 0, **{color: i for i, color in enumerate(sorted(colors - {default}), 1)}}
+    state_labels = {start_state: 0, **{state: i for i, state in enumerate(sorted(states - {start_state}), 1)}}
+    table = {
+        (color_labels[cell_color], state_labels[turmite_state]): (
+            turn_direction, color_labels[new_cell_color], state_labels[new_turmite_state]
+        )
+        for (cell_color, turmite_state), (turn_direction, new_cell_color, new_turmite_state) in transition_table
+    }
+
+    keys = _keys(len(colors), len(states))
+    best: list[_Value] | None = None
+    for symmetry in symmetries(len(colors), len(states), mirror):
+        image = {
+            (symmetry.colors[cell_color], symmetry.states[turmite_state]): symmetry.apply_value(value)
+            for (cell_color, turmite_state), value in table.items()
+        }
+        values = [image.get(key, ()) for key in keys]
+        if best is None or values < best:
+            best = values
+
+    return TransitionTable({key: value for key, value in zip(keys, best) if value})
+
+
+def is_canonical(transition_table: TransitionTable, mirror: bool = True) -> bool:
+    """Whether the table is its own :func:`canonical_form` for the default color and start state ``0``."""
+    return frozenset(transition_table) == frozenset(canonical_form(transition_table, mirror=mirror))
+
+
+def tables_mirror(turn_directions: typing.Sequence[TurmiteTurnDirection]) -> bool:
+    """Whether mirrored tables are equivalent among the tables with the given turn directions, which is the case if
+    the mirror image of every turn direction is one of them. Pass this as ``mirror`` to :func:`canonical_form` for the
+    tables of :func:`enumerate_tables`."""
+    turn_directions = {turn_direction % 4 for turn_direction in turn_directions}
+    return all((-turn_direction) % 4 in turn_directions for turn_direction in turn_directions)
+
+
+def enumerate_tables(colors: int, states: int,
+                     turn_directions: typing.Sequence[TurmiteTurnDirection] = TURN_DIRECTIONS
+                     ) -> typing.Iterator[TransitionTable]:
+    """Every complete transition table with the given numbers of colors and states in :func:`canonical_form`, so
+    exactly one table of every class of equivalent tables.
+
+    Only tables with the given turn directions are generated. Mirrored tables are only considered equivalent if the
+    mirror image of every turn direction is allowed as well, see :func:`tables_mirror`, otherwise the tables are in
+    the canonical form with ``mirror=False``. The tables aren't required to actually use all colors and states,
+    tables that do use fewer are equivalent to tables generated with fewer colors or states, though.
+
+    Entries are chosen one after the other in the order of their keys. A partial table is discarded as soon as a
+    symmetry maps the entries chosen so far to a smaller start of a table, which is the case for all completions, so
+    most of the non-canonical tables are never generated.
+    """
+    turn_directions = sorted({turn_direction % 4 for turn_direction in turn_directions})
+    group = symmetries(colors, states, tables_mirror(turn_directions))[1:]
+
+    keys = _keys(colors, states)
+    index = {key: i for i, key in enumerate(keys)}
+    # where every symmetry moves every entry
+    moved = [[index[symmetry.colors[cell_color], symmetry.states[turmite_state]] for cell_color, turmite_state in keys]
+             for symmetry in group]
+    values = [
+        (turn_direction, new_cell_color, new_turmite_state)
+        for turn_direction in turn_directions for new_cell_color in range(colors) for new_turmite_state in range(states)
+    ]
+
+    chosen: list[_Value] = []
+
+    def smaller_image_exists() -> bool:
+        for symmetry, positions in zip(group, moved):
+            image: dict[int, _Value] = {positions[i]: symmetry.apply_value(value) for i, value in enumerate(chosen)}
+            # only the part of the image up to the first entry that isn't known yet can be compared
+            for i in range(len(chosen)):
+                if i not in image or image[i] > chosen[i]:
+                    break
+                if image[i] < chosen[i]:
+                    return True
+        return False
+
+    def search() -> typing.Iterator[TransitionTable]:
+        if len(chosen) == len(keys):
+            yield TransitionTable(dict(zip(keys, chosen)))
+            return
+
+        for value in values:
+            chosen.append(value)
+            if not smaller_image_exists():
+                yield from search()
+            chosen.pop()
+
+    return search()
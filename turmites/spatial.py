@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import typing
+
+from .infinite_grid import Position, Rect
+from .turmite import Turmite
+
+ChunkKey = typing.Tuple[int, int]
+
+
+class TurmiteIndex:
+    """The turmites of a model sorted into buckets of ``2 ** chunk_shift`` x ``2 ** chunk_shift`` cells, so the
+    turmites in a region or on a cell can be found without looking at all of them.
+
+    Turmites are referred to by their index in the list of turmites of the model. The index doesn't notice when
+    turmites move, :meth:`sync` has to be called before querying it. It only moves the turmites whose position
+    changed since the last call into other buckets.
+    """
+
+    def __init__(self, chunk_shift: int = 4):
+        self.chunk_shift = chunk_shift
+        self._buckets: dict[ChunkKey, set[int]] = {}
+        # the position every turmite had at the last sync
+        self._positions: list[Position] = []
+
+    def _chunk(self, position: Position) -> ChunkKey:
+        x, y = position
+        return int(x) >> self.chunk_shift, int(y) >> self.chunk_shift
+
+    def __len__(self):
+        return len(self._positions)
+
+    def rebuild(self, turmites: typing.Sequence[Turmite]):
+        self._buckets.clear()
+        self._positions = [turmite.position for turmite in turmites]
+        for i, position in enumerate(self._positions):
+            self._buckets.setdefault(self._chunk(position), set()).add(i)
+
+    def move(self, index: int, position: Position):
+        old_position = self._positions[index]
+        self._positions[index] = position
+
+        old_chunk, chunk = self._chunk(old_position), self._chunk(position)
+        if old_chunk != chunk:
+            bucket = self._buckets[old_chunk]
+            bucket.discard(index)
+            if not bucket:
+                del self._buckets[old_chunk]
+            self._buckets.setdefault(chunk, set()).add(index)
+
+    def sync(self, turmites: typing.Sequence[Turmite]):
+        """Updates the index to the current positions of the turmites. If turmites were added or removed, the index
+        is rebuilt."""
+        if len(turmites) != len(self._positions):
+            self.rebuild(turmites)
+            return
+
+        positions = self._positions
+        for i, turmite in enumerate(turmites):
+            if turmite.position != positions[i]:
+                self.move(i, turmite.position)
+
+    def in_rect(self, rect: Rect) -> list[int]:
+        """The indices of the turmites in the rectangle, in ascending order."""
+        x0, y0, width, height = rect
+        if width <= 0 or height <= 0:
+            return []
+
+        min_x, min_y = self._chunk((x0, y0))
+        max_x, max_y = self._chunk((x0 + width - 1, y0 + height - 1))
+        if (max_x - min_x + 1) * (max_y - min_y + 1) > len(self._buckets):
+            chunks = [
+                (chunk_x, chunk_y) for chunk_x, chunk_y in self._buckets
+                if min_x <= chunk_x <= max_x and min_y <= chunk_y <= max_y
+            ]
+        else:
+            chunks = [
+                (chunk_x, chunk_y) for chunk_y in range(min_y, max_y + 1) for chunk_x in range(min_x, max_x + 1)
+                if (chunk_x, chunk_y) in self._buckets
+            ]
+
+        indices = []
+        for chunk in chunks:
+            for i in self._buckets[chunk]:
+                x, y = self._positions[i]
+                if x0 <= x < x0 + width and y0 <= y < y0 + height:
+                    indices.append(i)
+        return sorted(indices)
+
+    def at(self, position: Position) -> list[int]:
+        """The indices of the turmites on the cell, in ascending order."""
+        return sorted(i for i in self._buckets.get(self._chunk(position), ()) if self._positions[i] == position)
+
+    def co_located(self) -> dict[Position, list[int]]:
+        """Every cell with more than one turmite on it and the indices of these turmites."""
+        cells: dict[Position, list[int]] = {}
+        for bucket in self._buckets.values():
+            if len(bucket) < 2:
+                continue
+
+            bucket_cells: dict[Position, list[int]] = {}
+            for i in sorted(bucket):
+                bucket_cells.setdefault(self._positions[i], []).append(i)
+            cells.update((position, indices) for position, indices in bucket_cells.items() if len(indices) > 1)
+        return cells
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import functools
+
+TILE_SHIFT = 6
+TILE_SIZE = 1 << TILE_SHIFT
+TILE_CELLS = TILE_SIZE * TILE_SIZE
+
+# the first byte of an encoded tile
+UNIFORM = 0
+SPARSE = 1
+PACKED = 2
+FULL = 3
+
+ENCODING_NAMES = {UNIFORM: "uniform", SPARSE: "sparse", PACKED: "packed", FULL: "full"}
+
+_PACKED_BITS = (1, 2, 4)
+
+
+def _pack(tile: bytearray, palette: bytes, bits: int) -> bytes:
+    """Packs ``8 // bits`` cells into every byte, the first cell into the lowest bits."""
+    per_byte = 8 // bits
+    to_index = bytearray(256)
+    for index, value in enumerate(palette):
+        to_index[value] = index
+    indices = tile.translate(to_index)
+
+    packed = 0
+    for i in range(per_byte):
+        shift = i * bits
+        shifted = indices[i::per_byte].translate(bytes((value << shift) & 0xFF for value in range(256)))
+        packed |= int.from_bytes(shifted, "little")
+    return packed.to_bytes(TILE_CELLS // per_byte, "little")
+
+
+@functools.lru_cache(maxsize=1024)
+def _unpack_table(palette: bytes, bits: int, shift: int) -> bytes:
+    """Translation table from packed bytes to the values of the cell at ``shift``."""
+    mask = (1 << bits) - 1
+    palette = palette.ljust(1 << bits, b"\x00")
+    return bytes(palette[(value >> shift) & mask] for value in range(256))
+
+
+def _unpack(data: bytes, palette: bytes, bits: int) -> bytearray:
+    per_byte = 8 // bits
+
+    tile = bytearray(TILE_CELLS)
+    for i in range(per_byte):
+        # most tiles share a few palettes, so the tables are cached
+        tile[i::per_byte] = data.translate(_unpack_table(bytes(palette), bits, i * bits))
+    return tile
+
+
+def encode(tile: bytearray, default: int) -> bytes:
+    """The smallest of the following encodings of a tile of :data:`TILE_CELLS` bytes:
+
+    * uniform: all cells have the same value
+    * sparse: 3 bytes for every cell that doesn't have the default value
+    * packed: 1, 2 or 4 bits per cell, indexing a palette of the values in the tile
+    * full: one byte per cell
+    """
+    values = bytes(sorted(set(tile)))
+    if len(values) == 1:
+        return bytes((UNIFORM, values[0]))
+
+    candidates = [bytes((FULL,)) + bytes(tile)]
+
+    for bits in _PACKED_BITS:
+        if len(values) <= 1 << bits:
+            candidates.append(bytes((PACKED, bits, len(values))) + values + _pack(tile, values, bits))
+            break
+
+    # only worth it if at most a few cells are set, checked before building it
+    count = TILE_CELLS - tile.count(default)
+    if 3 * count < min(len(candidate) for candidate in candidates):
+        sparse = bytearray((SPARSE,))
+        for index, value in enumerate(tile):
+            if value != default:
+                sparse += index.to_bytes(2, "little")
+                sparse.append(value)
+        candidates.append(bytes(sparse))
+
+    return min(candidates, key=len)
+
+
+def decode(data: bytes, default: int) -> bytearray:
+    encoding = data[0]
+
+    if encoding == UNIFORM:
+        return bytearray(data[1:2]) * TILE_CELLS
+    if encoding == SPARSE:
+        tile = bytearray([default]) * TILE_CELLS
+        for i in range(1, len(data), 3):
+            tile[data[i] | data[i + 1] << 8] = data[i + 2]
+        return tile
+    if encoding == PACKED:
+        bits, palette_size = data[1], data[2]
+        return _unpack(data[3 + palette_size:], data[3:3 + palette_size], bits)
+    if encoding == FULL:
+        return bytearray(data[1:])
+
+    raise ValueError(f"Unknown tile encoding {encoding}.")
+
+
+def values(data: bytes, default: int) -> set[int]:
+    """The distinct values of an encoded tile, without decoding it."""
+    encoding = data[0]
+
+    if encoding == UNIFORM:
+        return {data[1]}
+    if encoding == SPARSE:
+        # a sparse tile always has default cells left
+        return {default, *data[3::3]}
+    if encoding == PACKED:
+        # the palette only contains values that are in the tile
+        palette_size = data[2]
+        return set(data[3:3 + palette_size])
+    if encoding == FULL:
+        return set(data[1:])
+
+    raise ValueError(f"Unknown tile encoding {encoding}.")
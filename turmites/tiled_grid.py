@@ -0,0 +1,534 @@
+from __future__ import annotations
+
+import base64
+import collections
+import os
+import sqlite3
+import tempfile
+import threading
+import typing
+import zlib
+from pathlib import Path
+
+from . import tile_encoding
+from .infinite_grid import InfiniteGrid, Position, Rect
+from .tile_encoding import TILE_CELLS, TILE_SHIFT, TILE_SIZE
+
+_TILE_MASK = TILE_SIZE - 1
+
+TileKey = typing.Tuple[int, int]
+"""Position of a tile, i.e. the position of its first cell divided by :data:`TILE_SIZE`."""
+
+
+def tile_key(position: Position) -> TileKey:
+    x, y = position
+    return int(x) >> TILE_SHIFT, int(y) >> TILE_SHIFT
+
+
+def tile_spans(rect: Rect, keys: typing.Collection[TileKey] = None
+               ) -> typing.Iterator[tuple[TileKey, int, int, int, int]]:
+    """The tiles the rectangle overlaps, each with the part of the rectangle in it as ``x, end_x, y, end_y``.
+
+    If ``keys`` is given, only these tiles are considered, which is faster if there are fewer of them than tiles in
+    the rectangle.
+    """
+    x0, y0, width, height = rect
+    if width <= 0 or height <= 0:
+        return
+    min_x, min_y = x0 >> TILE_SHIFT, y0 >> TILE_SHIFT
+    max_x, max_y = (x0 + width - 1) >> TILE_SHIFT, (y0 + height - 1) >> TILE_SHIFT
+
+    if keys is not None and len(keys) < (max_x - min_x + 1) * (max_y - min_y + 1):
+        overlapping = sorted(
+            (tile_y, tile_x) for tile_x, tile_y in keys if min_x <= tile_x <= max_x and min_y <= tile_y <= max_y
+        )
+    else:
+        overlapping = (
+            (tile_y, tile_x) for tile_y in range(min_y, max_y + 1) for tile_x in range(min_x, max_x + 1)
+            if keys is None or (tile_x, tile_y) in keys
+        )
+
+    for tile_y, tile_x in overlapping:
+        yield (
+            (tile_x, tile_y),
+            max(x0, tile_x << TILE_SHIFT), min(x0 + width, (tile_x + 1) << TILE_SHIFT),
+            max(y0, tile_y << TILE_SHIFT), min(y0 + height, (tile_y + 1) << TILE_SHIFT)
+        )
+
+
+class TiledGrid(InfiniteGrid[int]):
+    """An infinite grid stored in square tiles of :data:`TILE_SIZE` x :data:`TILE_SIZE` cells, so cell values have to
+    be between 0 and 255.
+
+    Tiles only exist while they contain a non-default cell. Only the ``max_decoded_tiles`` most recently decoded
+    tiles are kept as one byte per cell, all others are stored in the smallest encoding of :mod:`tile_encoding` and
+    decoded again when they are accessed. Patterns of few colors take well below one byte per cell instead of the
+    roughly hundred bytes of a dictionary entry.
+    """
+
+    def __init__(self, default: int, max_decoded_tiles: int = 256, _tiles: dict[TileKey, bytearray] = None):
+        self._check_value(default)
+        super().__init__(default)
+
+        self.max_decoded_tiles = max(1, max_decoded_tiles)
+        # decoded tiles are bytearrays, encoded ones bytes
+        self._tiles: dict[TileKey, bytearray | bytes] = {}
+        # the keys of the decoded tiles in the order they were decoded
+        self._decoded: collections.OrderedDict[TileKey, None] = collections.OrderedDict()
+        # number of non-default cells per tile, for every tile that exists
+        self._counts: dict[TileKey, int] = {}
+        self._count = 0
+
+        # tiles are decoded from the reading threads of the parallel engine too
+        self._lock = threading.RLock()
+
+        for key, tile in (_tiles or {}).items():
+            count = TILE_CELLS - tile.count(default)
+            if count:
+                self._tiles[key] = tile_encoding.encode(tile, default)
+                self._counts[key] = count
+                self._count += count
+
+    @staticmethod
+    def _check_value(value: int):
+        if not isinstance(value, int) or not 0 <= value < 256:
+            raise ValueError(f"Cell values of a tiled grid have to be between 0 and 255, not {value!r}.")
+
+    def _get_tile(self, key: TileKey) -> bytearray | None:
+        """The decoded tile, or ``None`` if it only contains default cells."""
+        tile = self._tiles.get(key)
+        if tile is None or tile.__class__ is bytearray:
+            return tile
+
+        with self._lock:
+            tile = self._tiles[key]
+            if tile.__class__ is not bytearray:
+                tile = tile_encoding.decode(tile, self.default)
+                self._insert_decoded(key, tile)
+            return tile
+
+    def _insert_decoded(self, key: TileKey, tile: bytearray):
+        self._tiles[key] = tile
+        self._decoded[key] = None
+
+        while len(self._decoded) > self.max_decoded_tiles:
+            self._encode(next(iter(self._decoded)))
+
+    def _encode(self, key: TileKey):
+        del self._decoded[key]
+        self._tiles[key] = tile_encoding.encode(self._tiles[key], self.default)
+
+    def _add_tile(self, key: TileKey) -> bytearray:
+        tile = bytearray([self.default]) * TILE_CELLS
+        self._counts[key] = 0
+        self._insert_decoded(key, tile)
+        return tile
+
+    def _remove_tile(self, key: TileKey):
+        del self._tiles[key]
+        del self._counts[key]
+        self._decoded.pop(key, None)
+
+    def _store(self, key: Position, value: int):
+        x, y = key
+        x, y = int(x), int(y)
+        tile_position = x >> TILE_SHIFT, y >> TILE_SHIFT
+        index = (y & _TILE_MASK) << TILE_SHIFT | (x & _TILE_MASK)
+
+        tile = self._get_tile(tile_position)
+        if tile is None:
+            if value == self.default:
+                return
+            self._check_value(value)
+            tile = self._add_tile(tile_position)
+
+        old_value = tile[index]
+        if old_value == value:
+            return
+        # raises an error for invalid values before anything else is changed
+        tile[index] = value
+
+        if self._zobrist_hash is not None:
+            self._update_zobrist_hash((x, y), old_value, value)
+
+        difference = (value != self.default) - (old_value != self.default)
+        if difference:
+            self._count += difference
+            self._counts[tile_position] += difference
+
+            if self._counts[tile_position] == 0:
+                self._remove_tile(tile_position)
+
+    def __getitem__(self, item: Position) -> int:
+        x, y = item
+        x, y = int(x), int(y)
+        tile = self._get_tile((x >> TILE_SHIFT, y >> TILE_SHIFT))
+        if tile is None:
+            return self.default
+        return tile[(y & _TILE_MASK) << TILE_SHIFT | (x & _TILE_MASK)]
+
+    def __len__(self):
+        return self._count
+
+    def tile_keys(self) -> list[TileKey]:
+        return list(self._counts)
+
+    def tiles(self) -> typing.Iterator[tuple[TileKey, bytearray]]:
+        """All tiles that contain non-default cells. Cell ``(x, y)`` of a tile is at index ``y * TILE_SIZE + x``.
+
+        Encoded tiles are decoded for the iteration only, so iterating doesn't evict the working set.
+        """
+        for key in self.tile_keys():
+            tile = self._tiles[key]
+            yield key, tile if isinstance(tile, bytearray) else tile_encoding.decode(tile, self.default)
+
+    def distinct_values(self) -> set[int]:
+        values = set()
+        for key in self.tile_keys():
+            tile = self._tiles[key]
+            values.update(tile if isinstance(tile, bytearray) else tile_encoding.values(tile, self.default))
+        return values
+
+    def compact(self):
+        """Encodes all decoded tiles."""
+        with self._lock:
+            for key in list(self._decoded):
+                self._encode(key)
+
+    def storage_size(self) -> int:
+        """The number of bytes used by the cells of all tiles in memory."""
+        return sum(len(tile) for tile in self._tiles.values())
+
+    def encoding_counts(self) -> dict[str, int]:
+        """How many of the encoded tiles use each encoding."""
+        counts = dict.fromkeys(tile_encoding.ENCODING_NAMES.values(), 0)
+        for tile in self._tiles.values():
+            if not isinstance(tile, bytearray):
+                counts[tile_encoding.ENCODING_NAMES[tile[0]]] += 1
+        return counts
+
+    def items(self):
+        default = self.default
+
+        for (tile_x, tile_y), tile in self.tiles():
+            x0, y0 = tile_x << TILE_SHIFT, tile_y << TILE_SHIFT
+            for index, value in enumerate(tile):
+                if value != default:
+                    yield (x0 + (index & _TILE_MASK), y0 + (index >> TILE_SHIFT)), value
+
+    def items_in_rect(self, rect: Rect) -> typing.Iterator[tuple[Position, int]]:
+        default = self.default
+
+        for key, x, end_x, y, end_y in tile_spans(rect, self._counts):
+            tile = self._get_tile(key)
+            for row_y in range(y, end_y):
+                # index of the cell at x = 0 of the row, if the tile extended that far
+                offset = ((row_y & _TILE_MASK) << TILE_SHIFT) - (key[0] << TILE_SHIFT)
+                row = tile[offset + x:offset + end_x]
+                if row.count(default) == len(row):
+                    continue
+
+                for i, value in enumerate(row, x):
+                    if value != default:
+                        yield (i, row_y), value
+
+    def get_block(self, rect: Rect) -> bytearray:
+        x0, y0, width, height = rect
+        block = bytearray([self.default]) * (width * height)
+
+        for key, x, end_x, y, end_y in tile_spans(rect, self._counts):
+            tile = self._get_tile(key)
+            for row_y in range(y, end_y):
+                offset = ((row_y & _TILE_MASK) << TILE_SHIFT) - (key[0] << TILE_SHIFT)
+                start = (row_y - y0) * width - x0
+                block[start + x:start + end_x] = tile[offset + x:offset + end_x]
+
+        return block
+
+    def set_block(self, rect: Rect, values: typing.Sequence[int]):
+        x0, y0, width, height = rect
+        if len(values) != width * height:
+            raise ValueError(f"A block of {width}x{height} cells needs {width * height} values, not {len(values)}.")
+        try:
+            block = bytes(values)
+        except (TypeError, ValueError):
+            raise ValueError("Cell values of a tiled grid have to be between 0 and 255.") from None
+
+        default = self.default
+        changes: dict[Position, int] | None = {} if self.bulk_listeners else None
+
+        for key, x, end_x, y, end_y in tile_spans(rect):
+            tile = self._get_tile(key)
+            if tile is None:
+                if all(
+                    block.count(default, (row_y - y0) * width + x - x0, (row_y - y0) * width + end_x - x0)
+                    == end_x - x for row_y in range(y, end_y)
+                ):
+                    continue
+                tile = self._add_tile(key)
+
+            difference = 0
+            for row_y in range(y, end_y):
+                offset = ((row_y & _TILE_MASK) << TILE_SHIFT) - (key[0] << TILE_SHIFT)
+                start = (row_y - y0) * width - x0
+                old_row, row = tile[offset + x:offset + end_x], block[start + x:start + end_x]
+                if old_row == row:
+                    continue
+
+                if changes is not None or self._zobrist_hash is not None:
+                    for i, (old_value, value) in enumerate(zip(old_row, row), x):
+                        if old_value != value:
+                            if self._zobrist_hash is not None:
+                                self._update_zobrist_hash((i, row_y), old_value, value)
+                            if changes is not None:
+                                changes[i, row_y] = value
+
+                difference += old_row.count(default) - row.count(default)
+                tile[offset + x:offset + end_x] = row
+
+            self._count += difference
+            self._counts[key] += difference
+            if self._counts[key] == 0:
+                self._remove_tile(key)
+            else:
+                self._tile_changed(key)
+
+        if changes:
+            self._call_bulk_listeners(changes)
+
+    def _tile_changed(self, key: TileKey):
+        """Called after cells of a tile were written in place."""
+
+    def clear(self):
+        changes = dict.fromkeys((position for position, _ in self.items()), self.default) if self.bulk_listeners else {}
+
+        for key in self.tile_keys():
+            self._remove_tile(key)
+        self._count = 0
+        if self._zobrist_hash is not None:
+            self._zobrist_hash = 0
+
+        self._call_bulk_listeners(changes)
+
+    def changed_tiles(self, other: InfiniteGrid[int]) -> set[TileKey]:
+        # spilled tiles aren't in _tiles, so spilling grids are compared cell by cell
+        if type(self) is not TiledGrid or type(other) is not TiledGrid or other.default != self.default:
+            return super().changed_tiles(other)
+
+        changed = set()
+        for key in self._counts.keys() | other._counts.keys():
+            tile, other_tile = self._tiles.get(key), other._tiles.get(key)
+            # tiles that are still shared since a fork
+            if tile is other_tile:
+                continue
+
+            if tile is None or other_tile is None:
+                changed.add(key)
+            elif tile.__class__ is other_tile.__class__:
+                # encodings are unique
+                if tile != other_tile:
+                    changed.add(key)
+            else:
+                if tile.__class__ is not bytearray:
+                    tile, other_tile = other_tile, tile
+                if tile != tile_encoding.decode(other_tile, self.default):
+                    changed.add(key)
+        return changed
+
+    def fork(self) -> "TiledGrid":
+        """A copy that shares all tiles with this grid.
+
+        The decoded tiles are encoded first, and encoded tiles are never changed in place, so each grid decodes its
+        own copy of a shared tile when it accesses it. Only the tiles that are used after forking are duplicated.
+        """
+        with self._lock:
+            self.compact()
+
+            grid = TiledGrid(self.default, self.max_decoded_tiles)
+            grid._tiles = dict(self._tiles)
+            grid._counts = dict(self._counts)
+            grid._count = self._count
+            grid._zobrist_hash = self._zobrist_hash
+        return grid
+
+    def to_json(self) -> dict:
+        return {
+            "type": "tiled",
+            "default": self.default,
+            "tile_size": TILE_SIZE,
+            "tile_encoding": "compact",
+            "tiles": [
+                [x, y, base64.b64encode(zlib.compress(tile_encoding.encode(tile, self.default))).decode("ascii")]
+                for (x, y), tile in self.tiles()
+            ]
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "TiledGrid":
+        if data["tile_size"] != TILE_SIZE:
+            raise ValueError(f"Unsupported tile size {data['tile_size']}.")
+
+        default = data["default"]
+        if data.get("tile_encoding") == "compact":
+            def decode(tile: str) -> bytearray:
+                return tile_encoding.decode(zlib.decompress(base64.b64decode(tile)), default)
+        else:
+            # tiles used to be stored with one byte per cell
+            def decode(tile: str) -> bytearray:
+                return bytearray(zlib.decompress(base64.b64decode(tile)))
+
+        return cls(default, _tiles={(x, y): decode(tile) for x, y, tile in data["tiles"]})
+
+    @classmethod
+    def from_grid(cls, grid: InfiniteGrid[int], *args, **kwargs) -> "TiledGrid":
+        tiled_grid = cls(grid.default, *args, **kwargs)
+        for position, value in grid.items():
+            tiled_grid._store(position, value)
+        return tiled_grid
+
+
+class SpillingGrid(TiledGrid):
+    """A :class:`TiledGrid` that only keeps the most recently used tiles in memory and spills the others to a sqlite
+    database on disk, from where they are loaded again when they are accessed.
+
+    At most ``memory_budget`` bytes of tiles are kept in memory. The database is a temporary file that is deleted
+    by :meth:`close`, unless ``path`` is given. The JSON representation is the same as that of a :class:`TiledGrid`,
+    so a saved spilling grid is loaded completely into memory again.
+    """
+
+    def __init__(self, default: int, memory_budget: int = 256 << 20, path: Path = None,
+                 _tiles: dict[TileKey, bytearray] = None):
+        self.max_tiles = max(1, memory_budget // TILE_CELLS)
+
+        if path is None:
+            file_descriptor, path = tempfile.mkstemp(prefix="turmites-", suffix=".sqlite")
+            os.close(file_descriptor)
+            self._delete_on_close = True
+        else:
+            self._delete_on_close = False
+        self.path = Path(path)
+
+        # tiles are loaded from the reading threads of the parallel engine too
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute("DROP TABLE IF EXISTS tiles")
+        self._connection.execute("CREATE TABLE tiles (x INTEGER, y INTEGER, data BLOB, PRIMARY KEY (x, y))")
+
+        # the in-memory tiles in least recently used order, and the ones that were changed since they were loaded
+        self._lru: collections.OrderedDict[TileKey, bytearray] = collections.OrderedDict()
+        self._dirty: set[TileKey] = set()
+
+        super().__init__(default)
+        self._tiles = self._lru
+
+        for key, tile in (_tiles or {}).items():
+            count = TILE_CELLS - tile.count(default)
+            if count:
+                self._insert(key, tile, dirty=True)
+                self._counts[key] = count
+                self._count += count
+
+    def _insert(self, key: TileKey, tile: bytearray, dirty: bool):
+        self._lru[key] = tile
+        if dirty:
+            self._dirty.add(key)
+
+        while len(self._lru) > self.max_tiles:
+            self._evict()
+
+    def _evict(self):
+        key, tile = self._lru.popitem(last=False)
+        if key in self._dirty:
+            self._dirty.discard(key)
+            self._connection.execute(
+                "INSERT OR REPLACE INTO tiles VALUES (?, ?, ?)", (*key, tile_encoding.encode(tile, self.default))
+            )
+
+    def _get_tile(self, key: TileKey) -> bytearray | None:
+        tile = self._lru.get(key)
+        if tile is not None:
+            self._lru.move_to_end(key)
+            return tile
+
+        if key not in self._counts:
+            return None
+
+        with self._lock:
+            tile = self._lru.get(key)
+            if tile is None:
+                tile = self._read_tile(key)
+                self._insert(key, tile, dirty=False)
+            return tile
+
+    def _read_tile(self, key: TileKey) -> bytearray:
+        data, = self._connection.execute("SELECT data FROM tiles WHERE x = ? AND y = ?", key).fetchone()
+        return tile_encoding.decode(data, self.default)
+
+    def _add_tile(self, key: TileKey) -> bytearray:
+        tile = bytearray([self.default]) * TILE_CELLS
+        self._counts[key] = 0
+        self._insert(key, tile, dirty=True)
+        return tile
+
+    def _remove_tile(self, key: TileKey):
+        self._lru.pop(key, None)
+        self._dirty.discard(key)
+        # the tile might be on disk from an earlier eviction
+        self._connection.execute("DELETE FROM tiles WHERE x = ? AND y = ?", key)
+        del self._counts[key]
+
+    def _store(self, key: Position, value: int):
+        super()._store(key, value)
+        self._tile_changed(tile_key(key))
+
+    def _tile_changed(self, key: TileKey):
+        if key in self._lru:
+            self._dirty.add(key)
+
+    def _flush(self):
+        """Writes the changed tiles in memory to the database."""
+        for key in self._dirty:
+            tile = tile_encoding.encode(self._lru[key], self.default)
+            self._connection.execute("INSERT OR REPLACE INTO tiles VALUES (?, ?, ?)", (*key, tile))
+        self._dirty.clear()
+        self._connection.commit()
+
+    def fork(self, memory_budget: int = None, path: Path = None) -> "SpillingGrid":
+        """A copy with a database of its own, which starts as a copy of this one. The fork doesn't have any tiles in
+        memory until it accesses them."""
+        with self._lock:
+            self._flush()
+
+            grid = SpillingGrid(
+                self.default, self.max_tiles * TILE_CELLS if memory_budget is None else memory_budget, path
+            )
+            self._connection.backup(grid._connection)
+            grid._counts = dict(self._counts)
+            grid._count = self._count
+            grid._zobrist_hash = self._zobrist_hash
+        return grid
+
+    def tiles(self) -> typing.Iterator[tuple[TileKey, bytearray]]:
+        # reading spilled tiles doesn't load them into memory, so iterating doesn't evict the working set
+        for key in self.tile_keys():
+            tile = self._lru.get(key)
+            yield key, self._read_tile(key) if tile is None else tile
+
+    def distinct_values(self) -> set[int]:
+        values = set()
+        for _, tile in self.tiles():
+            values.update(tile)
+        return values
+
+    def tiles_in_memory(self) -> int:
+        return len(self._lru)
+
+    def close(self):
+        self._connection.close()
+        if self._delete_on_close:
+            self.path.unlink(missing_ok=True)
+
+    def __enter__(self) -> "SpillingGrid":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
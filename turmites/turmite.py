@@ -4,7 +4,10 @@ import dataclasses
 import math
 import typing
 
-from .infinite_grid import InfiniteGrid, Position
+from . import hashing
+from .infinite_grid import DIRECTION_OFFSETS, InfiniteGrid, Position
+from .paths import PathRecorder
+from .visits import VisitCounter
 
 TurmiteDirection = typing.Literal[0, 1, 2, 3]
 TurmiteTurnDirection = int
@@ -26,6 +29,8 @@ class TransitionTable:
         self._transition_dict: TransitionTable._TransitionDictType = (
             {} if _transition_dict is None else _transition_dict
         )
+        self.version = 0
+        """Incremented whenever the table is changed in place, so caches of it can tell that they are outdated."""
 
     def get_entry(self,
                   cell_color: CellColor,
@@ -46,6 +51,11 @@ class TransitionTable:
         self._transition_dict[cell_color, turmite_state] = (
             turn_direction, new_cell_color, new_turmite_state
         )
+        self.version += 1
+
+    def remove_entry(self, cell_color: CellColor, turmite_state: TurmiteState):
+        del self._transition_dict[cell_color, turmite_state]
+        self.version += 1
 
     def contains_cell_color(self, cell_color: CellColor) -> bool:
         return any(key[0] == cell_color for key in self._transition_dict.keys())
@@ -55,6 +65,10 @@ class TransitionTable:
 
     def clear(self):
         self._transition_dict.clear()
+        self.version += 1
+
+    def copy(self) -> TransitionTable:
+        return TransitionTable(dict(self._transition_dict))
 
     def invert_direction(self) -> TransitionTable:
         return TransitionTable({key: (-value[0], value[1], value[2]) for key, value in self._transition_dict.items()})
@@ -87,6 +101,12 @@ def direction_to_xy_diff(direction: TurmiteDirection) -> tuple[int, int]:
 
 @dataclasses.dataclass
 class Turmite:
+    """A turmite on the grid.
+
+    Transition tables are meant to be shared between turmites with the same rule, e.g. by placing copies made with
+    :func:`copy.copy`. Use :meth:`MultipleTurmiteModel.unshare_transition_table` before editing a table in place.
+    """
+
     transition_table: TransitionTable
 
     position: Position = (0, 0)
@@ -94,17 +114,22 @@ class Turmite:
     direction: TurmiteDirection = 0
     state: TurmiteState = 0
 
-    def step(self, cell_color: CellColor) -> CellColor:
+    def step(self, cell_color: CellColor, grid: InfiniteGrid = None) -> CellColor:
         turn_direction, new_cell_color, self.state = self.transition_table.get_entry(cell_color, self.state)
 
         self.direction += turn_direction
         self.direction %= 4
 
-        self._go_forward()
+        self._go_forward(grid)
 
         return new_cell_color
 
-    def _go_forward(self):
+    def _go_forward(self, grid: InfiniteGrid = None):
+        # bounded grids decide what happens at their edges
+        if grid is not None and grid.bounded:
+            self.position, self.direction = grid.neighbour(self.position, self.direction)
+            return
+
         x, y = self.position
 
         dx, dy = direction_to_xy_diff(self.direction)
@@ -120,10 +145,16 @@ class Turmite:
         }
 
     @classmethod
-    def from_json(cls, data: dict) -> "Turmite":
+    def from_json(cls, data: dict, transition_tables: list[TransitionTable] = None) -> "Turmite":
+        # the transition table is either stored inline or as an index into the shared tables of the model
+        if isinstance(data["transition_table"], int):
+            transition_table = transition_tables[data["transition_table"]]
+        else:
+            transition_table = TransitionTable.from_json(data["transition_table"])
+
         return cls(
-            TransitionTable.from_json(data["transition_table"]),
-            tuple(data["position"]),
+            transition_table,
+            tuple(map(int, data["position"])),
             data["direction"],
             data["state"]
         )
@@ -137,13 +168,37 @@ class MultipleTurmiteModel:
         self.small_step = _small_step
         self.iteration = _iteration
 
+        # hash of all turmites, only maintained once state_hash has been requested
+        self._turmites_hash: int | None = None
+        # visits are only recorded while this is set
+        self.visits: VisitCounter | None = None
+        # and paths while this is set
+        self.paths: PathRecorder | None = None
+
     def step_small(self):
         curr_turmite = self.turmites[self.small_step]
 
         turmite_pos = curr_turmite.position
-        new_color = curr_turmite.step(self.grid[turmite_pos])
+        old_direction, old_state = curr_turmite.direction, curr_turmite.state
+
+        # raises before changing anything if the transition table has no entry
+        new_color = curr_turmite.step(self.grid[turmite_pos], self.grid)
         self.grid[turmite_pos] = new_color
 
+        if self.visits is not None:
+            self.visits.record(turmite_pos, self.iteration)
+        if self.paths is not None:
+            self.paths.record(
+                self.small_step, self.iteration, turmite_pos, curr_turmite.position, curr_turmite.direction, self.grid
+            )
+
+        if self._turmites_hash is not None:
+            self._turmites_hash ^= hashing.turmite_hash(
+                self.small_step, turmite_pos, old_direction, old_state
+            ) ^ hashing.turmite_hash(
+                self.small_step, curr_turmite.position, curr_turmite.direction, curr_turmite.state
+            )
+
         self.small_step += 1
         if self.small_step >= len(self.turmites):
             self.iteration += 1
@@ -153,19 +208,151 @@ class MultipleTurmiteModel:
         for _ in range(len(self.turmites)):
             self.step_small()
 
-    def to_json(self) -> dict:
-        return {
-            "turmites": [turmite.to_json() for turmite in self.turmites],
-            "grid": self.grid.to_json(),
+    def step_many(self, iterations: int):
+        """Does the same as calling :meth:`step` ``iterations`` times, but with the whole loop inlined.
+
+        Transition table entries are looked up without checking that they exist. If one is missing, the interrupted
+        step is repeated with :meth:`step_small`, which raises :class:`UnknownStateError` as usual.
+        """
+        small_steps = iterations * len(self.turmites)
+
+        if self.grid.bounded or self.visits is not None or self.paths is not None:
+            for _ in range(small_steps):
+                self.step_small()
+            return
+
+        # finish the current iteration first, so that the loop starts with the first turmite
+        while self.small_step and small_steps > 0:
+            self.step_small()
+            small_steps -= 1
+        if small_steps <= 0:
+            return
+        full_iterations, small_steps = divmod(small_steps, len(self.turmites))
+
+        grid = self.grid
+        turmites = [
+            (turmite, turmite.transition_table._transition_dict) for turmite in self.turmites
+        ]
+        # the turmites are moved outside of step_small
+        self.invalidate_hash()
+
+        iteration = i = 0
+        try:
+            for iteration in range(full_iterations):
+                for i, (turmite, transitions) in enumerate(turmites):
+                    position = turmite.position
+                    turn_direction, new_cell_color, turmite.state = transitions[grid[position], turmite.state]
+
+                    turmite.direction = direction = (turmite.direction + turn_direction) % 4
+                    dx, dy = DIRECTION_OFFSETS[direction]
+                    turmite.position = position[0] + dx, position[1] + dy
+
+                    grid[position] = new_cell_color
+        except KeyError:
+            self.iteration += iteration
+            self.small_step = i
+            remaining = (full_iterations - iteration) * len(self.turmites) - i + small_steps
+        else:
+            self.iteration += full_iterations
+            remaining = small_steps
+
+        for _ in range(remaining):
+            self.step_small()
+
+    @property
+    def state_hash(self) -> int:
+        """64 bit Zobrist hash of the grid, the positions, directions and states of all turmites and the small step.
+
+        After the first access it is updated in O(1) per :meth:`step_small`. Code that changes turmites in any other
+        way (adding, removing, reordering or moving them) has to call :meth:`invalidate_hash` afterwards.
+        """
+        if self._turmites_hash is None:
+            self._turmites_hash = 0
+            for i, turmite in enumerate(self.turmites):
+                self._turmites_hash ^= hashing.turmite_hash(i, turmite.position, turmite.direction, turmite.state)
+
+        return self.grid.zobrist_hash ^ self._turmites_hash ^ hashing.small_step_hash(self.small_step)
+
+    def invalidate_hash(self):
+        self._turmites_hash = None
+
+    def fork(self) -> "MultipleTurmiteModel":
+        """A copy of the model at its current iteration that can be changed and run independently, e.g. to try
+        another transition table or an extra turmite.
+
+        The grid is copied with :meth:`InfiniteGrid.fork`, so tiled grids share their tiles with the fork until they
+        change them. Transition tables are copied, but stay shared between the same turmites as in this model.
+        """
+        transition_tables: dict[int, TransitionTable] = {}
+        turmites = []
+        for turmite in self.turmites:
+            transition_table = transition_tables.get(id(turmite.transition_table))
+            if transition_table is None:
+                transition_table = transition_tables[id(turmite.transition_table)] = turmite.transition_table.copy()
+            turmites.append(dataclasses.replace(turmite, transition_table=transition_table))
+
+        model = MultipleTurmiteModel(turmites, self.grid.fork(), self.small_step, self.iteration)
+        model._turmites_hash = self._turmites_hash
+        model.visits = None if self.visits is None else self.visits.copy()
+        model.paths = None if self.paths is None else self.paths.copy()
+        return model
+
+    def unshare_transition_table(self, turmite: Turmite) -> TransitionTable:
+        """Gives the turmite its own copy of its transition table if other turmites use the same one.
+
+        This has to be called before a single turmite's transition table is edited in place.
+        """
+        if any(other is not turmite and other.transition_table is turmite.transition_table for other in self.turmites):
+            turmite.transition_table = turmite.transition_table.copy()
+
+        return turmite.transition_table
+
+    def to_json(self, include_grid: bool = True, include_history: bool = True) -> dict:
+        """Without the grid, :meth:`from_json` needs it passed separately. The history are the recorded visits and
+        paths."""
+        # every distinct transition table is only stored once, turmites refer to it by index
+        transition_tables: list[TransitionTable] = []
+        indices: dict[frozenset, int] = {}
+        turmites_json = []
+
+        for turmite in self.turmites:
+            key = frozenset(turmite.transition_table)
+            if key not in indices:
+                indices[key] = len(transition_tables)
+                transition_tables.append(turmite.transition_table)
+
+            turmite_json = turmite.to_json()
+            turmite_json["transition_table"] = indices[key]
+            turmites_json.append(turmite_json)
+
+        data = {
+            "transition_tables": [transition_table.to_json() for transition_table in transition_tables],
+            "turmites": turmites_json,
             "small_step": self.small_step,
             "iteration": self.iteration
         }
+        if include_grid:
+            data["grid"] = self.grid.to_json()
+        if include_history and self.visits is not None:
+            data["visits"] = self.visits.to_json()
+        if include_history and self.paths is not None:
+            data["paths"] = self.paths.to_json()
+
+        return data
 
     @classmethod
-    def from_json(cls, data: dict) -> "MultipleTurmiteModel":
-        return cls(
-            [Turmite.from_json(turmite_json) for turmite_json in data["turmites"]],
-            InfiniteGrid.from_json(data["grid"]),
+    def from_json(cls, data: dict, grid: InfiniteGrid[CellColor] = None) -> "MultipleTurmiteModel":
+        transition_tables = [TransitionTable.from_json(table_json) for table_json in data.get("transition_tables", [])]
+
+        model = cls(
+            [Turmite.from_json(turmite_json, transition_tables) for turmite_json in data["turmites"]],
+            InfiniteGrid.from_json(data["grid"]) if grid is None else grid,
             data["small_step"],
             data["iteration"]
         )
+        if "visits" in data:
+            model.visits = VisitCounter.from_json(data["visits"])
+        if "paths" in data:
+            model.paths = PathRecorder.from_json(data["paths"])
+
+        return model
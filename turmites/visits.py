@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import array
+import base64
+import sys
+import typing
+import zlib
+
+from . import png
+from .infinite_grid import Position, Rect
+from .png import RGB
+from .tiled_grid import TILE_CELLS, TILE_SHIFT, TILE_SIZE, TileKey
+
+_TILE_MASK = TILE_SIZE - 1
+
+MAX_COUNT = 0xFFFFFFFF
+
+
+def heat_level(count: int) -> int:
+    """Visit counts are shown on a logarithmic scale: the level is the number of bits of the count, 0 to 32."""
+    return count.bit_length()
+
+
+def heat_palette() -> list[RGB]:
+    """The color of every heat level, from black over red and yellow to white."""
+    palette = []
+    for level in range(33):
+        t = level / 32
+        palette.append((min(255, int(3 * 255 * t)), min(255, max(0, int(3 * 255 * t - 255))),
+                        min(255, max(0, int(3 * 255 * t - 510)))))
+    return palette
+
+
+def _to_little_endian(values: array.array) -> bytes:
+    if sys.byteorder == "big":
+        values = array.array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_little_endian(typecode: str, data: bytes) -> array.array:
+    values = array.array(typecode, data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+class VisitCounter:
+    """Counts how often turmites were on every cell and remembers the last iteration in which that happened.
+
+    Counts and iterations are kept in tiles of :data:`TILE_SIZE` x :data:`TILE_SIZE` cells as unsigned 32 and 64 bit
+    :mod:`array` s, so a visited cell takes 12 bytes. Counts saturate at :data:`MAX_COUNT`.
+    """
+
+    def __init__(self):
+        self._counts: dict[TileKey, array.array] = {}
+        self._last_visits: dict[TileKey, array.array] = {}
+        # tiles that changed since the last call of take_changed_tiles
+        self._changed_tiles: set[TileKey] = set()
+
+    def _add_tile(self, key: TileKey) -> tuple[array.array, array.array]:
+        counts = self._counts[key] = array.array("I", bytes(4 * TILE_CELLS))
+        last_visits = self._last_visits[key] = array.array("Q", bytes(8 * TILE_CELLS))
+        return counts, last_visits
+
+    def record(self, position: Position, iteration: int, count: int = 1):
+        x, y = position
+        x, y = int(x), int(y)
+        key = x >> TILE_SHIFT, y >> TILE_SHIFT
+        index = (y & _TILE_MASK) << TILE_SHIFT | (x & _TILE_MASK)
+
+        counts = self._counts.get(key)
+        if counts is None:
+            counts, last_visits = self._add_tile(key)
+        else:
+            last_visits = self._last_visits[key]
+
+        counts[index] = min(counts[index] + count, MAX_COUNT)
+        last_visits[index] = iteration
+        self._changed_tiles.add(key)
+
+    def __getitem__(self, position: Position) -> tuple[int, int | None]:
+        """The visit count and the last iteration the cell was visited in, or ``None`` if it wasn't visited."""
+        x, y = position
+        x, y = int(x), int(y)
+        key = x >> TILE_SHIFT, y >> TILE_SHIFT
+        counts = self._counts.get(key)
+        if counts is None:
+            return 0, None
+
+        index = (y & _TILE_MASK) << TILE_SHIFT | (x & _TILE_MASK)
+        count = counts[index]
+        return count, self._last_visits[key][index] if count else None
+
+    def tiles(self) -> typing.Iterator[tuple[TileKey, array.array, array.array]]:
+        """The counts and last visits of every tile, cell ``(x, y)`` of a tile is at index ``y * TILE_SIZE + x``."""
+        for key, counts in self._counts.items():
+            yield key, counts, self._last_visits[key]
+
+    def items(self) -> typing.Iterator[tuple[Position, int, int]]:
+        """Position, count and last visit of every visited cell."""
+        for (tile_x, tile_y), counts, last_visits in self.tiles():
+            x0, y0 = tile_x << TILE_SHIFT, tile_y << TILE_SHIFT
+            for index, count in enumerate(counts):
+                if count:
+                    yield (x0 + (index & _TILE_MASK), y0 + (index >> TILE_SHIFT)), count, last_visits[index]
+
+    def copy(self) -> "VisitCounter":
+        visits = VisitCounter()
+        for key, counts, last_visits in self.tiles():
+            visits._counts[key] = array.array(counts.typecode, counts)
+            visits._last_visits[key] = array.array(last_visits.typecode, last_visits)
+        return visits
+
+    def take_changed_tiles(self) -> set[TileKey]:
+        """The tiles that changed since the last call."""
+        changed_tiles, self._changed_tiles = self._changed_tiles, set()
+        return changed_tiles
+
+    def heat_levels(self, key: TileKey) -> bytes:
+        """The :func:`heat_level` of every cell of a tile."""
+        counts = self._counts.get(key)
+        if counts is None:
+            return bytes(TILE_CELLS)
+        return bytes(count.bit_length() for count in counts)
+
+    def bounding_box(self) -> Rect | None:
+        positions = [position for position, _, _ in self.items()]
+        if not positions:
+            return None
+
+        min_x = min(x for x, _ in positions)
+        min_y = min(y for _, y in positions)
+        return (
+            min_x, min_y,
+            max(x for x, _ in positions) + 1 - min_x,
+            max(y for _, y in positions) + 1 - min_y
+        )
+
+    def write_png(self, file: typing.BinaryIO, rect: Rect = None, scale: int = 1):
+        """Writes the heat levels of the rectangle, by default of all visited cells, as a PNG image."""
+        if rect is None:
+            rect = self.bounding_box() or (0, 0, 1, 1)
+        x0, y0, width, height = rect
+
+        writer = png.PaletteWriter(file, width * scale, height * scale, heat_palette())
+        levels: dict[TileKey, bytes] = {}
+
+        for y in range(y0, y0 + height):
+            row = bytearray(width)
+            for tile_x in range(x0 >> TILE_SHIFT, ((x0 + width - 1) >> TILE_SHIFT) + 1):
+                key = tile_x, y >> TILE_SHIFT
+                if key not in self._counts:
+                    continue
+                if key not in levels:
+                    levels[key] = self.heat_levels(key)
+
+                # the part of the row that lies in this tile
+                start = max(x0, tile_x << TILE_SHIFT)
+                end = min(x0 + width, (tile_x + 1) << TILE_SHIFT)
+                offset = ((y & _TILE_MASK) << TILE_SHIFT) - (tile_x << TILE_SHIFT)
+                row[start - x0:end - x0] = levels[key][offset + start:offset + end]
+
+            # tiles above this row aren't needed anymore
+            if (y & _TILE_MASK) == _TILE_MASK:
+                levels.clear()
+
+            if scale != 1:
+                row = png.scale_row(row, scale)
+            for _ in range(scale):
+                writer.write_row(row)
+
+        writer.close()
+
+    def to_json(self) -> dict:
+        return {
+            "tile_size": TILE_SIZE,
+            "tiles": [
+                [
+                    x, y,
+                    base64.b64encode(zlib.compress(_to_little_endian(counts))).decode("ascii"),
+                    base64.b64encode(zlib.compress(_to_little_endian(last_visits))).decode("ascii")
+                ]
+                for (x, y), counts, last_visits in self.tiles()
+            ]
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "VisitCounter":
+        if data["tile_size"] != TILE_SIZE:
+            raise ValueError(f"Unsupported tile size {data['tile_size']}.")
+
+        visits = cls()
+        for x, y, counts, last_visits in data["tiles"]:
+            tile_counts, tile_last_visits = visits._add_tile((x, y))
+            tile_counts[:] = _from_little_endian("I", zlib.decompress(base64.b64decode(counts)))
+            tile_last_visits[:] = _from_little_endian("Q", zlib.decompress(base64.b64decode(last_visits)))
+        return visits